@@ -26,6 +26,7 @@ def assert_response(method, path, expected, **kwargs):
         ("POST", "schedule"),
         ("POST", "cancel"),
         ("GET", "status"),
+        ("GET, POST", "bulkstatus"),
         ("GET", "listprojects"),
         ("GET", "listversions"),
         ("GET", "listspiders"),
@@ -1,20 +1,78 @@
 import os
+import signal
 from pathlib import Path
 
 from twisted.application.internet import TCPServer, TimerService, UNIXServer
-from twisted.application.service import Application
+from twisted.application.service import Application, Service
+from twisted.internet import reactor
 from twisted.logger import Logger
 from twisted.web import server
 
 from scrapyd.basicauth import wrap_resource
+from scrapyd.config import Config
 from scrapyd.environ import Environment
-from scrapyd.interfaces import IEggStorage, IEnvironment, IJobStorage, IPoller, ISpiderScheduler
+from scrapyd.interfaces import IEggStorage, IEnvironment, IJobIndex, IJobStorage, IPoller, ISpiderScheduler
+from scrapyd.jobindex import JobIndex
+from scrapyd.metrics import JobMetrics, LagMonitor
+from scrapyd.periodic import PeriodicScheduler
 from scrapyd.scheduler import SpiderScheduler
 from scrapyd.utils import initialize_component
+from scrapyd.webhooks import Webhooks
 
 log = Logger()
 
 
+class Reloader(Service):
+    """
+    Reload the ``max_proc`` and ``poll_interval`` options from the configuration sources on SIGHUP (Unix only).
+
+    .. versionadded:: 1.7.0
+    """
+
+    def __init__(self, launcher, timer, config_factory=Config):
+        self.launcher = launcher
+        self.timer = timer
+        self.config_factory = config_factory
+        self.previous_handler = None
+
+    def startService(self):
+        super().startService()
+        if hasattr(signal, "SIGHUP"):
+            self.previous_handler = signal.signal(signal.SIGHUP, self._signal_received)
+
+    def stopService(self):
+        super().stopService()
+        if self.previous_handler is not None:
+            signal.signal(signal.SIGHUP, self.previous_handler)
+            self.previous_handler = None
+
+    def _signal_received(self, signum, frame):
+        # Signal handlers interrupt the reactor.
+        reactor.callFromThread(self.reload)
+
+    def reload(self):
+        try:
+            config = self.config_factory()
+            max_proc = self.launcher.get_max_proc(config)
+            poll_interval = config.getfloat("poll_interval", 5)
+        except Exception:  # noqa: BLE001 keep the running configuration
+            log.failure("Failed to reload configuration")
+            return
+
+        log.info(
+            "Reloading configuration: max_proc={max_proc!r}, poll_interval={poll_interval!r}",
+            max_proc=max_proc,
+            poll_interval=poll_interval,
+        )
+        if max_proc != self.launcher.max_proc:
+            self.launcher.resize(max_proc)
+        if poll_interval != self.timer.step:
+            self.timer.step = poll_interval
+            if self.timer.running:
+                self.timer.stopService()
+                self.timer.startService()
+
+
 def application(config):
     app = Application("Scrapyd")
     bind_address = os.getenv("SCRAPYD_BIND_ADDRESS") or config.get("bind_address", "127.0.0.1")
@@ -23,25 +81,36 @@ def application(config):
     poll_interval = config.getfloat("poll_interval", 5)
 
     environment = Environment(config)
-    scheduler = SpiderScheduler(config)
+    jobindex = JobIndex(config)
+    scheduler = SpiderScheduler(config, jobindex)
     poller = initialize_component(config, "poller", "scrapyd.poller.QueuePoller")
     jobstorage = initialize_component(config, "jobstorage", "scrapyd.jobstorage.MemoryJobStorage")
     eggstorage = initialize_component(config, "eggstorage", "scrapyd.eggstorage.FilesystemEggStorage")
 
+    jobindex.rebuild(poller.queues, jobstorage)
+    jobindex.add_observer(JobMetrics())
+
     app.setComponent(IEnvironment, environment)
     app.setComponent(ISpiderScheduler, scheduler)
     app.setComponent(IPoller, poller)
     app.setComponent(IJobStorage, jobstorage)
     app.setComponent(IEggStorage, eggstorage)
+    app.setComponent(IJobIndex, jobindex)
 
-    # launcher uses jobstorage in initializer, and uses poller and environment.
+    # launcher uses jobstorage and jobindex in initializer, and uses poller and environment.
     launcher = initialize_component(config, "launcher", "scrapyd.launcher.Launcher", app)
 
     timer = TimerService(poll_interval, poller.poll)
+    periodic = PeriodicScheduler(config, scheduler, jobindex)
+    lag_monitor = LagMonitor(1)
+    lag_timer = TimerService(lag_monitor.interval, lag_monitor.tick)
 
     # webroot uses launcher, poller, scheduler and environment.
     webroot = initialize_component(config, "webroot", "scrapyd.website.Root", app)
     resource = server.Site(wrap_resource(webroot, config))
+
+    # webhooks uses webroot for job URLs, and jobindex.
+    webhooks = Webhooks(config, webroot)
     if bind_address and http_port:
         webservice = TCPServer(http_port, resource, interface=bind_address)
         log.info(
@@ -59,6 +128,10 @@ def application(config):
 
     launcher.setServiceParent(app)
     timer.setServiceParent(app)
+    periodic.setServiceParent(app)
+    lag_timer.setServiceParent(app)
     webservice.setServiceParent(app)
+    webhooks.setServiceParent(app)
+    Reloader(launcher, timer).setServiceParent(app)
 
     return app
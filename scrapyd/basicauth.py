@@ -40,9 +40,17 @@ class StringCredentialsChecker:
         return defer.fail(error.UnauthorizedLogin())
 
 
-def wrap_resource(resource, config):
+def get_credentials(config):
+    """
+    Return the basic authentication username and password, from the environment or the configuration.
+    """
     username = os.getenv("SCRAPYD_USERNAME") or config.get("username", "")
     password = os.getenv("SCRAPYD_PASSWORD") or config.get("password", "")
+    return username, password
+
+
+def wrap_resource(resource, config):
+    username, password = get_credentials(config)
     # https://www.rfc-editor.org/rfc/rfc2617#section-2
     if ":" in username:
         raise InvalidUsernameError
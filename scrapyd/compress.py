@@ -0,0 +1,75 @@
+"""
+Content codings of responses, negotiated with the ``Accept-Encoding`` header.
+
+gzip is always available. zstd is available if Python 3.14's ``compression.zstd`` module or the ``backports.zstd``
+package is installed, and brotli if the ``brotli`` package is installed. Compression levels are low, since responses
+are compressed in the event loop.
+
+.. versionadded:: 1.7.0
+"""
+
+import functools
+import gzip
+
+try:
+    from compression import zstd  # Python 3.14
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content coding -> compression function, in order of preference.
+CODINGS = {}
+if zstd is not None:
+    CODINGS["zstd"] = functools.partial(zstd.compress, level=3)
+if brotli is not None:
+    CODINGS["br"] = functools.partial(brotli.compress, quality=1)
+CODINGS["gzip"] = functools.partial(gzip.compress, compresslevel=1, mtime=0)
+
+# Content coding -> file extension of precompressed files, in order of preference. Precompressed files are served
+# as-is, so their codings don't require the modules above.
+EXTENSIONS = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+
+
+def parse_accept_encoding(header):
+    """
+    Return a ``dict`` of each content coding in an ``Accept-Encoding`` header to its quality value.
+    """
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        if not (coding := coding.strip().lower()):
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def negotiate(header, codings):
+    """
+    Return the content coding that the client prefers, among the ``codings`` in the server's order of preference, or
+    ``None`` if the client accepts none of them.
+    """
+    if not header:
+        return None
+
+    qualities = parse_accept_encoding(header)
+    best, best_quality = None, 0
+    for coding in codings:
+        quality = qualities.get(coding, qualities.get("*", 0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
@@ -8,9 +8,26 @@ from urllib.parse import urlsplit
 from w3lib.url import path_to_file_uri
 from zope.interface import implementer
 
+from scrapyd import compress
 from scrapyd.interfaces import IEnvironment
 from scrapyd.utils import get_file_path, local_items
 
+# The suffixes of a job's files: its log file, items feed and output file (see output_to_file).
+SUFFIXES = (".log", ".jl", ".out")
+
+
+def get_job(name):
+    """
+    Return the job ID of a job's file name, like "job.log.gz". Job IDs can contain dots, so only known suffixes are
+    removed.
+    """
+    for suffixes in (compress.EXTENSIONS.values(), SUFFIXES):
+        for suffix in suffixes:
+            if name.endswith(suffix):
+                name = name.removesuffix(suffix)
+                break
+    return name
+
 
 @implementer(IEnvironment)
 class Environment:
@@ -68,12 +85,16 @@ class Environment:
         if not parent.exists():
             parent.mkdir(parents=True, exist_ok=True)
 
-        to_delete = sorted(
-            parent.iterdir(),
-            key=lambda path: path.stat().st_mtime,
-        )[: -self.jobs_to_keep]
-        for path in to_delete:
-            with suppress(OSError):
-                path.unlink()
+        # A job can have many files in the directory, like a log file, an output file (see output_to_file) and
+        # precompressed files, like "job.log.gz", so files are grouped by job ID.
+        mtimes = {}
+        for path in parent.iterdir():
+            job = get_job(path.name)
+            mtimes[job] = max(mtimes.get(job, 0), path.stat().st_mtime)
+        to_delete = set(sorted(mtimes, key=mtimes.get)[: -self.jobs_to_keep])
+        for path in parent.iterdir():
+            if get_job(path.name) in to_delete:
+                with suppress(OSError):
+                    path.unlink()
 
         return file_path.path
@@ -37,3 +37,7 @@ class LauncherError(ScrapydError):
 
 class RunnerError(ScrapydError):
     """Raised if the runner returns an error code"""
+
+
+class WebhookError(ScrapydError):
+    """Raised if a webhook URL responds with a non-2xx status code"""
@@ -0,0 +1,168 @@
+"""
+Scrapy extensions that the runner enables in jobs' processes, to report to the launcher.
+
+.. versionadded:: 1.7.0
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+# Environment variable set by the launcher -> extension enabled by the runner.
+EXTENSIONS = {
+    "SCRAPYD_HEARTBEAT_FD": "scrapyd.extensions.Heartbeat",
+    "SCRAPYD_STATS_FILE": "scrapyd.extensions.StatsFile",
+}
+
+# Heartbeat field -> Scrapy stat.
+HEARTBEAT_STATS = {
+    "requests": "downloader/request_count",
+    "responses": "response_received_count",
+    "items": "item_scraped_count",
+}
+
+# Stats file field -> Scrapy stat.
+STATS = {
+    **HEARTBEAT_STATS,
+    "items_dropped": "item_dropped_count",
+    "errors": "log_count/ERROR",
+    "exceptions": "downloader/exception_count",
+    "retries": "retry/count",
+    "response_bytes": "downloader/response_bytes",
+}
+# The stats file is a sequence number, which is odd while the extension writes, followed by a 64-bit integer per stat.
+SEQUENCE = struct.Struct("<Q")
+VALUES = struct.Struct(f"<{len(STATS)}q")
+STATS_SIZE = SEQUENCE.size + VALUES.size
+# Seconds between writes to the stats file.
+STATS_INTERVAL = 1
+
+
+def get_extensions(environ=os.environ):
+    """
+    Return the ``EXTENSIONS`` setting's entries for the extensions that the launcher requested.
+    """
+    return {path: 0 for variable, path in EXTENSIONS.items() if environ.get(variable)}
+
+
+def format_heartbeat(stats):
+    return (" ".join(str(stats.get_value(stat, 0)) for stat in HEARTBEAT_STATS.values()) + "\n").encode()
+
+
+def parse_heartbeat(line):
+    return dict(zip(HEARTBEAT_STATS, map(int, line.split()), strict=True))
+
+
+def create_stats_file(path):
+    """
+    Create a zero-filled stats file, and return a read-only memory map of it. Called by the launcher.
+    """
+    Path(path).write_bytes(bytes(STATS_SIZE))
+    with Path(path).open("rb") as f:
+        return mmap.mmap(f.fileno(), STATS_SIZE, access=mmap.ACCESS_READ)
+
+
+def write_stats(buffer, stats):
+    (sequence,) = SEQUENCE.unpack_from(buffer)
+    SEQUENCE.pack_into(buffer, 0, sequence + 1)
+    VALUES.pack_into(buffer, SEQUENCE.size, *(int(stats.get_value(stat, 0)) for stat in STATS.values()))
+    SEQUENCE.pack_into(buffer, 0, sequence + 2)
+
+
+def read_stats(buffer, attempts=3):
+    """
+    Return the stats in the memory map, or ``None`` if the extension was writing at each attempt.
+    """
+    for _ in range(attempts):
+        (before,) = SEQUENCE.unpack_from(buffer)
+        values = VALUES.unpack_from(buffer, SEQUENCE.size)
+        (after,) = SEQUENCE.unpack_from(buffer)
+        if before == after and not before % 2:
+            return dict(zip(STATS, values, strict=True))
+    return None
+
+
+class Heartbeat:
+    """
+    Write the engine's request, response and item counts to a file descriptor inherited from the launcher, as a line
+    of space-separated integers, every ``SCRAPYD_HEARTBEAT_INTERVAL`` seconds.
+    """
+
+    def __init__(self, crawler, fd, interval):
+        self.crawler = crawler
+        self.fd = fd
+        self.interval = interval
+        self.task = task.LoopingCall(self.beat)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        fd = os.environ.get("SCRAPYD_HEARTBEAT_FD")
+        interval = float(os.environ.get("SCRAPYD_HEARTBEAT_INTERVAL", "0"))
+        if not fd or not interval:
+            raise NotConfigured
+
+        extension = cls(crawler, int(fd), interval)
+        crawler.signals.connect(extension.engine_started, signal=signals.engine_started)
+        crawler.signals.connect(extension.engine_stopped, signal=signals.engine_stopped)
+        return extension
+
+    def engine_started(self):
+        # Never block the crawl if the launcher is slow to read.
+        os.set_blocking(self.fd, False)
+        self.task.start(self.interval)
+
+    def engine_stopped(self):
+        if self.task.running:
+            self.task.stop()
+
+    def beat(self):
+        try:
+            os.write(self.fd, format_heartbeat(self.crawler.stats))
+        except BlockingIOError:  # the pipe is full
+            pass
+        except OSError:  # the launcher closed the pipe
+            self.engine_stopped()
+
+
+class StatsFile:
+    """
+    Write the crawler's stats to a memory-mapped file created by the launcher, every :data:`STATS_INTERVAL` seconds
+    and when the engine stops, so that the launcher reads them without system calls.
+    """
+
+    def __init__(self, crawler, path):
+        self.crawler = crawler
+        self.path = path
+        self.buffer = None
+        self.task = task.LoopingCall(self.write)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not (path := os.environ.get("SCRAPYD_STATS_FILE")):
+            raise NotConfigured
+
+        extension = cls(crawler, path)
+        crawler.signals.connect(extension.engine_started, signal=signals.engine_started)
+        crawler.signals.connect(extension.engine_stopped, signal=signals.engine_stopped)
+        return extension
+
+    def engine_started(self):
+        with Path(self.path).open("r+b") as f:
+            self.buffer = mmap.mmap(f.fileno(), STATS_SIZE)
+        self.task.start(STATS_INTERVAL)
+
+    def engine_stopped(self):
+        if self.task.running:
+            self.task.stop()
+        if self.buffer is not None:
+            self.write()
+            self.buffer.close()
+            self.buffer = None
+
+    def write(self):
+        write_stats(self.buffer, self.crawler.stats)
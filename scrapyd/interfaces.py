@@ -77,6 +77,25 @@ class IPoller(Interface):
         Called when projects may have changed, to refresh the available projects, including at initialization.
         """
 
+    def add_observer(observer):
+        """
+        Call ``observer(project, job)`` for each pending job that expired and was removed from its spider queue. The
+        pending job is like in :meth:`scrapyd.interfaces.ISpiderQueue.pop`.
+
+        This method is optional. If absent, expired jobs aren't recorded in the job index.
+
+        .. versionadded:: 1.7.0
+        """
+
+    def remove_observer(observer):
+        """
+        Stop calling ``observer``.
+
+        This method is optional. If absent, it isn't called.
+
+        .. versionadded:: 1.7.0
+        """
+
 
 class ISpiderQueue(Interface):
     """
@@ -89,28 +108,69 @@ class ISpiderQueue(Interface):
     -  :ref:`webservices<config-services>` that schedule, cancel or list pending jobs
     """
 
-    def add(name, priority, **spider_args):
+    def add(name, priority, _not_before, _dedupe_key, _expires_at, **spider_args):
         """
-        Add a pending job, given the spider ``name``, crawl ``priority`` and keyword arguments, which might include the
-        ``_job`` ID, egg ``_version`` and Scrapy ``settings`` depending on the implementation, with keyword arguments
-        that are not recognized by the implementation being treated as spider arguments.
+        Add a pending job, given the spider ``name``, crawl ``priority``, the ``datetime`` before which the job must not
+        be popped (or ``None``), a ``_dedupe_key`` (or ``None``), the ``datetime`` after which the job must not be popped
+        (or ``None``) and keyword arguments, which might include the ``_job`` ID, egg ``_version`` and Scrapy
+        ``settings`` depending on the implementation, with keyword arguments that are not recognized by the
+        implementation being treated as spider arguments.
+
+        If a pending job with the same ``_dedupe_key`` exists, raise its priority to ``priority`` if higher, and return
+        its message, instead of adding a job. Otherwise, return ``None``.
 
         .. versionchanged:: 1.3.0
            Add the ``priority`` parameter.
+        .. versionchanged:: 1.7.0
+           Add the ``_not_before``, ``_dedupe_key`` and ``_expires_at`` parameters.
+        """
+
+    def get_duplicate(dedupe_key):
+        """
+        Return the pending job that was added with the ``_dedupe_key``, or ``None``.
+
+        This method is optional. If absent, a duplicate job is rejected if the project or node has its maximum number
+        of pending jobs.
+
+        .. versionadded:: 1.7.0
         """
 
     def pop():
         """
-        Pop the next pending job. The pending job is a ``dict`` containing the spider ``name``. Depending on the
-        implementation, other keys might include the ``_job`` ID, egg ``_version`` and Scrapy ``settings``, with
-        keyword arguments that are not recognized by the receiver being treated as spider arguments.
+        Pop the next pending job whose ``not_before`` time has passed and whose ``expires_at`` time hasn't passed, or
+        return ``None``. The pending job is a
+        ``dict`` containing the spider ``name``. Depending on the implementation, other keys might include the ``_job``
+        ID, egg ``_version`` and Scrapy ``settings``, with keyword arguments that are not recognized by the receiver
+        being treated as spider arguments.
         """
 
     def list():
         """
-        Return the pending jobs.
+        Return the pending jobs. A pending job that was added with a ``not_before`` or ``expires_at`` time has a
+        ``_not_before`` or ``_expires_at`` key.
 
         .. seealso:: :meth:`scrapyd.interfaces.ISpiderQueue.pop`
+
+        .. versionchanged:: 1.7.0
+           Add the ``_not_before`` and ``_expires_at`` keys.
+        """
+
+    def next_due():
+        """
+        Return the earliest ``not_before`` time of the pending jobs that hasn't passed, or ``None``.
+
+        This method is optional. If absent, the poller doesn't poll at the ``not_before`` times.
+
+        .. versionadded:: 1.7.0
+        """
+
+    def purge_expired():
+        """
+        Remove the pending jobs whose ``expires_at`` time has passed, and return them.
+
+        This method is optional. If absent, the poller doesn't purge expired jobs.
+
+        .. versionadded:: 1.7.0
         """
 
     def count():
@@ -118,11 +178,32 @@ class ISpiderQueue(Interface):
         Return the number of pending jobs.
         """
 
+    def count_by_spider():
+        """
+        Return a ``dict`` of each spider's name to its number of pending jobs.
+
+        This method is optional. If absent, the pending jobs are counted from :meth:`~scrapyd.interfaces.ISpiderQueue.list`.
+
+        .. versionadded:: 1.7.0
+        """
+
     def remove(func):
         """
         Remove pending jobs for which ``func(job)`` is true, and return the number of removed pending jobss.
         """
 
+    def remove_matching(spider, version, jobs, min_priority, max_priority):
+        """
+        Remove the pending jobs that match all the filters that aren't ``None``: the spider name, the egg ``_version``
+        (jobs scheduled without a version don't match), a list of ``_job`` IDs, and the minimum and maximum priority.
+        Return the ``_job`` IDs of the removed pending jobs.
+
+        This method is optional. If absent, the pending jobs are removed with
+        :meth:`~scrapyd.interfaces.ISpiderQueue.remove`, and can't be filtered by priority.
+
+        .. versionadded:: 1.7.0
+        """
+
     def clear():
         """
         Remove all pending jobs.
@@ -134,12 +215,17 @@ class ISpiderScheduler(Interface):
     A component to schedule jobs.
     """
 
-    def schedule(project, spider_name, priority, **spider_args):
+    def schedule(project, spider_name, priority, _not_before, _dedupe_key, _expires_at, **spider_args):
         """
-        Schedule a crawl.
+        Schedule a crawl, to start no earlier than ``_not_before`` and no later than ``_expires_at``, if not ``None``, and
+        return the pending job's ID.
+
+        If a pending job has the same ``_dedupe_key``, if not ``None``, return its ID instead of scheduling a crawl.
 
         .. versionchanged:: 1.3.0
            Add the ``priority`` parameter.
+        .. versionchanged:: 1.7.0
+           Add the ``_not_before``, ``_dedupe_key`` and ``_expires_at`` parameters. Return the job's ID.
         """
 
     def list_projects():
@@ -203,6 +289,17 @@ class IJobStorage(Interface):
         .. seealso:: :meth:`scrapyd.interfaces.IJobStorage.__iter__`
         """
 
+    def count_by_spider(since):
+        """
+        Return a ``dict`` of each ``(project, spider)`` tuple to its number of finished jobs whose ``end_time`` is at
+        or after the ``datetime`` ``since``, or to its number of finished jobs if ``since`` is ``None``.
+
+        This method is optional. If absent, the finished jobs are counted from
+        :meth:`~scrapyd.interfaces.IJobStorage.list`.
+
+        .. versionadded:: 1.7.0
+        """
+
     def __len__():
         """
         Return the number of finished jobs.
@@ -213,5 +310,116 @@ class IJobStorage(Interface):
         Iterate over the finished jobs in reverse order by ``end_time``.
 
         A job has the attributes ``project``, ``spider``, ``job``, ``start_time`` and ``end_time`` and may have the
-        attributes ``args`` (``scrapy crawl`` CLI arguments) and ``env`` (environment variables).
+        attributes ``args`` (``scrapy crawl`` CLI arguments), ``env`` (environment variables), ``usage`` (a ``dict``
+        of resource usage, or ``None``), ``termination`` (why Scrapyd ended the job's process: ``'memory_limit'``,
+        ``'cpu_limit'``, ``'timeout'``, ``'cancelled'`` or ``'stalled'``, or ``None``) and ``stats`` (a ``dict`` of
+        the final crawl stats, or ``None``).
+
+        .. versionchanged:: 1.7.0
+           Add the ``usage``, ``termination`` and ``stats`` attributes.
+        """
+
+
+class IJobIndex(Interface):
+    """
+    A component to look up the state of jobs by job ID, without scanning spider queues, processes or job storage.
+
+    .. versionadded:: 1.7.0
+    """
+
+    pending = Attribute(
+        """
+        A ``dict`` of each project's name to its number of pending jobs.
+        """
+    )
+
+    running = Attribute(
+        """
+        A ``dict`` of each ``(project, spider)`` tuple to its number of running jobs.
+        """
+    )
+
+    generations = Attribute(
+        """
+        A ``dict`` of each project's name to its generation, and of ``None`` to the node's generation: numbers that
+        increase when a job is scheduled, popped, started, finished, canceled or expired, and when projects may have
+        changed.
+        """
+    )
+
+    def add_observer(observer):
+        """
+        Call ``observer(event)`` after each state transition.
+
+        The ``event`` is a ``dict`` with the keys ``event`` (one of ``'scheduled'``, ``'started'``, ``'finished'``,
+        ``'failed'``, ``'cancelled'`` or ``'expired'``), ``project``, ``spider``, ``job`` and ``time``, and with keys
+        specific to the transition: ``pid`` if started; ``start_time``, ``end_time``, ``exit_code``, ``exit_signal``
+        and ``termination`` if finished or failed; and ``prevstate`` if cancelled.
+        """
+
+    def rebuild(queues, jobstorage):
+        """
+        Index the pending jobs in the ``queues`` (like :attr:`scrapyd.interfaces.IPoller.queues`) and the finished jobs
+        in the ``jobstorage`` (an :py:interface:`~scrapyd.interfaces.IJobStorage`), discarding any other entries.
+        """
+
+    def update_projects(queues):
+        """
+        Called when projects may have changed, to index the pending jobs of new projects and to forget the pending jobs
+        of removed projects.
+        """
+
+    def get(project, job):
+        """
+        Return the entry for the ``job`` ID in the ``project``, or ``None``.
+
+        An entry has the attributes ``spider``, ``pending`` (the number of pending jobs), ``slots`` (the
+        :ref:`launcher` slots of running jobs), ``finished`` (the finished job, or ``None``) and ``state``.
+        """
+
+    def find(job, project=None):
+        """
+        Return ``(project, entry)`` for the ``job`` ID in the ``project`` or, if ``None``, in any project, preferring
+        a finished, then running, then pending entry. If no entry is found, ``(None, None)`` is returned.
+
+        .. seealso:: :meth:`scrapyd.interfaces.IJobIndex.get`
+        """
+
+    def state(job, project=None):
+        """
+        Return ``'finished'``, ``'running'``, ``'pending'`` or ``None`` for the ``job`` ID, in that order of
+        precedence, in the ``project`` or, if ``None``, in any project.
+        """
+
+    def schedule(project, spider, job):
+        """
+        Called when a job is added to a spider queue.
+        """
+
+    def pop(project, job):
+        """
+        Called when a job is removed from a spider queue, to be started.
+        """
+
+    def start(process, slot):
+        """
+        Called when a job's process (a ``ScrapyProcessProtocol``) is started in the :ref:`launcher` ``slot``.
+        """
+
+    def finish(job, slot=None):
+        """
+        Called when a job (like in :py:interface:`~scrapyd.interfaces.IJobStorage`) is added to job storage, after its
+        process ended in the :ref:`launcher` ``slot``.
+        """
+
+    def expire(job):
+        """
+        Called when a pending job expired, after it was removed from the spider queue and added to job storage (like in
+        :py:interface:`~scrapyd.interfaces.IJobStorage`).
+        """
+
+    def cancel(project, job, prevstate=None):
+        """
+        Called when a job is canceled, with its previous state (``'pending'`` or ``'running'``), if any. Pending jobs
+        have been removed from the spider queue. Running jobs have been sent a signal, and are finished later.
         """
@@ -0,0 +1,211 @@
+"""
+.. versionadded:: 1.7.0
+   Webservices previously scanned spider queues, processes and job storage to find a job.
+"""
+
+import datetime
+from collections import Counter, defaultdict
+
+from twisted.logger import Logger
+from zope.interface import implementer
+
+from scrapyd.interfaces import IJobIndex
+
+log = Logger()
+
+
+class IndexedJob:
+    # A job ID can be reused, so an entry can be in more than one state.
+    def __init__(self, spider):
+        self.spider = spider
+        self.pending = 0
+        self.slots = set()
+        self.finished = None
+
+    @property
+    def state(self):
+        if self.finished is not None:
+            return "finished"
+        if self.slots:
+            return "running"
+        if self.pending:
+            return "pending"
+        return None
+
+
+@implementer(IJobIndex)
+class JobIndex:
+    def __init__(self, config):
+        self.finished_to_keep = config.getint("finished_to_keep", 100)
+        # job ID -> project -> IndexedJob
+        self.jobs = defaultdict(dict)
+        # (project, job ID) of finished jobs, in the order added, to evict entries like job storage.
+        self.finished = {}
+        self.projects = set()
+        self.observers = []
+        # project -> number of pending jobs
+        self.pending = Counter()
+        # (project, spider) -> number of running jobs
+        self.running = Counter()
+        # project -> generation, and None -> the node's generation
+        self.generations = Counter()
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def rebuild(self, queues, jobstorage):
+        self.jobs.clear()
+        self.finished.clear()
+        self.projects.clear()
+        self.pending.clear()
+        self.running.clear()
+
+        # Job storage iterates in reverse order by end time.
+        for job in reversed(list(jobstorage)):
+            self._add_finished(job)
+        self.update_projects(queues)
+
+    def update_projects(self, queues):
+        # A project's versions may have changed.
+        for project in queues:
+            self.generations[project] += 1
+        self.generations[None] += 1
+
+        for project in self.projects - set(queues):
+            for job, entries in list(self.jobs.items()):
+                if (entry := entries.get(project)) is not None:
+                    entry.pending = 0
+                    self._prune(project, job)
+            del self.pending[project]
+
+        for project in set(queues) - self.projects:
+            self.pending.setdefault(project, 0)
+            for message in queues[project].list():
+                if "_job" in message:
+                    self._entry(project, message["name"], message["_job"]).pending += 1
+                    self.pending[project] += 1
+
+        self.projects = set(queues)
+
+    def get(self, project, job):
+        return self.jobs.get(job, {}).get(project)
+
+    def find(self, job, project=None):
+        entries = self.jobs.get(job, {})
+        if project is not None:
+            entry = entries.get(project)
+            return (None, None) if entry is None else (project, entry)
+
+        for state in ("finished", "running", "pending"):
+            for name, entry in entries.items():
+                if entry.state == state:
+                    return name, entry
+        return None, None
+
+    def state(self, job, project=None):
+        _, entry = self.find(job, project)
+        return None if entry is None else entry.state
+
+    def schedule(self, project, spider, job):
+        self._entry(project, spider, job).pending += 1
+        self.pending[project] += 1
+        self._bump(project)
+        self._notify("scheduled", project, spider, job)
+
+    def pop(self, project, job):
+        if (entry := self.get(project, job)) is not None and entry.pending:
+            entry.pending -= 1
+            self.pending[project] -= 1
+            self._prune(project, job)
+        self._bump(project)
+
+    def start(self, process, slot):
+        entry = self._entry(process.project, process.spider, process.job)
+        if slot not in entry.slots:
+            entry.slots.add(slot)
+            self.running[(process.project, process.spider)] += 1
+        self._bump(process.project)
+        self._notify("started", process.project, process.spider, process.job, pid=process.pid)
+
+    def finish(self, job, slot=None):
+        if (entry := self.get(job.project, job.job)) is not None and slot in entry.slots:
+            self.running[(job.project, entry.spider)] -= 1
+        self._add_finished(job, slot)
+        self._bump(job.project)
+
+        exit_code = getattr(job, "exit_code", None)
+        exit_signal = getattr(job, "exit_signal", None)
+        self._notify(
+            "failed" if exit_code or exit_signal is not None else "finished",
+            job.project,
+            job.spider,
+            job.job,
+            start_time=str(job.start_time),
+            end_time=str(job.end_time),
+            exit_code=exit_code,
+            exit_signal=exit_signal,
+            termination=getattr(job, "termination", None),
+        )
+
+    def expire(self, job):
+        self.pop(job.project, job.job)
+        self._add_finished(job)
+        self._bump(job.project)
+        self._notify("expired", job.project, job.spider, job.job)
+
+    def cancel(self, project, job, prevstate=None):
+        if (entry := self.get(project, job)) is not None:
+            if entry.pending:
+                self._bump(project)
+            self.pending[project] -= entry.pending
+            entry.pending = 0
+            self._prune(project, job)
+            if prevstate is not None:
+                self._notify("cancelled", project, entry.spider, job, prevstate=prevstate)
+
+    def _add_finished(self, job, slot=None):
+        key = (job.project, job.job)
+        entry = self._entry(job.project, job.spider, job.job)
+        entry.slots.discard(slot)
+        entry.finished = job
+
+        self.finished.pop(key, None)
+        self.finished[key] = None
+        # Like job storage, keep all finished jobs if finished_to_keep is 0.
+        while self.finished_to_keep and len(self.finished) > self.finished_to_keep:
+            project, jobid = next(iter(self.finished))
+            del self.finished[(project, jobid)]
+            self.jobs[jobid][project].finished = None
+            self._prune(project, jobid)
+
+    def _bump(self, project):
+        self.generations[project] += 1
+        self.generations[None] += 1
+
+    def _notify(self, event, project, spider, job, **kwargs):
+        data = {
+            "event": event,
+            "project": project,
+            "spider": spider,
+            "job": job,
+            "time": str(datetime.datetime.now()),
+            **kwargs,
+        }
+        for observer in self.observers:
+            try:
+                observer(data)
+            except Exception:  # noqa: BLE001,PERF203
+                log.failure("Job index observer {observer!r} failed", observer=observer)
+
+    def _entry(self, project, spider, job):
+        entries = self.jobs[job]
+        if project not in entries:
+            entries[project] = IndexedJob(spider)
+        return entries[project]
+
+    def _prune(self, project, job):
+        entries = self.jobs[job]
+        if entries[project].state is None:
+            del entries[project]
+        if not entries:
+            del self.jobs[job]
@@ -3,6 +3,8 @@
    Job storage was previously in-memory only and managed by the launcher.
 """
 
+from collections import Counter
+
 from zope.interface import implementer
 
 from scrapyd import sqlite
@@ -23,6 +25,9 @@ class MemoryJobStorage:
     def list(self):
         return list(self)
 
+    def count_by_spider(self, since=None):
+        return Counter((job.project, job.spider) for job in self.jobs if since is None or job.end_time >= since)
+
     def __len__(self):
         return len(self.jobs)
 
@@ -43,12 +48,33 @@ class SqliteJobStorage:
     def list(self):
         return list(self)
 
+    def count_by_spider(self, since=None):
+        return self.jobs.count_by_spider(since)
+
     def __len__(self):
         return len(self.jobs)
 
     def __iter__(self):
-        for project, spider, jobid, start_time, end_time in self.jobs:
+        for (
+            project,
+            spider,
+            jobid,
+            start_time,
+            end_time,
+            usage,
+            termination,
+            stats,
+            attempt,
+            retry_of,
+            retried_as,
+        ) in self.jobs:
             job = ScrapyProcessProtocol(project, spider, jobid, env={}, args=[])
             job.start_time = start_time
             job.end_time = end_time
+            job.usage = usage
+            job.termination = termination
+            job.stats = stats
+            job.attempt = attempt
+            job.retry_of = retry_of
+            job.retried_as = retried_as
             yield job
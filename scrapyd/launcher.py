@@ -1,18 +1,49 @@
+import copy
 import datetime
+import json
 import multiprocessing
+import os
 import sys
+import time
+import uuid
 from itertools import chain
+from pathlib import Path
 
 from twisted.application.service import Service
-from twisted.internet import defer, error, protocol, reactor
-from twisted.logger import Logger
+from twisted.internet import defer, error, protocol, reactor, task
+from twisted.logger import Logger, LogLevel
 
-from scrapyd import __version__
+from scrapyd import __version__, sqlite
 from scrapyd.exceptions import LauncherError
-from scrapyd.interfaces import IEnvironment, IJobStorage, IPoller
+from scrapyd.extensions import create_stats_file, parse_heartbeat, read_stats
+from scrapyd.interfaces import IEnvironment, IJobIndex, IJobStorage, IPoller, ISpiderScheduler
+from scrapyd.limits import Limits, get_termination, remove_cgroup
+from scrapyd.metrics import JOBS_RETRIED, JOBS_STALLED, LEAKED_PROCESSES, SPAWN_SECONDS
+from scrapyd.processes import (
+    ProcessWatcher,
+    find_leftovers,
+    get_start_ticks,
+    is_running,
+    kill_leftovers,
+    signal_process,
+)
+from scrapyd.retries import RETRY_KEYS, RetryPolicies, get_not_before, should_retry
+from scrapyd.usage import read_proc
+from scrapyd.utils import get_file_path
 
 log = Logger()
 
+# The child's file descriptor for heartbeats, after stdin, stdout and stderr.
+HEARTBEAT_FD = 3
+# The child's file descriptor for its final resource usage, written by the runner as it exits.
+USAGE_FD = 4
+
+# The number of bytes at the end of a failed process's output file to log.
+OUTPUT_TAIL_SIZE = 4096
+
+# Twisted doesn't recognize "BREAK". See scrapyd.webservice.Cancel.
+DEFAULT_SIGNAL = "INT" if sys.platform != "win32" else 21
+
 
 def get_crawl_args(message):
     """Return the command-line arguments to use for the scrapy crawl process
@@ -20,6 +51,8 @@ def get_crawl_args(message):
     """
     copied = message.copy()
     del copied["_project"]
+    for key in RETRY_KEYS:
+        copied.pop(key, None)
 
     return [
         copied.pop("_spider"),
@@ -28,14 +61,61 @@ def get_crawl_args(message):
     ]
 
 
+def open_output_file(path):
+    """
+    Create the file's directory, and return a file descriptor to append to the file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+
+def read_tail(path, size=OUTPUT_TAIL_SIZE):
+    """
+    Return the last ``size`` bytes of the file, decoded, or ``None`` if the file can't be read.
+    """
+    try:
+        with Path(path).open("rb") as f:
+            f.seek(max(f.seek(0, os.SEEK_END) - size, 0))
+            return f.read().decode(errors="replace")
+    except OSError:
+        return None
+
+
 class Launcher(Service):
     name = "launcher"
 
     def __init__(self, config, app):
         self.processes = {}
+        # Slots that are waiting for a message or running a process, and the waiting slots' Deferreds.
+        self.slots = set()
+        self.idle = {}
         self.finished = app.getComponent(IJobStorage)
-        self.max_proc = self._get_max_proc(config)
+        self.jobindex = app.getComponent(IJobIndex)
+        self.max_proc = self.get_max_proc(config)
+        # While draining, the number of process slots to restore.
+        self.draining = False
+        self.drained_max_proc = None
+        # Running jobs are recorded, to reattach to their processes if Scrapyd restarts, if enabled. Otherwise, they are
+        # recorded in memory, so that instances sharing a dbs_dir don't reattach to each other's processes.
+        if config.getboolean("reattach_jobs", False):
+            self.running = sqlite.initialize(sqlite.SqliteRunningJobs, config, "jobs", "running_jobs")
+        else:
+            self.running = sqlite.SqliteRunningJobs()
         self.runner = config.get("runner", "scrapyd.runner")
+        self.usage_interval = config.getfloat("usage_interval", 0)
+        self.usage_sampler = task.LoopingCall(self._sample_usage)
+        self.limits = Limits(config)
+        self.retries = RetryPolicies(config)
+        self.sigint_timeout = config.getfloat("sigint_timeout", 60)
+        self.sigterm_timeout = config.getfloat("sigterm_timeout", 10)
+        # Heartbeats are read from a pipe, which Twisted only supports on POSIX.
+        self.heartbeat_interval = config.getfloat("heartbeat_interval", 0) if os.name == "posix" else 0
+        self.stall_timeout = config.getfloat("stall_timeout", 0)
+        self.cancel_stalled = config.getboolean("cancel_stalled", False)
+        self.stall_checker = task.LoopingCall(self._check_stalled)
+        self.stats_dir = config.get("stats_dir", "")
+        self.logs_dir = config.get("logs_dir", "logs")
+        self.output_to_file = config.getboolean("output_to_file", False) if os.name == "posix" else False
         self.app = app
 
     def startService(self):
@@ -46,43 +126,332 @@ class Launcher(Service):
             runner=self.runner,
             log_system="Launcher",
         )
-        for slot in range(self.max_proc):
-            self._get_message(slot)
+        self._reattach()
+        poller = self.app.getComponent(IPoller)
+        if hasattr(poller, "add_observer"):
+            poller.add_observer(self._expire)
+        self._add_slots()
+        if self.usage_interval:
+            self.usage_sampler.start(self.usage_interval, now=False)
+        if self.heartbeat_interval and self.stall_timeout:
+            self.stall_checker.start(self.heartbeat_interval, now=False)
+
+    def stopService(self):
+        super().stopService()
+        poller = self.app.getComponent(IPoller)
+        if hasattr(poller, "remove_observer"):
+            poller.remove_observer(self._expire)
+        for looping_call in (self.usage_sampler, self.stall_checker):
+            if looping_call.running:
+                looping_call.stop()
+
+    def resize(self, max_proc):
+        """
+        Set the number of process slots. Add slots, or remove idle slots now and occupied slots when their processes
+        end, without stopping any process. While draining, set the number of process slots to restore.
+        """
+        if self.draining:
+            self.drained_max_proc = max_proc
+            log.info("Process slots to restore after draining: max_proc={max_proc!r}", max_proc=max_proc)
+            return
+        self._resize(max_proc)
+
+    def drain(self, draining=True):  # noqa: FBT002
+        """
+        Stop or resume taking jobs from the queue. While draining, running processes continue, and the launcher is
+        drained once they end.
+        """
+        if draining == self.draining:
+            return
+        if draining:
+            self.drained_max_proc = self.max_proc
+            self._resize(0)
+            self.draining = True
+            log.info("Draining: running={running!r}", running=len(self.processes), log_system="Launcher")
+            self._check_drained()
+        else:
+            self.draining = False
+            log.info("Resuming", log_system="Launcher")
+            self._resize(self.drained_max_proc)
+            self.drained_max_proc = None
+
+    @property
+    def drained(self):
+        return self.draining and not self.processes
+
+    def _check_drained(self):
+        if self.drained:
+            log.info("Drained: no processes are running", log_system="Launcher")
+
+    def _resize(self, max_proc):
+        previous, self.max_proc = self.max_proc, max_proc
+        # Remove the idle slots with the highest numbers.
+        for slot in sorted(self.idle, reverse=True)[: max(len(self.slots) - max_proc, 0)]:
+            self.slots.discard(slot)
+            self.idle.pop(slot).cancel()
+            log.debug("Process slot {slot} removed", slot=slot)
+        self._add_slots()
+        log.info(
+            "Process slots resized: max_proc={previous!r} -> {max_proc!r}, slots={slots!r}",
+            previous=previous,
+            max_proc=max_proc,
+            slots=len(self.slots),
+            log_system="Launcher",
+        )
+
+    def _add_slots(self):
+        # Add the free slots with the lowest numbers.
+        slot = 0
+        while len(self.slots) < self.max_proc:
+            if slot not in self.slots:
+                self._get_message(slot)
+            slot += 1
 
     def _get_message(self, slot):
         poller = self.app.getComponent(IPoller)
-        poller.next().addCallback(self._spawn_process, slot)
+        self.slots.add(slot)
+        self.idle[slot] = poller.next()
+        # A slot's Deferred is cancelled if the slot is removed.
+        self.idle[slot].addCallback(self._message_received, slot).addErrback(
+            lambda failure: failure.trap(defer.CancelledError)
+        )
         log.debug("Process slot {slot} ready", slot=slot)
 
+    def _message_received(self, message, slot):
+        del self.idle[slot]
+        self._spawn_process(message, slot)
+
+    @SPAWN_SECONDS.time()
     def _spawn_process(self, message, slot):
         project = message["_project"]
+        self.jobindex.pop(project, message["_job"])
+        # Copied before it's changed, to schedule a retry.
+        original = copy.deepcopy(message)
+
         environment = self.app.getComponent(IEnvironment)
         message.setdefault("settings", {})
         message["settings"].update(environment.get_settings(message))
+        limits = self.limits.get(project, message["_spider"], message.pop("_limits", None))
+        cgroup = self.limits.create_cgroup(limits)
 
         env = environment.get_environment(message, slot)
+        env.update(self.limits.get_environment(limits, cgroup))
+        env["SCRAPYD_SETSID"] = "1"
+        childFDs = self._get_child_fds(env)  # noqa: N806 Twisted's argument name
+        # A slot has one process at a time.
+        stats_file = Path(self.stats_dir) / f"{slot}.stats" if self.stats_dir else None
+        if stats_file is not None:
+            env["SCRAPYD_STATS_FILE"] = str(stats_file)
+        output_file = (
+            Path(get_file_path(self.logs_dir, project, message["_spider"], f"{message['_job']}.out").path)
+            if self.output_to_file and self.logs_dir
+            else None
+        )
         args = [sys.executable, "-m", self.runner, "crawl", *get_crawl_args(message)]
 
         process = ScrapyProcessProtocol(project, message["_spider"], message["_job"], env, args)
+        process.limits = limits
+        process.cgroup = cgroup
+        process.log_file = message["settings"].get("LOG_FILE")
+        process.message = original
+        process.attempt = original.get("_attempt", 1)
+        process.retry_of = original.get("_retry_of")
         process.deferred.addBoth(self._process_finished, slot)
 
+        output_fd = None
         try:
-            reactor.spawnProcess(process, sys.executable, args=args, env=env)
+            if stats_file is not None:
+                process.stats_file = stats_file
+                process.stats_buffer = create_stats_file(stats_file)
+            if output_file is not None:
+                output_fd = open_output_file(output_file)
+                # The child writes its stdout and stderr to the file, bypassing the reactor.
+                childFDs[1] = childFDs[2] = output_fd
+                process.output_file = output_file
+            reactor.spawnProcess(process, sys.executable, args=args, env=env, childFDs=childFDs)
         except OSError as e:
+            if cgroup is not None:
+                remove_cgroup(cgroup)
+            process.close_stats()
             raise LauncherError(f"{e}: args={args!r}") from e
+        finally:
+            # The child has its own copy.
+            if output_fd is not None:
+                os.close(output_fd)
+
+        if "max_runtime" in limits:
+            process.timeout_call = reactor.callLater(limits["max_runtime"], self._timeout, process)
 
         self.processes[slot] = process
+        self.running.add(process, slot)
+        self.jobindex.start(process, slot)
         log.debug("Process slot {slot} occupied", slot=slot)
 
+    def _get_child_fds(self, env):
+        # Twisted doesn't support customizing file descriptors on Windows.
+        if os.name != "posix":
+            return None
+        env["SCRAPYD_USAGE_FD"] = str(USAGE_FD)
+        child_fds = {0: "w", 1: "r", 2: "r", USAGE_FD: "r"}
+        if self.heartbeat_interval:
+            env["SCRAPYD_HEARTBEAT_FD"] = str(HEARTBEAT_FD)
+            env["SCRAPYD_HEARTBEAT_INTERVAL"] = str(self.heartbeat_interval)
+            child_fds[HEARTBEAT_FD] = "r"
+        return child_fds
+
+    def _reattach(self):
+        for slot, project, spider, job, pid, start_time, start_ticks, log_file, args in list(self.running):
+            process = ScrapyProcessProtocol(project, spider, job, env={}, args=args)
+            process.pid = pid
+            process.start_time = start_time
+            process.start_ticks = start_ticks
+            process.log_file = log_file
+
+            # os.kill() terminates the process on Windows.
+            if slot in self.slots or os.name != "posix" or not is_running(pid, start_ticks):
+                process.end_time = datetime.datetime.now()
+                self.running.remove(pid)
+                self.finished.add(process)
+                self.jobindex.finish(process)
+                process.log("warn", "Process ended while Scrapyd was stopped:")
+                continue
+
+            process.transport = ProcessWatcher(pid, process.reattachedEnded, start_ticks)
+            process.deferred.addBoth(self._process_finished, slot)
+            self.slots.add(slot)
+            self.processes[slot] = process
+            self.jobindex.start(process, slot)
+            process.log("info", "Process reattached:")
+            process.transport.start()
+
     def _process_finished(self, _, slot):
         process = self.processes.pop(slot)
         process.end_time = datetime.datetime.now()
+        for call in (process.timeout_call, process.signal_call):
+            if call is not None and call.active():
+                call.cancel()
+        if process.termination is None and (
+            termination := get_termination(process.limits, process.exit_signal, process.usage, process.cgroup)
+        ):
+            process.termination = termination
+            process.log("warn", f"Process exceeded its {termination}:")
+        if process.cgroup is not None:
+            remove_cgroup(process.cgroup)
+        process.close_stats()
+        self.running.remove(process.pid)
+        self._retry(process)
         self.finished.add(process)
+        self.jobindex.finish(process, slot)
         log.debug("Process slot {slot} vacated", slot=slot)
 
-        self._get_message(slot)
+        # Drain the slot, if the launcher was resized to fewer slots.
+        if len(self.slots) > self.max_proc:
+            self.slots.discard(slot)
+            log.debug("Process slot {slot} removed", slot=slot)
+            self._check_drained()
+        else:
+            self._get_message(slot)
+
+    def _expire(self, project, message):
+        job = ScrapyProcessProtocol(project, message["name"], message.get("_job"), env={}, args=[])
+        job.start_time = job.end_time = datetime.datetime.now()
+        job.termination = "expired"
+        job.attempt = message.get("_attempt", 1)
+        job.retry_of = message.get("_retry_of")
+        job.log("warn", "Job expired before it started:")
+        self.finished.add(job)
+        self.jobindex.expire(job)
+
+    def _retry(self, process):
+        # A reattached process's message and exit status are unknown.
+        if process.message is None:
+            return
+        policy = self.retries.get(process.project, process.spider, process.message.get("_retry"))
+        if not should_retry(policy, process.attempt, process.exit_code, process.exit_signal, process.termination):
+            return
+
+        message = process.message.copy()
+        project = message.pop("_project")
+        spider = message.pop("_spider")
+        priority = message.pop("_priority", 0)
+        del message["_job"]
+        message.update(_job=uuid.uuid1().hex, _attempt=process.attempt + 1, _retry_of=process.job)
+        not_before = get_not_before(policy, process.attempt)
+        try:
+            self.app.getComponent(ISpiderScheduler).schedule(
+                project, spider, priority=priority, _not_before=not_before, **message
+            )
+        except KeyError:  # the project was deleted
+            process.log("warn", "Process can't be retried, because its project was deleted:")
+            return
+
+        process.retried_as = message["_job"]
+        JOBS_RETRIED.inc(project)
+        process.log("info", f"Process will be retried as job {process.retried_as!r} after {not_before}:")
+
+    def stop(self, process, signal=None, *, escalate=True):
+        """
+        Send the ``signal`` (SIGINT by default) to the process. If ``escalate`` is true, send SIGTERM if the process is
+        still running after ``sigint_timeout`` seconds, then SIGKILL after ``sigterm_timeout`` seconds.
+        """
+        if process.signal_call is not None and process.signal_call.active():
+            process.signal_call.cancel()
+
+        signals = [signal or DEFAULT_SIGNAL]
+        if escalate:
+            signals.extend(["TERM", "KILL"])
+        self._send_signals(process, signals, [self.sigint_timeout, self.sigterm_timeout])
+
+    def wait(self, process, timeout):
+        """
+        Return a Deferred that fires with ``True`` when the process has ended and its job is finished, or with
+        ``False`` after ``timeout`` seconds.
+        """
+        deferred = defer.Deferred()
+
+        def ended(result):
+            if not deferred.called:
+                deferred.callback(True)  # noqa: FBT003
+            return result
+
+        process.deferred.addBoth(ended)
+        return deferred.addTimeout(timeout, reactor, onTimeoutCancel=lambda *_: False)
+
+    def _send_signals(self, process, signals, delays):
+        signal, *signals = signals
+        try:
+            signal_process(process, signal)
+        except error.ProcessExitedAlready:
+            return
+        if signals:
+            delay, *delays = delays
+            process.signal_call = reactor.callLater(delay, self._send_signals, process, signals, delays)
+
+    def _check_stalled(self):
+        now = time.monotonic()
+        for process in list(self.processes.values()):
+            if process.progress_time is None or process.stalled:
+                continue
+            if now - process.progress_time >= self.stall_timeout:
+                process.stalled = True
+                JOBS_STALLED.inc(process.project)
+                process.log("warn", f"Process made no progress in {self.stall_timeout:g} seconds:")
+                if self.cancel_stalled:
+                    if process.termination is None:
+                        process.termination = "stalled"
+                    self.stop(process)
+
+    def _timeout(self, process):
+        process.termination = "timeout"
+        process.log("warn", "Process exceeded its max_runtime:")
+        self.stop(process)
 
-    def _get_max_proc(self, config):
+    # One timer samples all processes.
+    def _sample_usage(self):
+        for process in self.processes.values():
+            process.sample_usage()
+
+    def get_max_proc(self, config):
         max_proc = config.getint("max_proc", 0)
         if max_proc:
             return max_proc
@@ -103,6 +472,36 @@ class ScrapyProcessProtocol(protocol.ProcessProtocol):  # noqa: PLW1641 missing
         self.pid = None
         self.start_time = datetime.datetime.now()
         self.end_time = None
+        self.exit_code = None
+        self.exit_signal = None
+        self.usage = None
+        self.limits = {}
+        self.cgroup = None
+        self.termination = None
+        self.timeout_call = None
+        self.signal_call = None
+        # The last heartbeat's counts, the monotonic time at which they last changed, and any incomplete line.
+        self.heartbeat = None
+        self.progress_time = None
+        self.stalled = False
+        self._heartbeat_buffer = b""
+        # The final resource usage reported by the process, as received.
+        self._usage_buffer = b""
+        # The stats from the stats file, as of the last read, and the stats file and its memory map while running.
+        self.stats = None
+        self.stats_file = None
+        self.stats_buffer = None
+        # The file to which the process writes its stdout and stderr, and the file's end, if the process failed.
+        self.output_file = None
+        self.output_tail = None
+        # The process's start time in clock ticks after boot and its log file, to reattach to it after a restart.
+        self.start_ticks = None
+        self.log_file = None
+        # The message to schedule again, if retried, the attempt number and the IDs of the previous and next attempts.
+        self.message = None
+        self.attempt = 1
+        self.retry_of = None
+        self.retried_as = None
         self.args = args
         self.env = env
         self.deferred = defer.Deferred()
@@ -133,16 +532,126 @@ class ScrapyProcessProtocol(protocol.ProcessProtocol):  # noqa: PLW1641 missing
     def errReceived(self, data):
         log.error(data.rstrip(), log_system=f"Launcher,{self.pid}/stderr")
 
+    def childDataReceived(self, childFD, data):
+        if childFD == HEARTBEAT_FD:
+            self.heartbeatReceived(data)
+        elif childFD == USAGE_FD:
+            self._usage_buffer += data
+        else:
+            super().childDataReceived(childFD, data)
+
+    def heartbeatReceived(self, data):
+        *lines, self._heartbeat_buffer = (self._heartbeat_buffer + data).split(b"\n")
+        if not lines:
+            return
+        try:
+            heartbeat = parse_heartbeat(lines[-1])
+        except ValueError:
+            log.emit(
+                LogLevel.warn,
+                "Invalid heartbeat {line!r}",
+                line=lines[-1],
+                log_system=f"Launcher,{self.pid}/heartbeat",
+            )
+            return
+        if heartbeat != self.heartbeat:
+            self.heartbeat = heartbeat
+            self.progress_time = time.monotonic()
+            if self.stalled:
+                self.stalled = False
+                self.log("info", "Process made progress:")
+
+    def sample_usage(self):
+        """
+        Update and return the resource usage from the ``/proc`` filesystem, if available. Values that are unavailable,
+        like the peak memory of an exited process, are kept from the previous sample.
+        """
+        if self.pid is not None and (usage := read_proc(self.pid)) is not None:
+            self.usage = {**(self.usage or {}), **usage}
+        return self.usage
+
+    def report_usage(self):
+        """
+        Update the resource usage from the process's final report, if any. The report is more complete and precise than
+        the ``/proc`` filesystem, like the peak memory, which is released as the process exits.
+        """
+        if not self._usage_buffer:
+            return
+        try:
+            usage = json.loads(self._usage_buffer)
+        except ValueError:
+            log.emit(
+                LogLevel.warn,
+                "Invalid usage report {data!r}",
+                data=self._usage_buffer,
+                log_system=f"Launcher,{self.pid}/usage",
+            )
+        else:
+            self.usage = {**(self.usage or {}), **usage}
+            self.usage.pop("rss", None)
+        self._usage_buffer = b""
+
+    def read_stats(self):
+        """
+        Update and return the stats from the stats file's memory map, if open.
+        """
+        if self.stats_buffer is not None and (stats := read_stats(self.stats_buffer)) is not None:
+            self.stats = stats
+        return self.stats
+
+    def close_stats(self):
+        """
+        Read the final stats, then close and delete the stats file.
+        """
+        if self.stats_buffer is None:
+            return
+        self.read_stats()
+        self.stats_buffer.close()
+        self.stats_buffer = None
+        try:
+            self.stats_file.unlink()
+        except OSError as e:
+            log.emit(LogLevel.warn, "Failed to delete stats file {path}: {error}", path=self.stats_file, error=e)
+
     def connectionMade(self):
         self.pid = self.transport.pid
+        self.start_ticks = get_start_ticks(self.pid)
         self.log("info", "Process started:")
 
+    def childConnectionLost(self, childFD):
+        # The process closes its stdout and stderr as it exits, before Twisted reaps it (and clears the transport's
+        # pid), so its usage can still be read, in case it doesn't report its final usage (see report_usage).
+        if childFD in {1, 2} and self.transport.pid is not None and self.sample_usage() is not None:
+            self.usage.pop("rss", None)
+        super().childConnectionLost(childFD)
+
     # https://docs.twisted.org/en/stable/core/howto/process.html#things-that-can-happen-to-your-processprotocol
+    def processExited(self, reason):
+        # Descendants that outlive the process keep its stdout and stderr open, which delays processEnded.
+        if killed := kill_leftovers(find_leftovers(self.pid, self.cgroup)):
+            LEAKED_PROCESSES.inc(self.project, amount=killed)
+            self.log("warn", f"Process left {killed} descendant processes running, which were killed:")
+
     def processEnded(self, status):
+        self.report_usage()
+        self.exit_code = status.value.exitCode
+        self.exit_signal = status.value.signal
         if isinstance(status.value, error.ProcessDone):
             self.log("info", "Process finished:")
         else:
             self.log("error", f"Process died: exitstatus={status.value.exitCode!r}")
+            if self.output_file is not None and (tail := read_tail(self.output_file)):
+                self.output_tail = tail
+                log.error(tail.rstrip(), log_system=f"Launcher,{self.pid}/output")
+        self.deferred.callback(self)
+
+    def reattachedEnded(self):
+        """
+        Called by the :class:`~scrapyd.processes.ProcessWatcher` when a process that the launcher reattached to ends.
+        Its exit status is unknown.
+        """
+        self.processExited(None)
+        self.log("info", "Reattached process ended:")
         self.deferred.callback(self)
 
     def log(self, level, action):
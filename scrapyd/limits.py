@@ -0,0 +1,153 @@
+"""
+Resource limits of jobs' processes.
+
+Limits are applied by the runner in the job's process, with :func:`resource.setrlimit`, except that, if ``cgroup_dir``
+is set, the memory limit is applied with a cgroup v2 directory per job. The maximum runtime is enforced by the launcher.
+
+.. versionadded:: 1.7.0
+"""
+
+import os
+import signal
+import sys
+import uuid
+from contextlib import suppress
+from pathlib import Path
+
+from twisted.logger import Logger, LogLevel
+
+log = Logger()
+
+# Limit name -> environment variable read by the runner.
+ENVIRONMENT = {
+    "memory_limit": "SCRAPYD_MEMORY_LIMIT",
+    "cpu_limit": "SCRAPYD_CPU_LIMIT",
+    "files_limit": "SCRAPYD_FILES_LIMIT",
+}
+# Limits that are applied by the launcher.
+NAMES = (*ENVIRONMENT, "max_runtime")
+# Seconds between the soft CPU limit, which sends SIGXCPU, and the hard CPU limit, which sends SIGKILL.
+CPU_GRACE = 5
+MEGABYTE = 2**20
+
+
+class Limits:
+    def __init__(self, config):
+        self.config = config
+        self.defaults = {name: config.getint(name, 0) for name in NAMES}
+        self.cgroup_dir = config.get("cgroup_dir", "")
+
+    def get(self, project, spider, overrides=None):
+        """
+        Return the non-zero limits of a job, from the ``overrides`` (schedule.json parameters), the spider's
+        ``[limits.<project>.<spider>]`` section, the project's ``[limits.<project>]`` section or the ``[scrapyd]``
+        section, in that order of precedence.
+        """
+        limits = self.defaults.copy()
+        for section in (f"limits.{project}", f"limits.{project}.{spider}"):
+            values = dict(self.config.items(section, default=[]))
+            limits.update((name, int(values[name])) for name in NAMES if name in values)
+        limits.update(overrides or {})
+        return {name: value for name, value in limits.items() if value}
+
+    def create_cgroup(self, limits):
+        """
+        Return a new cgroup directory that applies the memory limit, or ``None`` if not configured or not writable.
+        """
+        if not self.cgroup_dir or "memory_limit" not in limits:
+            return None
+
+        path = Path(self.cgroup_dir) / f"scrapyd-{uuid.uuid1().hex}"
+        try:
+            path.mkdir()
+            (path / "memory.max").write_text(f"{limits['memory_limit'] * MEGABYTE}\n")
+        except OSError as e:
+            log.emit(LogLevel.warn, "Failed to create cgroup {path}: {error}", path=path, error=e)
+            with suppress(OSError):
+                path.rmdir()
+            return None
+        # Swap accounting can be disabled.
+        with suppress(OSError):
+            (path / "memory.swap.max").write_text("0\n")
+        return path
+
+    def get_environment(self, limits, cgroup=None):
+        """
+        Return the environment variables that the runner reads to apply the limits. If the runner joins the
+        ``cgroup``, it doesn't apply the memory limit itself.
+        """
+        env = {ENVIRONMENT[name]: str(value) for name, value in limits.items() if name in ENVIRONMENT}
+        if cgroup is not None:
+            env["SCRAPYD_CGROUP"] = str(cgroup)
+        return env
+
+
+def get_termination(limits, exit_signal, usage=None, cgroup=None):
+    """
+    Return ``'memory_limit'`` or ``'cpu_limit'`` if the job's process was killed for breaching that limit, or ``None``.
+    """
+    if cgroup is not None and oom_killed(cgroup):
+        return "memory_limit"
+    if "cpu_limit" in limits and exit_signal is not None:
+        if exit_signal == getattr(signal, "SIGXCPU", None):
+            return "cpu_limit"
+        # The process handled SIGXCPU, and reached the hard limit.
+        cpu = usage.get("cpu_user", 0) + usage.get("cpu_system", 0) if usage else 0
+        if exit_signal == getattr(signal, "SIGKILL", None) and cpu >= limits["cpu_limit"]:
+            return "cpu_limit"
+    return None
+
+
+def oom_killed(cgroup):
+    """
+    Return whether the kernel's OOM killer killed a process in the cgroup.
+    """
+    # https://docs.kernel.org/admin-guide/cgroup-v2.html#memory-interface-files
+    try:
+        events = dict(line.split() for line in (Path(cgroup) / "memory.events").read_text().splitlines())
+    except OSError:
+        return False
+    return int(events.get("oom_kill", 0)) > 0
+
+
+def remove_cgroup(cgroup):
+    try:
+        Path(cgroup).rmdir()
+    except OSError as e:  # for example, a descendant process is still running
+        log.emit(LogLevel.warn, "Failed to remove cgroup {path}: {error}", path=cgroup, error=e)
+
+
+def set_limits(environ=os.environ):
+    """
+    Apply the limits in the environment variables to the current process. Called by the runner.
+    """
+    memory = int(environ.get(ENVIRONMENT["memory_limit"], 0))
+    if cgroup := environ.get("SCRAPYD_CGROUP"):
+        try:
+            (Path(cgroup) / "cgroup.procs").write_text(f"{os.getpid()}\n")
+        except OSError as e:  # for example, if the user can't write to the cgroups' common ancestor
+            # The launcher logs the process's stderr.
+            sys.stderr.write(f"Failed to join cgroup {cgroup}, applying the memory limit with setrlimit: {e}\n")
+        else:
+            memory = 0
+
+    try:
+        import resource  # noqa: PLC0415 POSIX only
+    except ImportError:
+        return
+
+    if memory:
+        _setrlimit(resource, resource.RLIMIT_AS, memory * MEGABYTE, memory * MEGABYTE)
+    if cpu := int(environ.get(ENVIRONMENT["cpu_limit"], 0)):
+        _setrlimit(resource, resource.RLIMIT_CPU, cpu, cpu + CPU_GRACE)
+    if files := int(environ.get(ENVIRONMENT["files_limit"], 0)):
+        _setrlimit(resource, resource.RLIMIT_NOFILE, files, files)
+
+
+def _setrlimit(resource, which, soft, hard):
+    # An unprivileged process can't raise its hard limit.
+    _, maximum = resource.getrlimit(which)
+    if maximum != resource.RLIM_INFINITY:
+        soft = min(soft, maximum)
+        hard = min(hard, maximum)
+    resource.setrlimit(which, (soft, hard))
@@ -0,0 +1,310 @@
+"""
+Metrics, in the `Prometheus text format <https://prometheus.io/docs/instrumenting/exposition_formats/>`__.
+
+Metrics are updated where events occur, so that rendering them is cheap.
+
+.. versionadded:: 1.7.0
+"""
+
+import abc
+import datetime
+import functools
+import math
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import ContextDecorator
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQLITE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+JOB_BUCKETS = (1, 5, 10, 30, 60, 300, 600, 1800, 3600, 7200, 14400, 43200, 86400)
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    @abc.abstractmethod
+    def samples(self):
+        """
+        Yield ``(suffix, labels, value)`` tuples, in which ``labels`` is a tuple of ``(name, value)`` tuples.
+        """
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for suffix, labels, value in self.samples():
+            if labels:
+                formatted = ",".join(f'{name}="{_escape(label)}"' for name, label in labels)
+                yield f"{self.name}{suffix}{{{formatted}}} {_format_value(value)}"
+            else:
+                yield f"{self.name}{suffix} {_format_value(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = defaultdict(float)
+
+    def inc(self, *labelvalues, amount=1):
+        self.values[labelvalues] += amount
+
+    def samples(self):
+        for labelvalues, value in self.values.items():
+            yield "", tuple(zip(self.labelnames, labelvalues, strict=True)), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *labelvalues):
+        self.values[labelvalues] = value
+
+
+class GaugeFunction(Metric):
+    """
+    A gauge whose values are read from a function, which returns a mapping of label values to values.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames, function):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def samples(self):
+        for labelvalues, value in self.function().items():
+            yield "", tuple(zip(self.labelnames, labelvalues, strict=True)), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket, including +Inf], sum
+        self.values = {}
+
+    def observe(self, value, *labelvalues):
+        if (state := self.values.get(labelvalues)) is None:
+            state = self.values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, *labelvalues):
+        """
+        Return a context manager and decorator that observes the duration of its block or function.
+        """
+        return Timer(self, labelvalues)
+
+    def samples(self):
+        for labelvalues, (counts, total) in self.values.items():
+            labels = tuple(zip(self.labelnames, labelvalues, strict=True))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                yield "_bucket", (*labels, ("le", _format_value(bound))), cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+
+class Timer(ContextDecorator):
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+        self.start = None
+
+    # Support recursive calls, when used as a decorator.
+    def _recreate_cm(self):
+        return Timer(self.histogram, self.labelvalues)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+def time_method(histogram, *labelvalues):
+    """
+    Decorate a method to observe its duration, with the label values followed by the instance's ``table``.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with histogram.time(self.table, *labelvalues):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self, *metrics):
+        """
+        Return the registered metrics and any other ``metrics`` in the Prometheus text format, as bytes.
+        """
+        lines = [line for metric in (*self.metrics.values(), *metrics) for line in metric.render()]
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
+
+JOBS_FINISHED = REGISTRY.register(
+    Counter("scrapyd_jobs_finished_total", "Jobs whose process exited with code 0.", ("project",))
+)
+JOBS_FAILED = REGISTRY.register(
+    Counter("scrapyd_jobs_failed_total", "Jobs whose process exited with a non-zero code or signal.", ("project",))
+)
+JOB_RUNTIME = REGISTRY.register(
+    Histogram("scrapyd_job_runtime_seconds", "Time from a job's start to its end.", ("project",), JOB_BUCKETS)
+)
+JOB_QUEUE_WAIT = REGISTRY.register(
+    Histogram(
+        "scrapyd_job_queue_wait_seconds", "Time from a job's scheduling to its start.", ("project",), JOB_BUCKETS
+    )
+)
+JOBS_STALLED = REGISTRY.register(
+    Counter("scrapyd_jobs_stalled_total", "Jobs whose heartbeat showed no progress for stall_timeout.", ("project",))
+)
+JOBS_RETRIED = REGISTRY.register(
+    Counter("scrapyd_jobs_retried_total", "Failed jobs that were scheduled again by their retry policy.", ("project",))
+)
+JOBS_EXPIRED = REGISTRY.register(
+    Counter("scrapyd_jobs_expired_total", "Pending jobs that expired before they started.", ("project",))
+)
+JOBS_DEDUPLICATED = REGISTRY.register(
+    Counter(
+        "scrapyd_jobs_deduplicated_total",
+        "Jobs that were not scheduled, because a pending job had the same deduplication key.",
+        ("project",),
+    )
+)
+JOBS_REJECTED = REGISTRY.register(
+    Counter(
+        "scrapyd_jobs_rejected_total",
+        "Jobs that were not scheduled, because the node or project had its maximum number of pending jobs.",
+        ("project", "limit"),
+    )
+)
+PERIODIC_FIRES = REGISTRY.register(
+    Counter(
+        "scrapyd_periodic_fires_total",
+        "Fires of periodic schedules, by outcome: scheduled, skipped or failed.",
+        ("project", "outcome"),
+    )
+)
+LEAKED_PROCESSES = REGISTRY.register(
+    Counter(
+        "scrapyd_leaked_processes_total",
+        "Processes left running by jobs' processes after they exited, which were killed.",
+        ("project",),
+    )
+)
+SPAWN_SECONDS = REGISTRY.register(Histogram("scrapyd_launcher_spawn_seconds", "Time to spawn a job's process."))
+POLL_SECONDS = REGISTRY.register(Histogram("scrapyd_poller_poll_seconds", "Time to poll the spider queues."))
+SQLITE_SECONDS = REGISTRY.register(
+    Histogram("scrapyd_sqlite_seconds", "Time of SQLite operations.", ("table", "operation"), SQLITE_BUCKETS)
+)
+REACTOR_LAG = REGISTRY.register(
+    Histogram("scrapyd_reactor_lag_seconds", "Delay of a periodic call, beyond its interval.")
+)
+API_RATE_LIMITED = REGISTRY.register(
+    Counter(
+        "scrapyd_api_rate_limited_total",
+        "Webservice requests that were rejected, because the client exceeded its rate limit.",
+        ("endpoint",),
+    )
+)
+API_CACHE = REGISTRY.register(
+    Counter(
+        "scrapyd_api_cache_total",
+        "Requests to cacheable webservices, by result: hit, miss or not_modified.",
+        ("endpoint", "result"),
+    )
+)
+API_SECONDS = REGISTRY.register(
+    Histogram("scrapyd_api_request_seconds", "Time to render a webservice response.", ("endpoint",))
+)
+
+
+class JobMetrics:
+    """
+    A job index observer that counts finished, failed and expired jobs, and observes their runtime and queue wait.
+    """
+
+    def __init__(self):
+        # (project, job ID) -> monotonic times when scheduled
+        self.scheduled = defaultdict(deque)
+
+    def __call__(self, event):
+        project = event["project"]
+        key = (project, event["job"])
+
+        if event["event"] == "scheduled":
+            self.scheduled[key].append(time.monotonic())
+        elif event["event"] == "started":
+            # Jobs that were pending at startup have no scheduled time.
+            if times := self.scheduled.get(key):
+                JOB_QUEUE_WAIT.observe(time.monotonic() - times.popleft(), project)
+                if not times:
+                    del self.scheduled[key]
+        elif event["event"] == "cancelled":
+            # A cancel removes all pending jobs with the job ID.
+            self.scheduled.pop(key, None)
+        elif event["event"] == "expired":
+            if times := self.scheduled.get(key):
+                times.popleft()
+                if not times:
+                    del self.scheduled[key]
+            JOBS_EXPIRED.inc(project)
+        elif event["event"] in {"finished", "failed"}:
+            (JOBS_FINISHED if event["event"] == "finished" else JOBS_FAILED).inc(project)
+            runtime = datetime.datetime.fromisoformat(event["end_time"]) - datetime.datetime.fromisoformat(
+                event["start_time"]
+            )
+            JOB_RUNTIME.observe(runtime.total_seconds(), project)
+
+
+class LagMonitor:
+    """
+    Call :meth:`tick` every ``interval`` seconds, to observe how late the reactor runs it.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.last = None
+
+    def tick(self):
+        now = time.monotonic()
+        if self.last is not None:
+            REACTOR_LAG.observe(max(now - self.last - self.interval, 0))
+        self.last = now
@@ -0,0 +1,313 @@
+"""
+Periodic schedules, which schedule a spider's jobs at the times matching a cron expression, or at an interval.
+
+The next fire times of all schedules are kept in a heap, so that a fire costs O(log n), and a single timer waits for the
+earliest one.
+
+.. versionadded:: 1.7.0
+"""
+
+import datetime
+import functools
+import heapq
+import itertools
+import math
+import random
+import uuid
+
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.logger import Logger, LogLevel
+
+from scrapyd import sqlite
+from scrapyd.metrics import PERIODIC_FIRES
+
+log = Logger()
+
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+# The minimum, maximum and names of the minute, hour, day of month, month and day of week fields.
+FIELDS = (
+    (0, 59, ()),
+    (0, 23, ()),
+    (1, 31, ()),
+    (1, 12, ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")),
+    (0, 7, ("sun", "mon", "tue", "wed", "thu", "fri", "sat")),
+)
+# The number of years in which to look for a matching time, to detect expressions like "0 0 30 2 *".
+SEARCH_YEARS = 5
+
+
+def _parse_value(value, minimum, names):
+    if value in names:
+        return names.index(value) + minimum
+    return int(value)
+
+
+def _parse_field(field, minimum, maximum, names):
+    values = set()
+    for part in field.lower().split(","):
+        range_, slash, step = part.partition("/")
+        step = int(step) if slash else 1
+        if range_ == "*":
+            start, end = minimum, maximum
+        else:
+            start, dash, end = range_.partition("-")
+            start = _parse_value(start, minimum, names)
+            # "a/n" means "a-<maximum>/n".
+            end = _parse_value(end, minimum, names) if dash else (maximum if slash else start)
+        if step < 1 or not minimum <= start <= end <= maximum:
+            raise ValueError(f"{part!r} is out of range")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """
+    A cron expression: five space-separated fields (minute, hour, day of month, month and day of week), or an alias
+    like ``@daily``. Fields accept ``*``, numbers, ranges (``1-5``), steps (``*/15``, ``0-30/10``), lists (``1,15``) and
+    month and day names (``jan``, ``mon``). Like cron, if both the day of month and the day of week are restricted, a
+    day matches if either matches.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.lower(), expression).split()
+        if len(fields) != len(FIELDS):
+            raise ValueError(f"{expression!r} doesn't have {len(FIELDS)} fields")
+
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *spec) for field, spec in zip(fields, FIELDS, strict=True)
+        )
+        # 0 and 7 are Sunday.
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.either_day = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+        self.next(datetime.datetime.now())
+
+    def _match_day(self, time):
+        day = time.day in self.days
+        # Python's Monday is 0, and cron's Sunday is 0.
+        weekday = (time.weekday() + 1) % 7 in self.weekdays
+        return day or weekday if self.either_day else day and weekday
+
+    def next(self, after):
+        """
+        Return the first matching time after ``after``. Raise :exc:`ValueError` if none.
+        """
+        time = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = time.replace(year=time.year + SEARCH_YEARS, month=1, day=1)
+        while time < limit:
+            if time.month not in self.months:
+                time = (time.replace(day=1) + datetime.timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._match_day(time):
+                time = time.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif time.hour not in self.hours:
+                time = time.replace(minute=0) + datetime.timedelta(hours=1)
+            elif time.minute not in self.minutes:
+                time += datetime.timedelta(minutes=1)
+            else:
+                return time
+        raise ValueError(f"{self.expression!r} matches no time")
+
+
+class PeriodicSchedule:
+    def __init__(self, project, name, definition, next_time=None, last_job=None):
+        self.project = project
+        self.name = name
+        self.definition = definition
+        self.cron = None if definition.get("cron") is None else Cron(definition["cron"])
+        self.interval = (
+            None if definition.get("interval") is None else datetime.timedelta(seconds=definition["interval"])
+        )
+        # The time at which the schedule fires, before jitter.
+        self.next_time = next_time
+        self.last_job = last_job
+
+    def advance(self, now):
+        """
+        Set the next time to the first time after ``now``. Interval schedules keep their phase.
+        """
+        if self.cron is not None:
+            self.next_time = self.cron.next(now)
+        else:
+            previous = self.next_time or now
+            self.next_time = previous + max(1, math.floor((now - previous) / self.interval) + 1) * self.interval
+
+    def get_fire_time(self):
+        return self.next_time + datetime.timedelta(seconds=random.uniform(0, self.definition["jitter"]))  # noqa: S311
+
+
+class PeriodicScheduler(Service):
+    """
+    Schedule jobs from periodic schedules, which are persisted in the ``jobs`` database.
+    """
+
+    name = "periodic"
+
+    def __init__(self, config, scheduler, jobindex):
+        self.scheduler = scheduler
+        self.jobindex = jobindex
+        self.jitter = config.getfloat("schedule_jitter", 0)
+        self.config = config
+        # (project, name) -> PeriodicSchedule
+        self.schedules = {}
+        # Heap of [fire time, sequence number, PeriodicSchedule or None if removed or replaced].
+        self.heap = []
+        # (project, name) -> heap entry
+        self.entries = {}
+        self.counter = itertools.count()
+        self.call = None
+
+        # Don't create the database until a schedule is added, in case periodic schedules aren't used.
+        existing = self.storage if sqlite.exists(config, "jobs") else ()
+        now = datetime.datetime.now()
+        for project, name, definition, next_time, last_job in existing:
+            schedule = PeriodicSchedule(project, name, definition, next_time, last_job)
+            # Skip the times that passed while Scrapyd was stopped.
+            if schedule.next_time <= now:
+                schedule.advance(now)
+                self.storage.update(project, name, schedule.next_time, last_job)
+            self._push(schedule)
+
+    @functools.cached_property
+    def storage(self):
+        return sqlite.initialize(sqlite.SqlitePeriodicSchedules, self.config, "jobs", "periodic_schedules")
+
+    def startService(self):
+        super().startService()
+        self._set_call()
+
+    def stopService(self):
+        super().stopService()
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+    def add(self, project, name, definition):
+        """
+        Add or replace a periodic schedule, and return it. Raise :exc:`ValueError` if its cron expression is invalid.
+        A replaced schedule's last job is kept, to skip fires while it is running or pending.
+        """
+        previous = self.schedules.get((project, name))
+        schedule = PeriodicSchedule(project, name, definition, last_job=previous and previous.last_job)
+        schedule.advance(datetime.datetime.now())
+        self.storage.put(project, name, definition, schedule.next_time, schedule.last_job)
+        self._discard(project, name)
+        self._push(schedule)
+        self._set_call()
+        return schedule
+
+    def remove(self, project, name):
+        """
+        Remove a periodic schedule, and return whether it existed.
+        """
+        # Don't create the database to remove nothing.
+        if (project, name) not in self.schedules and not sqlite.exists(self.config, "jobs"):
+            return False
+        self._discard(project, name)
+        return bool(self.storage.remove(project, name))
+
+    def list(self, project=None):
+        return [
+            schedule
+            for (schedule_project, _), schedule in sorted(self.schedules.items())
+            if project is None or schedule_project == project
+        ]
+
+    def get_fire_time(self, schedule):
+        return self.entries[(schedule.project, schedule.name)][0]
+
+    def fire(self):
+        self.call = None
+        now = datetime.datetime.now()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, schedule = heapq.heappop(self.heap)
+            if schedule is None:
+                continue
+            self._fire(schedule)
+            schedule.advance(now)
+            self.storage.update(schedule.project, schedule.name, schedule.next_time, schedule.last_job)
+            self._push(schedule)
+        self._set_call()
+
+    def _fire(self, schedule):
+        project = schedule.project
+        definition = schedule.definition
+
+        entry = None if schedule.last_job is None else self.jobindex.get(project, schedule.last_job)
+        for state, skip, active in (
+            ("running", definition["skip_if_running"], entry is not None and entry.slots),
+            ("pending", definition["skip_if_pending"], entry is not None and entry.pending),
+        ):
+            if skip and active:
+                log.info(
+                    "Periodic schedule skipped, because its last job is still {state}: "
+                    "project={project!r} name={name!r} job={job!r}",
+                    state=state,
+                    project=project,
+                    name=schedule.name,
+                    job=schedule.last_job,
+                )
+                PERIODIC_FIRES.inc(project, "skipped")
+                return
+
+        job = uuid.uuid1().hex
+        try:
+            self.scheduler.schedule(
+                project,
+                definition["spider"],
+                priority=definition["priority"],
+                settings=definition["settings"],
+                _job=job,
+                **definition["args"],
+            )
+        except KeyError:  # the project was deleted
+            log.emit(
+                LogLevel.warn,
+                "Periodic schedule can't fire, because its project was deleted: project={project!r} name={name!r}",
+                project=project,
+                name=schedule.name,
+            )
+            PERIODIC_FIRES.inc(project, "failed")
+            return
+
+        schedule.last_job = job
+        PERIODIC_FIRES.inc(project, "scheduled")
+        log.info(
+            "Periodic schedule fired: project={project!r} name={name!r} job={job!r}",
+            project=project,
+            name=schedule.name,
+            job=job,
+        )
+
+    def _push(self, schedule):
+        key = (schedule.project, schedule.name)
+        entry = [schedule.get_fire_time(), next(self.counter), schedule]
+        self.schedules[key] = schedule
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+
+    def _discard(self, project, name):
+        # Removing an entry from the middle of the heap is O(n), so mark it as removed, instead.
+        if (entry := self.entries.pop((project, name), None)) is not None:
+            entry[-1] = None
+        self.schedules.pop((project, name), None)
+
+    def _set_call(self):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+        while self.heap and self.heap[0][-1] is None:
+            heapq.heappop(self.heap)
+        if self.running and self.heap:
+            delay = (self.heap[0][0] - datetime.datetime.now()).total_seconds()
+            self.call = reactor.callLater(max(0, delay), self.fire)
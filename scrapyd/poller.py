@@ -1,7 +1,11 @@
+import datetime
+
+from twisted.internet import reactor
 from twisted.internet.defer import DeferredQueue, inlineCallbacks, maybeDeferred
 from zope.interface import implementer
 
 from scrapyd.interfaces import IPoller
+from scrapyd.metrics import POLL_SECONDS
 from scrapyd.utils import get_spider_queues
 
 
@@ -11,22 +15,63 @@ class QueuePoller:
         self.config = config
         self.update_projects()
         self.dq = DeferredQueue()
+        # A call to poll when the next delayed job is due, instead of at the next poll_interval.
+        self.due_call = None
+        self.observers = []
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
 
     @inlineCallbacks
     def poll(self):
-        for project, queue in self.queues.items():
-            while (yield maybeDeferred(queue.count)):
-                # If the "waiting" backlog is empty (that is, if the maximum number of Scrapy processes are running):
-                if not self.dq.waiting:
-                    return
-                message = (yield maybeDeferred(queue.pop)).copy()
-                # The message can be None if, for example, two Scrapyd instances share a spider queue database.
-                if message is not None:
+        with POLL_SECONDS.time():
+            # Purge expired jobs in bulk, instead of popping them. The method is optional, for older implementations.
+            for project, queue in self.queues.items():
+                if not hasattr(queue, "purge_expired"):
+                    continue
+                for message in (yield maybeDeferred(queue.purge_expired)):
+                    for observer in self.observers:
+                        observer(project, message)
+
+            for project, queue in self.queues.items():
+                while (yield maybeDeferred(queue.count)):
+                    # If the "waiting" backlog is empty (that is, if the maximum number of Scrapy processes are running):
+                    if not self.dq.waiting:
+                        return
+                    message = yield maybeDeferred(queue.pop)
+                    # The message can be None if no pending job is due, or if, for example, two Scrapyd instances share
+                    # a spider queue database.
+                    if message is None:
+                        break
+                    message = message.copy()
                     message["_project"] = project
                     message["_spider"] = message.pop("name")
                     # Pop a dummy item from the "waiting" backlog. and fire the message's callbacks.
                     self.dq.put(message)
 
+            yield self._set_due_call()
+
+    @inlineCallbacks
+    def _set_due_call(self):
+        next_due = None
+        for queue in self.queues.values():
+            # The method is optional, for older implementations.
+            if not hasattr(queue, "next_due"):
+                continue
+            due = yield maybeDeferred(queue.next_due)
+            if due is not None and (next_due is None or due < next_due):
+                next_due = due
+
+        if self.due_call is not None and self.due_call.active():
+            self.due_call.cancel()
+        self.due_call = None
+        if next_due is not None:
+            delay = max((next_due - datetime.datetime.now()).total_seconds(), 0)
+            self.due_call = reactor.callLater(delay, self.poll)
+
     def next(self):
         """
         Add a dummy item to the "waiting" backlog (based on Twisted's implementation of DeferredQueue).
@@ -0,0 +1,183 @@
+"""
+Process groups of jobs' processes.
+
+Each job's process starts a new session, so that signals are sent to its process group, and so that its descendants
+that outlive it can be found and killed. Because a session survives Scrapyd, a restarted Scrapyd can also reattach to
+the jobs' processes.
+
+.. versionadded:: 1.7.0
+"""
+
+import os
+import signal
+from contextlib import suppress
+from pathlib import Path
+
+from twisted.internet import error, reactor, task
+
+
+def start_session(environ=os.environ):
+    """
+    Start a new session and process group, if requested by the launcher. Called by the runner.
+    """
+    if environ.get("SCRAPYD_SETSID") and hasattr(os, "setsid"):
+        os.setsid()
+
+
+def signal_process(process, signum):
+    """
+    Send the signal (a name like ``"INT"`` or a number) to the process's group, if the process leads one, or else to
+    the process.
+    """
+    # The transport's pid is unset once the process is reaped, after which its pid can be reused.
+    if hasattr(os, "killpg") and process.pid is not None and process.transport.pid is not None:
+        try:
+            if os.getpgid(process.pid) == process.pid:
+                os.killpg(process.pid, signum if isinstance(signum, int) else getattr(signal, f"SIG{signum}"))
+                return
+        except ProcessLookupError:
+            pass
+    process.transport.signalProcess(signum)
+
+
+def find_leftovers(pid, cgroup=None, proc="/proc"):
+    """
+    Return the IDs of the processes in the session or process group of ``pid``, or in the ``cgroup``, other than
+    zombies, using the ``/proc`` filesystem.
+    """
+    pids = set()
+    try:
+        paths = [path for path in Path(proc).iterdir() if path.name.isdigit()]
+    except OSError:  # there is no /proc filesystem
+        paths = []
+
+    for path in paths:
+        if (fields := read_stat(path.name, proc)) is None:  # the process ended
+            continue
+        # Field (3) state is followed by ppid, pgrp and session.
+        state, _, pgrp, session = fields[:4]
+        if state != "Z" and pid in {int(pgrp), int(session)}:
+            pids.add(int(path.name))
+
+    if cgroup is not None:
+        # https://docs.kernel.org/admin-guide/cgroup-v2.html#core-interface-files
+        with suppress(OSError):
+            pids.update(int(line) for line in (Path(cgroup) / "cgroup.procs").read_text().split())
+
+    pids.discard(pid)
+    pids.discard(os.getpid())
+    return pids
+
+
+def kill_leftovers(pids):
+    """
+    Send SIGKILL to the processes, and return the number of processes that were signaled.
+    """
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:  # noqa: PERF203 the process ended, or is not ours
+            pass
+        else:
+            killed += 1
+    return killed
+
+
+def read_stat(pid, proc="/proc"):
+    """
+    Return the fields of ``/proc/<pid>/stat``, starting at field (3) state, or ``None`` if unavailable.
+    """
+    try:
+        stat = (Path(proc) / str(pid) / "stat").read_text()
+    except OSError:
+        return None
+    # https://man7.org/linux/man-pages/man5/proc_pid_stat.5.html
+    return stat[stat.rindex(")") + 2 :].split()
+
+
+def get_start_ticks(pid, proc="/proc"):
+    """
+    Return the time at which the process started, in clock ticks after boot, to detect the reuse of its ID, or
+    ``None`` if unavailable.
+    """
+    if (fields := read_stat(pid, proc)) is None:
+        return None
+    return int(fields[19])  # field (22) starttime
+
+
+def is_running(pid, start_ticks=None, proc="/proc"):
+    """
+    Return whether the process is running and, if ``start_ticks`` is set and ``/proc`` is available, whether it
+    started at that time. Unix only.
+    """
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:  # the process ended, or is not ours
+        return False
+    if (fields := read_stat(pid, proc)) is None:
+        return True
+    return fields[0] != "Z" and (start_ticks is None or int(fields[19]) == start_ticks)
+
+
+class ProcessWatcher:
+    """
+    Call ``callback`` when a process that isn't a child of Scrapyd ends, using a pidfd (Linux 5.3 or later) or else by
+    polling every ``interval`` seconds. Like a Twisted process transport, it has a ``pid`` and sends signals.
+    """
+
+    def __init__(self, pid, callback, start_ticks=None, interval=1):
+        self.pid = pid
+        self.callback = callback
+        self.start_ticks = start_ticks
+        self.pidfd = None
+        self.poller = task.LoopingCall(self._poll)
+        self.interval = interval
+
+    def start(self):
+        with suppress(AttributeError, OSError):
+            self.pidfd = os.pidfd_open(self.pid)
+        # Check the process after opening the pidfd, which refers to the process even if its ID is reused.
+        if not is_running(self.pid, self.start_ticks):
+            self._ended()
+        elif self.pidfd is not None:
+            reactor.addReader(self)
+        else:
+            self.poller.start(self.interval, now=False)
+
+    def signalProcess(self, signum):
+        if self.pid is None:
+            raise error.ProcessExitedAlready
+        try:
+            os.kill(self.pid, signum if isinstance(signum, int) else getattr(signal, f"SIG{signum}"))
+        except ProcessLookupError as e:
+            raise error.ProcessExitedAlready from e
+
+    # IReadDescriptor. A pidfd is readable when its process ends.
+    def fileno(self):
+        return self.pidfd
+
+    def doRead(self):
+        self._ended()
+
+    def connectionLost(self, reason):
+        pass
+
+    def logPrefix(self):
+        return "ProcessWatcher"
+
+    def _poll(self):
+        if not is_running(self.pid, self.start_ticks):
+            self._ended()
+
+    def _ended(self):
+        if self.pidfd is not None:
+            reactor.removeReader(self)
+            os.close(self.pidfd)
+            self.pidfd = None
+        if self.poller.running:
+            self.poller.stop()
+        self.pid = None
+        self.callback()
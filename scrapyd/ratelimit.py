@@ -0,0 +1,114 @@
+"""
+Rate limits of webservice requests, per client and endpoint.
+
+Each client (the basic authentication username, if enabled, or the remote address) has a token bucket per endpoint,
+which holds up to ``burst`` tokens and is refilled at ``rate`` tokens per second. A request takes a token, or is
+rejected if none is left.
+
+.. versionadded:: 1.7.0
+"""
+
+import itertools
+import time
+
+# The number of buckets above which full buckets are removed, since a full bucket is the same as a new bucket, and
+# then the oldest buckets, if still too many.
+MAX_BUCKETS = 10000
+
+
+def parse_limit(value, default_burst):
+    """
+    Return the rate and burst of a limit like ``"2"`` or ``"2 10"``, or ``None`` if the rate is 0. Raise
+    :exc:`ValueError` if invalid.
+    """
+    rate, *burst = value.split()
+    rate = float(rate)
+    burst = float(burst[0]) if burst else default_burst
+    if rate < 0:
+        raise ValueError(f"rate limit {value!r} is less than 0")
+    if not rate:
+        return None
+    return rate, max(burst, 1)
+
+
+class TokenBucket:
+    __slots__ = ("burst", "rate", "time", "tokens")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.time = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.time) * self.rate)
+        self.time = now
+
+    def take(self, now):
+        """
+        Take a token, and return 0, or return the number of seconds until a token is available.
+        """
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, config):
+        default_burst = config.getfloat("rate_limit_burst", 10)
+        self.default = parse_limit(config.get("rate_limit", "0"), default_burst)
+        # endpoint -> (rate, burst) or None
+        self.limits = {
+            endpoint: parse_limit(value, default_burst) for endpoint, value in config.items("rate_limits", default=[])
+        }
+        # (client, endpoint) -> TokenBucket
+        self.buckets = {}
+
+    def get_limit(self, endpoint):
+        """
+        Return the rate and burst of the endpoint's limit, or ``None`` if unlimited.
+        """
+        return self.limits.get(endpoint, self.default)
+
+    def check(self, client, endpoint, now=None):
+        """
+        Take a token from the client's bucket for the endpoint, and return 0, or return the number of seconds after
+        which to retry, if the client exceeded its rate limit.
+        """
+        if (limit := self.get_limit(endpoint)) is None:
+            return 0
+
+        if now is None:
+            now = time.monotonic()
+        key = (client, endpoint)
+        if (bucket := self.buckets.get(key)) is None:
+            if len(self.buckets) >= MAX_BUCKETS:
+                self.prune(now)
+            bucket = self.buckets[key] = TokenBucket(*limit, now)
+        return bucket.take(now)
+
+    def prune(self, now):
+        """
+        Remove the full buckets, and then the oldest buckets, to leave room for a new bucket.
+        """
+        for key, bucket in list(self.buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self.buckets[key]
+        # Dictionaries are ordered by insertion.
+        for key in list(itertools.islice(self.buckets, max(0, len(self.buckets) - MAX_BUCKETS + 1))):
+            del self.buckets[key]
+
+    def count(self, *, limited=False):
+        """
+        Return the number of clients with a bucket, or with an empty bucket if ``limited``, by endpoint.
+        """
+        now = time.monotonic()
+        counts = {}
+        for (_, endpoint), bucket in self.buckets.items():
+            bucket.refill(now)
+            if not limited or bucket.tokens < 1:
+                counts[(endpoint,)] = counts.get((endpoint,), 0) + 1
+        return counts
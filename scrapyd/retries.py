@@ -0,0 +1,109 @@
+"""
+Retry policies of failed jobs.
+
+When a job's process fails, the launcher asks the job's retry policy whether to retry it. If so, a new job is scheduled
+with the same spider, arguments and settings, to start after an exponential backoff with jitter.
+
+.. versionadded:: 1.7.0
+"""
+
+import datetime
+import random
+import signal
+
+# Message keys of the retry policy's overrides, the attempt number, the previous attempt's job ID and the job's priority,
+# which are read by the launcher, instead of being passed to the spider.
+RETRY_KEYS = ("_retry", "_attempt", "_retry_of", "_priority")
+# Option name -> type. The retryable exit codes, signals and terminations are space-separated.
+OPTIONS = {
+    "max_attempts": int,
+    "retry_exit_codes": str,
+    "retry_signals": str,
+    "retry_terminations": str,
+    "retry_delay": float,
+    "retry_max_delay": float,
+}
+DEFAULTS = {
+    "max_attempts": 1,
+    "retry_exit_codes": "*",
+    "retry_signals": "",
+    "retry_terminations": "",
+    "retry_delay": 60.0,
+    "retry_max_delay": 3600.0,
+}
+
+
+class RetryPolicies:
+    def __init__(self, config):
+        self.config = config
+        self.defaults = {name: type_(config.get(name, DEFAULTS[name])) for name, type_ in OPTIONS.items()}
+
+    def get(self, project, spider, overrides=None):
+        """
+        Return the retry policy of a job, from the ``overrides`` (schedule.json parameters), the spider's
+        ``[retry.<project>.<spider>]`` section, the project's ``[retry.<project>]`` section or the ``[scrapyd]``
+        section, in that order of precedence.
+        """
+        policy = self.defaults.copy()
+        for section in (f"retry.{project}", f"retry.{project}.{spider}"):
+            values = dict(self.config.items(section, default=[]))
+            policy.update((name, type_(values[name])) for name, type_ in OPTIONS.items() if name in values)
+        policy.update(overrides or {})
+        return policy
+
+
+def parse_overrides(values, prefix=""):
+    """
+    Return the retry options in ``values`` (strings), converted to their types. Raise :exc:`ValueError` if invalid,
+    naming the option with the ``prefix``.
+    """
+    overrides = {name: OPTIONS[name](value) for name, value in values.items() if value is not None}
+    if overrides.get("max_attempts", 1) < 1:
+        raise ValueError(f"{prefix}max_attempts must be 1 or more")
+    for name in ("retry_delay", "retry_max_delay"):
+        if overrides.get(name, 0) < 0:
+            raise ValueError(f"{prefix}{name} must be 0 or more")
+    for code in overrides.get("retry_exit_codes", "*").split():
+        if code != "*":
+            int(code)
+    for name in overrides.get("retry_signals", "").split():
+        if get_signal_name(name) is None:
+            raise ValueError(f"unknown signal {name!r}")
+    return overrides
+
+
+def get_signal_name(signum):
+    """
+    Return the name of the signal (a number or a name, with or without ``SIG``), without ``SIG``, or ``None``.
+    """
+    try:
+        return signal.Signals(int(signum)).name.removeprefix("SIG")
+    except ValueError:
+        name = str(signum).upper().removeprefix("SIG")
+        return name if hasattr(signal, f"SIG{name}") else None
+
+
+def should_retry(policy, attempt, exit_code, exit_signal, termination):
+    """
+    Return whether to retry a job, after its ``attempt``-th attempt ended with the exit code, signal and termination.
+    Canceled jobs and jobs whose process exited with code 0 (unless their ``termination`` is retryable) are not retried.
+    """
+    if termination == "cancelled" or attempt >= policy["max_attempts"]:
+        return False
+    if termination is not None and termination in policy["retry_terminations"].split():
+        return True
+    if exit_signal is not None:
+        return get_signal_name(exit_signal) in {get_signal_name(name) for name in policy["retry_signals"].split()}
+    if exit_code:
+        codes = policy["retry_exit_codes"].split()
+        return "*" in codes or str(exit_code) in codes
+    return False
+
+
+def get_not_before(policy, attempt, now=None):
+    """
+    Return the time before which the next attempt must not start: the ``retry_delay`` doubled after each attempt, up
+    to the ``retry_max_delay``, minus a random jitter of up to half.
+    """
+    delay = min(policy["retry_delay"] * 2 ** (attempt - 1), policy["retry_max_delay"])
+    return (now or datetime.datetime.now()) + datetime.timedelta(seconds=random.uniform(delay / 2, delay))  # noqa: S311
@@ -8,6 +8,10 @@ import pkg_resources
 
 from scrapyd import Config
 from scrapyd.exceptions import BadEggError
+from scrapyd.extensions import get_extensions
+from scrapyd.limits import set_limits
+from scrapyd.processes import start_session
+from scrapyd.usage import report_usage
 from scrapyd.utils import initialize_component
 
 
@@ -62,15 +66,29 @@ def project_environment(project):
 
 
 def main():
+    start_session()
+    set_limits()
     project = os.environ["SCRAPY_PROJECT"]
-    with project_environment(project):
-        from scrapy.cmdline import execute  # noqa: PLC0415
-
-        # This calls scrapy.utils.project.get_project_settings(). It uses SCRAPY_SETTINGS_MODULE if set. Otherwise, it
-        # calls scrapy.utils.conf.init_env(), which reads Scrapy's configuration sources, looks for a project matching
-        # SCRAPY_PROJECT in the [settings] section, and uses its value for SCRAPY_SETTINGS_MODULE.
-        # https://docs.scrapy.org/en/latest/topics/commands.html#configuration-settings
-        execute()
+    try:
+        with project_environment(project):
+            from scrapy.cmdline import execute  # noqa: PLC0415
+            from scrapy.utils.project import get_project_settings  # noqa: PLC0415
+
+            settings = None
+            # Add to EXTENSIONS_BASE, so that the project's EXTENSIONS setting is preserved, and can disable them.
+            if extensions := get_extensions():
+                settings = get_project_settings()
+                settings.set("EXTENSIONS_BASE", {**settings.getdict("EXTENSIONS_BASE"), **extensions})
+
+            # This calls scrapy.utils.project.get_project_settings(), if settings is None. It uses
+            # SCRAPY_SETTINGS_MODULE if set. Otherwise, it calls scrapy.utils.conf.init_env(), which reads Scrapy's
+            # configuration sources, looks for a project matching SCRAPY_PROJECT in the [settings] section, and uses
+            # its value for SCRAPY_SETTINGS_MODULE.
+            # https://docs.scrapy.org/en/latest/topics/commands.html#configuration-settings
+            execute(settings=settings)
+    finally:
+        # execute() calls sys.exit().
+        report_usage()
 
 
 if __name__ == "__main__":
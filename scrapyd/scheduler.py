@@ -1,17 +1,34 @@
 from zope.interface import implementer
 
 from scrapyd.interfaces import ISpiderScheduler
+from scrapyd.metrics import JOBS_DEDUPLICATED
 from scrapyd.utils import get_spider_queues
 
 
 @implementer(ISpiderScheduler)
 class SpiderScheduler:
-    def __init__(self, config):
+    def __init__(self, config, jobindex=None):
         self.config = config
+        self.jobindex = jobindex
         self.update_projects()
 
-    def schedule(self, project, spider_name, priority=0.0, **spider_args):
-        self.queues[project].add(spider_name, priority=priority, **spider_args)
+    def schedule(
+        self, project, spider_name, priority=0.0, _not_before=None, _dedupe_key=None, _expires_at=None, **spider_args
+    ):
+        # The priority is stored in the queue, but not in the popped message, so it's recorded to retry the job with it.
+        if priority:
+            spider_args["_priority"] = priority
+        # Queues that implement an older version of ISpiderQueue would store these keys as spider arguments.
+        options = {"_not_before": _not_before, "_dedupe_key": _dedupe_key, "_expires_at": _expires_at}
+        options = {key: value for key, value in options.items() if value is not None}
+        existing = self.queues[project].add(spider_name, priority=priority, **options, **spider_args)
+        if existing is not None:
+            JOBS_DEDUPLICATED.inc(project)
+            return existing.get("_job")
+
+        if self.jobindex is not None and "_job" in spider_args:
+            self.jobindex.schedule(project, spider_name, spider_args["_job"])
+        return spider_args.get("_job")
 
     def list_projects(self):
         return list(self.queues)
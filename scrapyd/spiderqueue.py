@@ -9,10 +9,15 @@ class SqliteSpiderQueue:
     def __init__(self, config, project, table="spider_queue"):
         self.q = sqlite.initialize(sqlite.JsonSqlitePriorityQueue, config, project, table)
 
-    def add(self, name, priority=0.0, **spider_args):
+    def add(self, name, priority=0.0, _not_before=None, _dedupe_key=None, _expires_at=None, **spider_args):
         message = spider_args.copy()
         message["name"] = name
-        self.q.put(message, priority=priority)
+        return self.q.put(
+            message, priority=priority, not_before=_not_before, dedupe_key=_dedupe_key, expires_at=_expires_at
+        )
+
+    def get_duplicate(self, dedupe_key):
+        return self.q.get_duplicate(dedupe_key)
 
     def pop(self):
         return self.q.pop()
@@ -20,11 +25,30 @@ class SqliteSpiderQueue:
     def count(self):
         return len(self.q)
 
+    def count_by_spider(self):
+        return self.q.count_by_spider()
+
     def list(self):
-        return [message for message, _ in self.q]
+        messages = []
+        for message, _, not_before, expires_at in self.q.iter_with_times():
+            if not_before is not None:
+                message["_not_before"] = not_before
+            if expires_at is not None:
+                message["_expires_at"] = expires_at
+            messages.append(message)
+        return messages
+
+    def next_due(self):
+        return self.q.next_due()
+
+    def purge_expired(self):
+        return self.q.purge_expired()
 
     def remove(self, func):
         return self.q.remove(func)
 
+    def remove_matching(self, spider=None, version=None, jobs=None, min_priority=None, max_priority=None):
+        return self.q.remove_matching(spider, version, jobs, min_priority, max_priority)
+
     def clear(self):
         self.q.clear()
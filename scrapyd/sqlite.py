@@ -2,6 +2,9 @@ import datetime
 import json
 import sqlite3
 from pathlib import Path
+from typing import ClassVar
+
+from scrapyd.metrics import SQLITE_SECONDS, time_method
 
 
 # The database argument is "jobs" (in SqliteJobStorage), or a project (in SqliteSpiderQueue) from get_spider_queues(),
@@ -20,6 +23,14 @@ def initialize(cls, config, database, table):
     return cls(connection_string, table)
 
 
+def exists(config, database):
+    """
+    Return whether the database exists in the ``dbs_dir``.
+    """
+    dbs_dir = config.get("dbs_dir", "dbs")
+    return dbs_dir != ":memory:" and (Path(dbs_dir) / f"{database}.db").exists()
+
+
 # https://docs.python.org/3/library/sqlite3.html#sqlite3-adapter-converter-recipes
 def adapt_datetime(val):
     return val.strftime("%Y-%m-%d %H:%M:%S.%f")
@@ -40,6 +51,7 @@ class SqliteMixin:
         # Regarding check_same_thread, see http://twistedmatrix.com/trac/ticket/4040
         self.conn = sqlite3.connect(self.database, check_same_thread=False)
 
+    @time_method(SQLITE_SECONDS, "count")
     def __len__(self):
         return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
 
@@ -57,6 +69,11 @@ class JsonSqlitePriorityQueue(SqliteMixin):
     SQLite priority queue. It relies on SQLite concurrency support for providing atomic inter-process operations.
 
     .. versionadded:: 1.0.0
+    .. versionchanged:: 1.7.0
+       Add indexed ``not_before`` and ``expires_at`` columns and a uniquely indexed ``dedupe_key`` column, which are
+       added to existing tables.
+       Add indexed ``spider`` and ``job`` columns and a ``version`` column, from the messages' ``name``, ``_job`` and
+       ``_version`` keys, which are added to and filled in existing tables.
     """
 
     def __init__(self, database=None, table="queue"):
@@ -65,16 +82,78 @@ class JsonSqlitePriorityQueue(SqliteMixin):
         self.conn.execute(
             f"CREATE TABLE IF NOT EXISTS {table} (id integer PRIMARY KEY, priority real key, message blob)"
         )
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for column, datatype in (
+            ("not_before", "datetime"),
+            ("dedupe_key", "text"),
+            ("expires_at", "datetime"),
+            ("spider", "text"),
+            ("job", "text"),
+            ("version", "text"),
+        ):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {datatype}")
+        if "spider" not in columns:
+            for _id, message in self.conn.execute(f"SELECT id, message FROM {table}").fetchall():
+                self.conn.execute(
+                    f"UPDATE {table} SET spider = ?, job = ?, version = ? WHERE id = ?",
+                    (*self._get_columns(self.decode(message)), _id),
+                )
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_not_before ON {table} (not_before)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_spider ON {table} (spider)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_job ON {table} (job)")
+        # NULL values are distinct, so only rows with a key are deduplicated.
+        self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_dedupe_key ON {table} (dedupe_key)")
+        self.conn.commit()
+
+    @time_method(SQLITE_SECONDS, "put")
+    def put(self, message, priority=0.0, not_before=None, dedupe_key=None, expires_at=None):
+        """
+        Add the message, and return ``None``. If a message with the same ``dedupe_key`` is queued, instead raise its
+        priority to ``priority`` if higher, and return it.
+        """
+        try:
+            self.conn.execute(
+                f"INSERT INTO {self.table} (priority, message, not_before, dedupe_key, expires_at, spider, job, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (priority, self.encode(message), not_before, dedupe_key, expires_at, *self._get_columns(message)),
+            )
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            row = self.conn.execute(f"SELECT message FROM {self.table} WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+            # If the row vanished, try again.
+            if row is None:
+                return self.put(message, priority, not_before, dedupe_key, expires_at)
+            self.conn.execute(
+                f"UPDATE {self.table} SET priority = MAX(priority, ?) WHERE dedupe_key = ?", (priority, dedupe_key)
+            )
+            self.conn.commit()
+            return self.decode(row[0])
 
-    def put(self, message, priority=0.0):
-        self.conn.execute(
-            f"INSERT INTO {self.table} (priority, message) VALUES (?, ?)",
-            (priority, self.encode(message)),
-        )
         self.conn.commit()
+        return None
 
+    @time_method(SQLITE_SECONDS, "get_duplicate")
+    def get_duplicate(self, dedupe_key):
+        """
+        Return the message with the ``dedupe_key``, or ``None``.
+        """
+        row = self.conn.execute(f"SELECT message FROM {self.table} WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+        return None if row is None else self.decode(row[0])
+
+    @time_method(SQLITE_SECONDS, "pop")
     def pop(self):
-        row = self.conn.execute(f"SELECT id, message FROM {self.table} ORDER BY priority DESC LIMIT 1").fetchone()
+        """
+        Pop the message with the highest priority, among those whose ``not_before`` time has passed and whose
+        ``expires_at`` time hasn't passed.
+        """
+        now = datetime.datetime.now()
+        row = self.conn.execute(
+            f"SELECT id, message FROM {self.table} WHERE (not_before IS NULL OR not_before <= ?) "
+            "AND (expires_at IS NULL OR expires_at > ?) ORDER BY priority DESC LIMIT 1",
+            (now, now),
+        ).fetchone()
         if row is None:
             return None
         _id, message = row
@@ -87,6 +166,35 @@ class JsonSqlitePriorityQueue(SqliteMixin):
         self.conn.commit()
         return self.decode(message)
 
+    @time_method(SQLITE_SECONDS, "next_due")
+    def next_due(self):
+        """
+        Return the earliest ``not_before`` time that hasn't passed, or ``None``.
+        """
+        row = self.conn.execute(
+            f"SELECT MIN(not_before) FROM {self.table} WHERE not_before > ?", (datetime.datetime.now(),)
+        ).fetchone()
+        return None if row[0] is None else datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S.%f")
+
+    @time_method(SQLITE_SECONDS, "purge_expired")
+    def purge_expired(self):
+        """
+        Delete the messages whose ``expires_at`` time has passed, in one transaction, and return them.
+        """
+        expired = []
+        rows = self.conn.execute(
+            f"SELECT id, message FROM {self.table} WHERE expires_at <= ? ORDER BY expires_at",
+            (datetime.datetime.now(),),
+        ).fetchall()
+        for _id, message in rows:
+            # A row can vanish, if another process popped or purged it.
+            if self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (_id,)).rowcount:
+                expired.append(self.decode(message))
+
+        self.conn.commit()
+        return expired
+
+    @time_method(SQLITE_SECONDS, "remove")
     def remove(self, func):
         deleted = 0
         for _id, message in self.conn.execute(f"SELECT id, message FROM {self.table}"):
@@ -100,10 +208,54 @@ class JsonSqlitePriorityQueue(SqliteMixin):
         self.conn.commit()
         return deleted
 
+    @time_method(SQLITE_SECONDS, "remove_matching")
+    def remove_matching(self, spider=None, version=None, jobs=None, min_priority=None, max_priority=None):
+        """
+        Delete the messages that match all the given filters, with one statement, and return their ``_job`` values.
+        """
+        conditions = []
+        parameters = []
+        for condition, value in (
+            ("spider = ?", spider),
+            ("version = ?", version),
+            ("priority >= ?", min_priority),
+            ("priority <= ?", max_priority),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if jobs is not None:
+            conditions.append(f"job IN ({', '.join('?' * len(jobs))})")
+            parameters.extend(jobs)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        removed = [row[0] for row in self.conn.execute(f"SELECT job FROM {self.table}{where} ORDER BY id", parameters)]
+        # If a row vanished or appeared, try again.
+        if self.conn.execute(f"DELETE FROM {self.table}{where}", parameters).rowcount != len(removed):
+            self.conn.rollback()
+            return self.remove_matching(spider, version, jobs, min_priority, max_priority)
+
+        self.conn.commit()
+        return removed
+
+    @time_method(SQLITE_SECONDS, "count_by_spider")
+    def count_by_spider(self):
+        """
+        Return the number of messages by ``spider`` column.
+        """
+        return dict(self.conn.execute(f"SELECT spider, COUNT(*) FROM {self.table} GROUP BY spider"))
+
+    @time_method(SQLITE_SECONDS, "clear")
     def clear(self):
         self.conn.execute(f"DELETE FROM {self.table}")
         self.conn.commit()
 
+    @staticmethod
+    def _get_columns(message):
+        if not isinstance(message, dict):
+            return None, None, None
+        return message.get("name"), message.get("_job"), message.get("_version")
+
     def __iter__(self):
         return (
             (self.decode(message), priority)
@@ -112,6 +264,24 @@ class JsonSqlitePriorityQueue(SqliteMixin):
             )
         )
 
+    def iter_with_times(self):
+        """
+        Like iterating the queue, but also yield each message's ``not_before`` and ``expires_at`` times, or ``None``.
+
+        .. versionadded:: 1.7.0
+        """
+        return (
+            (
+                self.decode(message),
+                priority,
+                None if not_before is None else datetime.datetime.strptime(not_before, "%Y-%m-%d %H:%M:%S.%f"),
+                None if expires_at is None else datetime.datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S.%f"),
+            )
+            for message, priority, not_before, expires_at in self.conn.execute(
+                f"SELECT message, priority, not_before, expires_at FROM {self.table} ORDER BY priority DESC"
+            )
+        )
+
 
 class SqliteFinishedJobs(SqliteMixin):
     """
@@ -121,6 +291,16 @@ class SqliteFinishedJobs(SqliteMixin):
        Job storage was previously in-memory only.
     """
 
+    # Columns added after version 1.3.0, which are added to existing tables.
+    added_columns: ClassVar = {
+        "usage": "blob",
+        "termination": "text",
+        "stats": "blob",
+        "attempt": "integer",
+        "retry_of": "text",
+        "retried_as": "text",
+    }
+
     def __init__(self, database=None, table="finished_jobs"):
         super().__init__(database, table)
 
@@ -128,14 +308,51 @@ class SqliteFinishedJobs(SqliteMixin):
             f"CREATE TABLE IF NOT EXISTS {table} "
             "(id integer PRIMARY KEY, project text, spider text, job text, start_time datetime, end_time datetime)"
         )
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for column, datatype in self.added_columns.items():
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {datatype}")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_end_time ON {table} (end_time)")
+        self.conn.commit()
 
+    @time_method(SQLITE_SECONDS, "add")
     def add(self, job):
+        usage = getattr(job, "usage", None)
+        stats = getattr(job, "stats", None)
         self.conn.execute(
-            f"INSERT INTO {self.table} (project, spider, job, start_time, end_time) VALUES (?, ?, ?, ?, ?)",
-            (job.project, job.spider, job.job, job.start_time, job.end_time),
+            f"INSERT INTO {self.table} "
+            "(project, spider, job, start_time, end_time, usage, termination, stats, attempt, retry_of, retried_as) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job.project,
+                job.spider,
+                job.job,
+                job.start_time,
+                job.end_time,
+                None if usage is None else self.encode(usage),
+                getattr(job, "termination", None),
+                None if stats is None else self.encode(stats),
+                getattr(job, "attempt", 1),
+                getattr(job, "retry_of", None),
+                getattr(job, "retried_as", None),
+            ),
         )
         self.conn.commit()
 
+    @time_method(SQLITE_SECONDS, "count_by_spider")
+    def count_by_spider(self, since=None):
+        """
+        Return the number of jobs that ended at or after ``since`` (or all jobs), by project and spider.
+        """
+        where, parameters = ("", ()) if since is None else ("WHERE end_time >= ?", (since,))
+        return {
+            (project, spider): count
+            for project, spider, count in self.conn.execute(
+                f"SELECT project, spider, COUNT(*) FROM {self.table} {where} GROUP BY project, spider", parameters
+            )
+        }
+
+    @time_method(SQLITE_SECONDS, "clear")
     def clear(self, finished_to_keep=None):
         where = ""
         if finished_to_keep:
@@ -155,8 +372,144 @@ class SqliteFinishedJobs(SqliteMixin):
                 job,
                 datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S.%f"),
                 datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S.%f"),
+                None if usage is None else self.decode(usage),
+                termination,
+                None if stats is None else self.decode(stats),
+                attempt or 1,
+                retry_of,
+                retried_as,
+            )
+            for (
+                project,
+                spider,
+                job,
+                start_time,
+                end_time,
+                usage,
+                termination,
+                stats,
+                attempt,
+                retry_of,
+                retried_as,
+            ) in self.conn.execute(
+                "SELECT project, spider, job, start_time, end_time, usage, termination, stats, attempt, retry_of, "
+                f"retried_as FROM {self.table} ORDER BY end_time DESC"
+            )
+        )
+
+
+class SqliteRunningJobs(SqliteMixin):
+    """
+    SQLite running jobs, so that Scrapyd can reattach to their processes after it restarts.
+
+    .. versionadded:: 1.7.0
+    """
+
+    def __init__(self, database=None, table="running_jobs"):
+        super().__init__(database, table)
+
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(id integer PRIMARY KEY, slot integer, project text, spider text, job text, pid integer, "
+            "start_time datetime, start_ticks integer, log_file text, args blob)"
+        )
+        self.conn.commit()
+
+    @time_method(SQLITE_SECONDS, "add")
+    def add(self, process, slot):
+        self.conn.execute(
+            f"INSERT INTO {self.table} (slot, project, spider, job, pid, start_time, start_ticks, log_file, args) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                slot,
+                process.project,
+                process.spider,
+                process.job,
+                process.pid,
+                process.start_time,
+                process.start_ticks,
+                process.log_file,
+                self.encode(process.args),
+            ),
+        )
+        self.conn.commit()
+
+    @time_method(SQLITE_SECONDS, "remove")
+    def remove(self, pid):
+        self.conn.execute(f"DELETE FROM {self.table} WHERE pid = ?", (pid,))
+        self.conn.commit()
+
+    def __iter__(self):
+        return (
+            (
+                slot,
+                project,
+                spider,
+                job,
+                pid,
+                datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S.%f"),
+                start_ticks,
+                log_file,
+                self.decode(args),
+            )
+            for slot, project, spider, job, pid, start_time, start_ticks, log_file, args in self.conn.execute(
+                f"SELECT slot, project, spider, job, pid, start_time, start_ticks, log_file, args FROM {self.table} "
+                "ORDER BY slot"
+            )
+        )
+
+
+class SqlitePeriodicSchedules(SqliteMixin):
+    """
+    SQLite periodic schedules.
+
+    .. versionadded:: 1.7.0
+    """
+
+    def __init__(self, database=None, table="periodic_schedules"):
+        super().__init__(database, table)
+
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(project text, name text, definition blob, next_time datetime, last_job text, PRIMARY KEY (project, name))"
+        )
+        self.conn.commit()
+
+    @time_method(SQLITE_SECONDS, "put")
+    def put(self, project, name, definition, next_time, last_job=None):
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (project, name, definition, next_time, last_job) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (project, name, self.encode(definition), next_time, last_job),
+        )
+        self.conn.commit()
+
+    @time_method(SQLITE_SECONDS, "update")
+    def update(self, project, name, next_time, last_job):
+        self.conn.execute(
+            f"UPDATE {self.table} SET next_time = ?, last_job = ? WHERE project = ? AND name = ?",
+            (next_time, last_job, project, name),
+        )
+        self.conn.commit()
+
+    @time_method(SQLITE_SECONDS, "remove")
+    def remove(self, project, name):
+        deleted = self.conn.execute(
+            f"DELETE FROM {self.table} WHERE project = ? AND name = ?", (project, name)
+        ).rowcount
+        self.conn.commit()
+        return deleted
+
+    def __iter__(self):
+        return (
+            (
+                project,
+                name,
+                self.decode(definition),
+                datetime.datetime.strptime(next_time, "%Y-%m-%d %H:%M:%S.%f"),
+                last_job,
             )
-            for project, spider, job, start_time, end_time in self.conn.execute(
-                f"SELECT project, spider, job, start_time, end_time FROM {self.table} ORDER BY end_time DESC"
+            for project, name, definition, next_time, last_job in self.conn.execute(
+                f"SELECT project, name, definition, next_time, last_job FROM {self.table} ORDER BY project, name"
             )
         )
@@ -0,0 +1,100 @@
+"""
+Resource usage of jobs' processes.
+
+.. versionadded:: 1.7.0
+"""
+
+import json
+import os
+import sys
+from contextlib import suppress
+from pathlib import Path
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+# ru_inblock and ru_oublock count 512-byte blocks.
+BLOCK_SIZE = 512
+
+if hasattr(os, "sysconf"):
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+else:  # Windows
+    CLOCK_TICKS = 100
+    PAGE_SIZE = 4096
+
+
+def from_rusage(rusage):
+    """
+    Return the usage in the ``rusage`` returned by :func:`resource.getrusage`.
+    """
+    return {
+        "cpu_user": rusage.ru_utime,
+        "cpu_system": rusage.ru_stime,
+        "max_rss": rusage.ru_maxrss * MAXRSS_UNIT,
+        "read_bytes": rusage.ru_inblock * BLOCK_SIZE,
+        "write_bytes": rusage.ru_oublock * BLOCK_SIZE,
+        "voluntary_switches": rusage.ru_nvcsw,
+        "involuntary_switches": rusage.ru_nivcsw,
+    }
+
+
+def report_usage(environ=os.environ):
+    """
+    Write the current process's usage as JSON to the file descriptor in the ``SCRAPYD_USAGE_FD`` environment variable,
+    if set, and close it. Called by the runner as it exits.
+    """
+    if not (fd := environ.get("SCRAPYD_USAGE_FD")):
+        return
+
+    try:
+        import resource  # noqa: PLC0415 POSIX only
+    except ImportError:
+        return
+
+    # The report is shorter than PIPE_BUF, so it's written atomically.
+    with suppress(OSError):  # the launcher closed the pipe
+        os.write(int(fd), json.dumps(from_rusage(resource.getrusage(resource.RUSAGE_SELF))).encode())
+        os.close(int(fd))
+
+
+def read_proc(pid, proc="/proc"):
+    """
+    Return the usage of a running process, from the ``/proc`` filesystem, or ``None`` if unavailable.
+    """
+    path = Path(proc) / str(pid)
+    try:
+        stat = (path / "stat").read_text()
+        status = (path / "status").read_text()
+    except OSError:  # the process ended, or there is no /proc filesystem
+        return None
+
+    # https://man7.org/linux/man-pages/man5/proc_pid_stat.5.html
+    # The command name is in parentheses, and can contain spaces. The fields after it start at field (3).
+    fields = stat[stat.rindex(")") + 2 :].split()
+    values = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+
+    usage = {
+        "cpu_user": int(fields[11]) / CLOCK_TICKS,
+        "cpu_system": int(fields[12]) / CLOCK_TICKS,
+        "rss": int(fields[21]) * PAGE_SIZE,
+    }
+    # https://man7.org/linux/man-pages/man5/proc_pid_status.5.html
+    if "VmHWM" in values:
+        usage["max_rss"] = int(values["VmHWM"].split()[0]) * 1024  # kB
+    for key, name in (
+        ("voluntary_ctxt_switches", "voluntary_switches"),
+        ("nonvoluntary_ctxt_switches", "involuntary_switches"),
+    ):
+        if key in values:
+            usage[name] = int(values[key])
+
+    # https://man7.org/linux/man-pages/man5/proc_pid_io.5.html
+    try:
+        io = dict(line.split(": ", 1) for line in (path / "io").read_text().splitlines())
+    except OSError:  # not permitted
+        pass
+    else:
+        usage["read_bytes"] = int(io["read_bytes"])
+        usage["write_bytes"] = int(io["write_bytes"])
+
+    return usage
@@ -0,0 +1,141 @@
+"""
+.. versionadded:: 1.7.0
+"""
+
+import json
+from collections import deque
+from io import BytesIO
+from types import SimpleNamespace
+
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.logger import Logger, LogLevel
+from twisted.web import http
+from twisted.web.client import Agent, FileBodyProducer, HTTPConnectionPool, readBody
+from twisted.web.http_headers import Headers
+
+from scrapyd import __version__
+from scrapyd.exceptions import WebhookError
+
+log = Logger()
+
+EVENTS = ("finished", "failed", "cancelled", "expired")
+
+
+class Webhook:
+    def __init__(self, url, queue_size):
+        self.url = url
+        self.queue = deque(maxlen=queue_size)
+        # Whether a batch is being sent or is waiting to be retried. Only one batch is sent at a time per URL.
+        self.busy = False
+
+
+class Webhooks(Service):
+    name = "webhooks"
+
+    def __init__(self, config, root):
+        self.root = root
+        self.batch_size = config.getint("webhook_batch_size", 100)
+        self.queue_size = config.getint("webhook_queue_size", 10000)
+        self.max_retries = config.getint("webhook_max_retries", 5)
+        self.retry_delay = config.getfloat("webhook_retry_delay", 1.0)
+        self.timeout = config.getfloat("webhook_timeout", 10.0)
+
+        # project (or "*" for all projects) -> URLs
+        self.urls = {project: value.split() for project, value in config.items("webhooks", default=[])}
+        self.webhooks = {}
+        self.calls = set()
+
+        self.pool = HTTPConnectionPool(reactor, persistent=True)
+        self.agent = Agent(reactor, pool=self.pool)
+
+        if self.urls:
+            root.jobindex.add_observer(self.notify)
+
+    def stopService(self):
+        super().stopService()
+        for call in self.calls:
+            call.cancel()
+        self.calls.clear()
+        return self.pool.closeCachedConnections()
+
+    def notify(self, data):
+        if data["event"] not in EVENTS:
+            return
+
+        job = SimpleNamespace(project=data["project"], spider=data["spider"], job=data["job"])
+        payload = {
+            **data,
+            "log_url": self.root.get_log_url(job),
+            "output_url": self.root.get_output_url(job),
+            "items_url": self.root.get_item_url(job),
+        }
+
+        for url in self.urls.get(data["project"], self.urls.get("*", [])):
+            if url not in self.webhooks:
+                self.webhooks[url] = Webhook(url, self.queue_size)
+            webhook = self.webhooks[url]
+            if len(webhook.queue) == webhook.queue.maxlen:
+                log.emit(LogLevel.warn, "Webhook queue is full, dropping the oldest job: url={url!r}", url=url)
+            webhook.queue.append(payload)
+            if not webhook.busy:
+                self._send_batch(webhook)
+
+    def _send_batch(self, webhook):
+        if not webhook.queue:
+            webhook.busy = False
+            return
+
+        webhook.busy = True
+        batch = [webhook.queue.popleft() for _ in range(min(self.batch_size, len(webhook.queue)))]
+        body = json.dumps({"node_name": self.root.node_name, "jobs": batch}).encode()
+        self._send(webhook, body, len(batch), 0)
+
+    def _send(self, webhook, body, count, attempt):
+        d = self._post(webhook.url, body)
+        d.addTimeout(self.timeout, reactor)
+        d.addCallbacks(self._sent, self._failed, callbackArgs=(webhook,), errbackArgs=(webhook, body, count, attempt))
+
+    @inlineCallbacks
+    def _post(self, url, body):
+        response = yield self.agent.request(
+            b"POST",
+            url.encode(),
+            Headers({b"Content-Type": [b"application/json"], b"User-Agent": [b"Scrapyd/%b" % __version__.encode()]}),
+            FileBodyProducer(BytesIO(body)),
+        )
+        # Read the body, to release the connection to the pool.
+        yield readBody(response)
+        if not http.OK <= response.code < http.MULTIPLE_CHOICE:
+            raise WebhookError(f"HTTP status code {response.code}")
+
+    def _sent(self, _, webhook):
+        self._send_batch(webhook)
+
+    def _failed(self, failure, webhook, body, count, attempt):
+        if attempt >= self.max_retries:
+            log.error(
+                "Webhook failed, dropping {count} jobs: url={url!r} error={error}",
+                count=count,
+                url=webhook.url,
+                error=failure.getErrorMessage(),
+            )
+            self._send_batch(webhook)
+            return
+
+        delay = self.retry_delay * 2**attempt
+        log.emit(
+            LogLevel.warn,
+            "Webhook failed, retrying in {delay}s: url={url!r} error={error}",
+            delay=delay,
+            url=webhook.url,
+            error=failure.getErrorMessage(),
+        )
+
+        def retry():
+            self.calls.discard(call)
+            self._send(webhook, body, count, attempt + 1)
+
+        call = reactor.callLater(delay, retry)
+        self.calls.add(call)
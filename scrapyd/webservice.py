@@ -1,24 +1,52 @@
 from __future__ import annotations
 
+import datetime
 import functools
+import hashlib
 import json
+import math
 import os
 import sys
+import time
 import traceback
 import uuid
 import zipfile
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict, deque
 from io import BytesIO
+from itertools import islice
 from subprocess import PIPE, Popen
 from typing import ClassVar
 
+from twisted.internet import defer, task
 from twisted.logger import Logger
-from twisted.web import error, http, resource
+from twisted.python.compat import nativeString
+from twisted.web import error, http, resource, server
 
+from scrapyd import compress
 from scrapyd.exceptions import EggNotFoundError, ProjectNotFoundError, RunnerError
+from scrapyd.metrics import API_CACHE, API_RATE_LIMITED, API_SECONDS, JOBS_REJECTED, REGISTRY, GaugeFunction
+from scrapyd.retries import RETRY_KEYS, parse_overrides
 
 log = Logger()
 
+# Not in twisted.web.http.
+TOO_MANY_REQUESTS = 429
+# The number of encoded responses to cache per webservice.
+CACHE_SIZE = 64
+# Distinguishes the ETags of this process from those of previous processes, whose generations started at the same 0.
+ETAG_SALT = uuid.uuid4().hex
+
+
+class RetryLaterError(error.Error):
+    """
+    An error after which the client can retry the request in ``retry_after`` seconds, which is sent in the
+    ``Retry-After`` header and the response's ``retry_after`` key.
+    """
+
+    def __init__(self, code, message, retry_after):
+        super().__init__(code, message)
+        self.retry_after = retry_after
+
 
 def param(
     decoded: str,
@@ -59,6 +87,71 @@ def param(
     return decorator
 
 
+def boolean(value):
+    if value in {b"1", b"true"}:
+        return True
+    if value in {b"0", b"false"}:
+        return False
+    raise ValueError(f"{value.decode()!r} is not 1, 0, true or false")
+
+
+def timestamp(value):
+    """
+    Return the local time, given a number of seconds from now or an ISO 8601 time, which is local if without a timezone.
+    """
+    text = value.decode()
+    try:
+        return datetime.datetime.now() + datetime.timedelta(seconds=float(text))
+    except ValueError:
+        pass
+    time = datetime.datetime.fromisoformat(text)
+    if time.tzinfo is not None:
+        time = time.astimezone().replace(tzinfo=None)
+    return time
+
+
+def get_dedupe_key(spider, settings, args):
+    """
+    Return a hash of the spider, its settings and its arguments, including its version, limits and retry policy.
+    """
+    data = json.dumps({"spider": spider, "settings": settings, "args": args}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def check_spider(root, project, version, spider):
+    if project not in root.poller.queues:
+        raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
+
+    if version and root.eggstorage.get(project, version) == (None, None):
+        raise error.Error(code=http.OK, message=b"version '%b' not found" % version.encode())
+
+    spiders = spider_list.get(project, version, runner=root.runner)
+    if spider not in spiders:
+        raise error.Error(code=http.OK, message=b"spider '%b' not found" % spider.encode())
+
+
+def check_pending(root, project, dedupe_key=None):
+    """
+    Raise an error if the project or the node has its maximum number of pending jobs, using the job index's counters,
+    unless a pending job has the ``dedupe_key``, since scheduling its duplicate doesn't add a pending job.
+    """
+    pending = root.jobindex.pending
+    if (maximum := root.get_max_pending(project)) and pending[project] >= maximum:
+        limit, message = "project", b"project '%b' has too many pending jobs (%d)" % (project.encode(), maximum)
+    elif root.max_pending and sum(pending.values()) >= root.max_pending:
+        limit, message = "node", b"node has too many pending jobs (%d)" % root.max_pending
+    else:
+        return
+
+    # Look up the duplicate only if the limit is reached, to not slow down scheduling.
+    queue = root.poller.queues[project]
+    if dedupe_key is not None and hasattr(queue, "get_duplicate") and queue.get_duplicate(dedupe_key) is not None:
+        return
+
+    JOBS_REJECTED.inc(project, limit)
+    raise RetryLaterError(http.SERVICE_UNAVAILABLE, message, root.pending_retry_after)
+
+
 class SpiderList:
     cache: ClassVar = defaultdict(dict)
 
@@ -114,45 +207,201 @@ class WsResource(resource.Resource):
     """
     .. versionchanged:: 1.1.0
        Add ``node_name`` to the response in all subclasses.
+    .. versionchanged:: 1.7.0
+       Add the ``cacheable`` attribute. Cacheable webservices respond to ``GET`` requests with an ``ETag`` header,
+       respond with HTTP status 304 if the ``If-None-Match`` header matches, and cache their encoded responses.
+    .. versionchanged:: 1.7.0
+       Compress responses larger than :ref:`compression_min_size`, if the client accepts it.
     """
 
     json_encoder = json.JSONEncoder()
+    # Whether the response depends only on the request's arguments and the generation (see get_generation).
+    cacheable = False
 
     def __init__(self, root):
         super().__init__()
         self.root = root
+        # arguments -> (generation, encoded response, {content coding -> compressed response}). Only the latest
+        # generation's response is kept, since earlier generations' responses are never sent again.
+        self.cache = OrderedDict()
 
     def render(self, txrequest):
+        # Reject requests beyond the rate limit before doing any work.
+        limiter = self.root.rate_limiter
+        if (
+            limiter.get_limit(self.endpoint) is not None
+            and nativeString(txrequest.method) != "OPTIONS"
+            and (retry_after := limiter.check(self._get_client(txrequest), self.endpoint))
+        ):
+            return self._reject(txrequest, retry_after)
+
+        with API_SECONDS.time(self.endpoint):
+            if self.cacheable and nativeString(txrequest.method) in {"GET", "HEAD"}:
+                return self._render_cached(txrequest)
+            return self._render(txrequest)
+
+    def get_generation(self, project):
+        """
+        Return a value that changes when the response to a request for the ``project`` (or ``None``) may change.
+        """
+        return self.root.jobindex.generations[project]
+
+    @functools.cached_property
+    def endpoint(self):
+        """
+        The webservice's name in the ``[services]`` section, like ``listjobs.json``, or its class's name.
+        """
+        for name, child in self.root.children.items():
+            if child is self:
+                return name.decode()
+        return type(self).__name__
+
+    def _get_client(self, txrequest):
+        # Without basic authentication, the Authorization header isn't checked, so its username can't be trusted.
+        if self.root.authenticated and (user := txrequest.getUser()):
+            return user.decode(errors="replace")
+        address = txrequest.getClientAddress()
+        return getattr(address, "host", None) or str(address)
+
+    def _reject(self, txrequest, retry_after):
+        API_RATE_LIMITED.inc(self.endpoint)
+        retry_after = math.ceil(retry_after)
+        txrequest.setResponseCode(TOO_MANY_REQUESTS, b"Too Many Requests")
+        txrequest.setHeader("Retry-After", str(retry_after))
+        data = {"status": "error", "message": "too many requests", "retry_after": retry_after}
+        return self._encode(txrequest, data)
+
+    def _render_cached(self, txrequest):
+        try:
+            project = txrequest.args[b"project"][0].decode() if b"project" in txrequest.args else None
+        except UnicodeDecodeError:
+            return self._render(txrequest)
+
+        key = tuple(sorted((name, tuple(values)) for name, values in txrequest.args.items()))
+        generation = self.get_generation(project)
+        digest = hashlib.sha256(repr((ETAG_SALT, self.endpoint, key, generation)).encode()).hexdigest()[:32]
+
+        # Compressed responses' ETags have a suffix, like "-gzip".
+        header = txrequest.getHeader("If-None-Match") or ""
+        tags = {tag.strip().removeprefix("W/").strip('"').split("-")[0] for tag in header.split(",")}
+        if digest in tags or "*" in tags:
+            API_CACHE.inc(self.endpoint, "not_modified")
+            txrequest.setResponseCode(http.NOT_MODIFIED)
+            txrequest.setHeader("ETag", f'"{digest}"')
+            self._set_cors_headers(txrequest)
+            return b""
+
+        if (entry := self.cache.get(key)) is not None and entry[0] == generation:
+            API_CACHE.inc(self.endpoint, "hit")
+            self.cache.move_to_end(key)
+            txrequest.setHeader("Content-Type", "application/json")
+            return self._send(txrequest, *entry[1:], etag=digest)
+
+        API_CACHE.inc(self.endpoint, "miss")
+        return self._render(txrequest, (key, generation), digest)
+
+    def _render(self, txrequest, cache_key=None, etag=None):
         try:
             data = super().render(txrequest)
         except Exception as e:  # noqa: BLE001
             log.failure("")
-
-            if isinstance(e, error.Error):
-                txrequest.setResponseCode(int(e.status))
-
-            if self.root.debug:
-                return traceback.format_exc().encode()
-
-            message = e.message.decode() if isinstance(e, error.Error) else f"{type(e).__name__}: {e}"
-            data = {"status": "error", "message": message}
+            return self._render_error(txrequest, e, traceback.format_exc())
         else:
+            if data is server.NOT_DONE_YET:  # streaming response
+                return data
+            if isinstance(data, defer.Deferred):  # asynchronous response
+                self._render_later(txrequest, data)
+                return server.NOT_DONE_YET
             if data is not None:
                 data["status"] = "ok"
+                if cache_key is not None:
+                    key, generation = cache_key
+                    content, compressed = self._dump(txrequest, data), {}
+                    # Replace the previous generation's response, if any.
+                    self.cache[key] = (generation, content, compressed)
+                    self.cache.move_to_end(key)
+                    while len(self.cache) > CACHE_SIZE:
+                        self.cache.popitem(last=False)
+                    # Only successful, cached responses have an ETag.
+                    return self._send(txrequest, content, compressed, etag=etag)
+
+        return self._encode(txrequest, data)
+
+    def _render_later(self, txrequest, deferred):
+        disconnected = []
+
+        def write(data):
+            if disconnected:
+                return
+            data["status"] = "ok"
+            txrequest.write(self._encode(txrequest, data))
+            txrequest.finish()
+
+        def fail(failure):
+            log.failure("", failure)
+            if disconnected:
+                return
+            txrequest.write(self._render_error(txrequest, failure.value, failure.getTraceback()))
+            txrequest.finish()
+
+        txrequest.notifyFinish().addErrback(disconnected.append)
+        deferred.addCallbacks(write, fail).addErrback(lambda failure: log.failure("", failure))
+
+    def _render_error(self, txrequest, e, tb):
+        if isinstance(e, error.Error):
+            txrequest.setResponseCode(int(e.status))
+        if isinstance(e, RetryLaterError):
+            txrequest.setHeader("Retry-After", str(e.retry_after))
+
+        if self.root.debug:
+            return tb.encode()
+
+        message = e.message.decode() if isinstance(e, error.Error) else f"{type(e).__name__}: {e}"
+        data = {"status": "error", "message": message}
+        if isinstance(e, RetryLaterError):
+            data["retry_after"] = e.retry_after
+        return self._encode(txrequest, data)
+
+    def _encode(self, txrequest, data):
+        # render_OPTIONS returns None.
+        content = b"" if data is None else self._dump(txrequest, data)
+        return self._send(txrequest, content)
+
+    def _dump(self, txrequest, data):
+        data["node_name"] = self.root.node_name
+        txrequest.setHeader("Content-Type", "application/json")
+        return self.json_encoder.encode(data).encode() + b"\n"
+
+    def _send(self, txrequest, content, compressed=None, etag=None):
+        """
+        Set the response's headers, and return the response, compressed if it's large enough and the client accepts
+        it. ``compressed`` is a ``dict`` of content codings to compressed responses, to reuse and update. ``etag`` is
+        the response's entity tag, if any, without quotes or a content coding suffix.
+        """
+        self._set_cors_headers(txrequest)
+
+        coding = None
+        min_size = self.root.compression_min_size
+        if min_size and len(content) >= min_size:
+            txrequest.setHeader("Vary", "Accept-Encoding")
+            if coding := compress.negotiate(txrequest.getHeader("Accept-Encoding"), compress.CODINGS):
+                if compressed is None:
+                    compressed = {}
+                if coding not in compressed:
+                    compressed[coding] = compress.CODINGS[coding](content)
+                content = compressed[coding]
+                txrequest.setHeader("Content-Encoding", coding)
+
+        if etag is not None:
+            txrequest.setHeader("ETag", f'"{etag}-{coding}"' if coding else f'"{etag}"')
+        txrequest.setHeader("Content-Length", str(len(content)))
+        return content
 
-        if data is None:  # render_OPTIONS
-            content = b""
-        else:
-            data["node_name"] = self.root.node_name
-            content = self.json_encoder.encode(data).encode() + b"\n"
-            txrequest.setHeader("Content-Type", "application/json")
-
+    def _set_cors_headers(self, txrequest):
         # https://developer.mozilla.org/en-US/docs/Web/HTTP/CORS#preflighted_requests
         txrequest.setHeader("Access-Control-Allow-Origin", "*")
         txrequest.setHeader("Access-Control-Allow-Methods", self.methods)
         txrequest.setHeader("Access-Control-Allow-Headers", "X-Requested-With")
-        txrequest.setHeader("Content-Length", str(len(content)))
-        return content
 
     def render_OPTIONS(self, txrequest):
         txrequest.setHeader("Allow", self.methods)
@@ -171,6 +420,8 @@ class WsResource(resource.Resource):
 class DaemonStatus(WsResource):
     """
     .. versionadded:: 1.2.0
+    .. versionchanged:: 1.7.0
+       Add ``slots`` and ``max_proc`` to the response.
     """
 
     def render_GET(self, txrequest):
@@ -178,6 +429,43 @@ class DaemonStatus(WsResource):
             "pending": sum(queue.count() for queue in self.root.poller.queues.values()),
             "running": len(self.root.launcher.processes),
             "finished": len(self.root.launcher.finished),
+            "slots": len(self.root.launcher.slots),
+            "max_proc": self.root.launcher.max_proc,
+        }
+
+
+class Resize(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    @param("max_proc", type=int)
+    def render_POST(self, txrequest, max_proc):
+        if max_proc < 0:
+            raise error.Error(code=http.OK, message=b"max_proc must be 0 or more")
+
+        self.root.launcher.resize(max_proc)
+        return {"slots": len(self.root.launcher.slots), "max_proc": self.root.launcher.max_proc}
+
+
+class Drain(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    def render_GET(self, txrequest):
+        return self._status()
+
+    @param("drain", required=False, default=True, type=boolean)
+    def render_POST(self, txrequest, drain):
+        self.root.launcher.drain(drain)
+        return self._status()
+
+    def _status(self):
+        return {
+            "draining": self.root.launcher.draining,
+            "drained": self.root.launcher.drained,
+            "running": len(self.root.launcher.processes),
         }
 
 
@@ -187,6 +475,14 @@ class Schedule(WsResource):
        Add ``_version`` and ``jobid`` parameters.
     .. versionchanged:: 1.3.0
        Add ``priority`` parameter.
+    .. versionchanged:: 1.7.0
+       Add ``_memory_limit``, ``_cpu_limit``, ``_files_limit`` and ``_max_runtime`` parameters.
+       Add ``_max_attempts``, ``_retry_exit_codes``, ``_retry_signals``, ``_retry_terminations``, ``_retry_delay`` and
+       ``_retry_max_delay`` parameters.
+       Add ``_not_before`` parameter.
+       Add ``_dedupe_key`` and ``_dedupe`` parameters, and ``deduplicated`` to the response.
+       Add ``_expires_at`` and ``_ttl`` parameters.
+       Respond with HTTP status 503 and a ``Retry-After`` header, if the project or node has too many pending jobs.
     """
 
     @param("project")
@@ -196,41 +492,226 @@ class Schedule(WsResource):
     @param("jobid", required=False, default=lambda: uuid.uuid1().hex)
     @param("priority", required=False, default=0, type=float)
     @param("setting", required=False, default=list, multiple=True)
-    def render_POST(self, txrequest, project, spider, version, jobid, priority, setting):
-        if project not in self.root.poller.queues:
-            raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
+    # Prefix parameters with an underscore, like _version, to not shadow spider arguments.
+    @param("_memory_limit", dest="memory_limit", required=False, type=int)
+    @param("_cpu_limit", dest="cpu_limit", required=False, type=int)
+    @param("_files_limit", dest="files_limit", required=False, type=int)
+    @param("_max_runtime", dest="max_runtime", required=False, type=int)
+    @param("_max_attempts", dest="max_attempts", required=False, type=int)
+    @param("_retry_exit_codes", dest="retry_exit_codes", required=False)
+    @param("_retry_signals", dest="retry_signals", required=False)
+    @param("_retry_terminations", dest="retry_terminations", required=False)
+    @param("_retry_delay", dest="retry_delay", required=False, type=float)
+    @param("_retry_max_delay", dest="retry_max_delay", required=False, type=float)
+    @param("_not_before", dest="not_before", required=False, type=timestamp)
+    @param("_dedupe_key", dest="dedupe_key", required=False)
+    @param("_dedupe", dest="dedupe", required=False, default=False, type=boolean)
+    @param("_expires_at", dest="expires_at", required=False, type=timestamp)
+    @param("_ttl", dest="ttl", required=False, type=float)
+    def render_POST(
+        self,
+        txrequest,
+        project,
+        spider,
+        version,
+        jobid,
+        priority,
+        setting,
+        memory_limit,
+        cpu_limit,
+        files_limit,
+        max_runtime,
+        max_attempts,
+        retry_exit_codes,
+        retry_signals,
+        retry_terminations,
+        retry_delay,
+        retry_max_delay,
+        not_before,
+        dedupe_key,
+        dedupe,
+        expires_at,
+        ttl,
+    ):
+        limits = {
+            "memory_limit": memory_limit,
+            "cpu_limit": cpu_limit,
+            "files_limit": files_limit,
+            "max_runtime": max_runtime,
+        }
+        for name, value in limits.items():
+            if value is not None and value < 0:
+                raise error.Error(code=http.OK, message=b"_%b must be 0 or more" % name.encode())
 
-        if version and self.root.eggstorage.get(project, version) == (None, None):
-            raise error.Error(code=http.OK, message=b"version '%b' not found" % version.encode())
+        if ttl is not None:
+            if expires_at is not None:
+                raise error.Error(code=http.OK, message=b"'_expires_at' and '_ttl' parameters are mutually exclusive")
+            if ttl <= 0:
+                raise error.Error(code=http.OK, message=b"_ttl must be more than 0")
+            expires_at = datetime.datetime.now() + datetime.timedelta(seconds=ttl)
+
+        try:
+            retry = parse_overrides(
+                {
+                    "max_attempts": max_attempts,
+                    "retry_exit_codes": retry_exit_codes,
+                    "retry_signals": retry_signals,
+                    "retry_terminations": retry_terminations,
+                    "retry_delay": retry_delay,
+                    "retry_max_delay": retry_max_delay,
+                },
+                prefix="_",
+            )
+        except ValueError as e:
+            raise error.Error(code=http.OK, message=str(e).encode()) from e
 
-        spiders = spider_list.get(project, version, runner=self.root.runner)
-        if spider not in spiders:
-            raise error.Error(code=http.OK, message=b"spider '%b' not found" % spider.encode())
+        check_spider(self.root, project, version, spider)
 
         args = {key.decode(): values[0].decode() for key, values in txrequest.args.items()}
         if version is not None:
             args["_version"] = version
+        if limits := {name: value for name, value in limits.items() if value is not None}:
+            args["_limits"] = limits
+        if retry:
+            args["_retry"] = retry
+
+        settings = dict(s.split("=", 1) for s in setting)
+        if dedupe and dedupe_key is None:
+            dedupe_key = get_dedupe_key(spider, settings, args)
 
-        self.root.scheduler.schedule(
+        check_pending(self.root, project, dedupe_key)
+
+        scheduled = self.root.scheduler.schedule(
             project,
             spider,
             priority=priority,
-            settings=dict(s.split("=", 1) for s in setting),
+            _not_before=not_before,
+            _dedupe_key=dedupe_key,
+            _expires_at=expires_at,
+            settings=settings,
             _job=jobid,
             **args,
         )
 
         log.debug(
-            "Job scheduled: project={project!r} spider={spider!r} job={job!r}",
+            "Job {action}: project={project!r} spider={spider!r} job={job!r}",
+            action="scheduled" if scheduled == jobid else "deduplicated",
             project=project,
             spider=spider,
-            job=jobid,
+            job=scheduled,
         )
 
-        return {"jobid": jobid}
+        if dedupe_key is None:
+            return {"jobid": jobid}
+        return {"jobid": scheduled, "deduplicated": scheduled != jobid}
+
+
+class AddSchedule(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    @param("project")
+    @param("name")
+    @param("spider")
+    @param("_version", dest="version", required=False, default=None)
+    @param("cron", required=False)
+    @param("interval", required=False, type=float)
+    @param("jitter", required=False, type=float)
+    @param("skip_if_running", required=False, default=False, type=boolean)
+    @param("skip_if_pending", required=False, default=True, type=boolean)
+    @param("priority", required=False, default=0, type=float)
+    @param("setting", required=False, default=list, multiple=True)
+    def render_POST(
+        self,
+        txrequest,
+        project,
+        name,
+        spider,
+        version,
+        cron,
+        interval,
+        jitter,
+        skip_if_running,
+        skip_if_pending,
+        priority,
+        setting,
+    ):
+        if (cron is None) == (interval is None):
+            raise error.Error(code=http.OK, message=b"either 'cron' or 'interval' parameter is required")
+        if interval is not None and interval <= 0:
+            raise error.Error(code=http.OK, message=b"interval must be more than 0")
+        if jitter is not None and jitter < 0:
+            raise error.Error(code=http.OK, message=b"jitter must be 0 or more")
+
+        check_spider(self.root, project, version, spider)
+
+        args = {key.decode(): values[0].decode() for key, values in txrequest.args.items()}
+        if version is not None:
+            args["_version"] = version
+
+        definition = {
+            "spider": spider,
+            "cron": cron,
+            "interval": interval,
+            "jitter": self.root.periodic.jitter if jitter is None else jitter,
+            "skip_if_running": skip_if_running,
+            "skip_if_pending": skip_if_pending,
+            "priority": priority,
+            "settings": dict(s.split("=", 1) for s in setting),
+            "args": args,
+        }
+        try:
+            schedule = self.root.periodic.add(project, name, definition)
+        except ValueError as e:
+            raise error.Error(code=http.OK, message=b"cron is invalid: %b" % str(e).encode()) from e
+
+        return {"name": name, "next_time": str(self.root.periodic.get_fire_time(schedule))}
+
+
+class ListSchedules(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    @param("project", required=False)
+    def render_GET(self, txrequest, project):
+        if project is not None and project not in self.root.poller.queues:
+            raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
+
+        return {
+            "schedules": [
+                {
+                    "project": schedule.project,
+                    "name": schedule.name,
+                    **schedule.definition,
+                    "next_time": str(self.root.periodic.get_fire_time(schedule)),
+                    "last_job": schedule.last_job,
+                }
+                for schedule in self.root.periodic.list(project)
+            ]
+        }
+
+
+class DeleteSchedule(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    @param("project")
+    @param("name")
+    def render_POST(self, txrequest, project, name):
+        if not self.root.periodic.remove(project, name):
+            raise error.Error(code=http.OK, message=b"schedule '%b' not found" % name.encode())
+        return {}
 
 
 class Cancel(WsResource):
+    """
+    .. versionchanged:: 1.7.0
+       Add ``escalate`` and ``wait`` parameters.
+    """
+
     @param("project")
     @param("job")
     # Instead of os.name, use sys.platform, which disambiguates Cygwin, which implements SIGINT not SIGBREAK.
@@ -241,22 +722,39 @@ class Cancel(WsResource):
     # https://docs.twistedmatrix.com/en/stable/api/twisted.internet.process._BaseProcess.html#signalProcess
     # https://github.com/twisted/twisted/blob/b3a4d85/src/twisted/internet/process.py#L340
     @param("signal", required=False, default="INT" if sys.platform != "win32" else "21")
-    def render_POST(self, txrequest, project, job, signal):
+    @param("escalate", required=False, default=False, type=boolean)
+    @param("wait", required=False, default=0, type=float)
+    def render_POST(self, txrequest, project, job, signal, escalate, wait):
         if project not in self.root.poller.queues:
             raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
 
         prevstate = None
-
-        if self.root.poller.queues[project].remove(lambda message: message["_job"] == job):
+        entry = self.root.jobindex.get(project, job)
+
+        # Check the queue even if the job isn't indexed, since another process might share the dbs_dir. Look up the
+        # job by its ID, if the queue supports it, instead of decoding every pending job.
+        queue = self.root.poller.queues[project]
+        if hasattr(queue, "remove_matching"):
+            removed = queue.remove_matching(
+                spider=None, version=None, jobs=[job], min_priority=None, max_priority=None
+            )
+        else:
+            removed = queue.remove(lambda message: message["_job"] == job)
+        if removed:
             prevstate = "pending"
 
         if signal.isdigit():
             signal = int(signal)
 
-        for process in self.root.launcher.processes.values():
-            if process.project == project and process.job == job:
-                process.transport.signalProcess(signal)
-                prevstate = "running"
+        processes = [self.root.launcher.processes[slot] for slot in (() if entry is None else sorted(entry.slots))]
+        for process in processes:
+            if process.termination is None:
+                process.termination = "cancelled"
+            self.root.launcher.stop(process, signal, escalate=escalate)
+            prevstate = "running"
+
+        if entry is not None:
+            self.root.jobindex.cancel(project, job, prevstate)
 
         log.debug(
             "Job canceled: project={project!r} job={job!r} prevstate={prevstate!r}",
@@ -265,9 +763,88 @@ class Cancel(WsResource):
             prevstate=prevstate,
         )
 
+        if wait:
+            deferreds = [self.root.launcher.wait(process, wait) for process in processes]
+            return defer.gatherResults(deferreds, consumeErrors=True).addCallbacks(
+                lambda exited: {"prevstate": prevstate, "exited": all(exited)},
+                lambda failure: failure.value.subFailure,  # FirstError
+            )
         return {"prevstate": prevstate}
 
 
+class BulkCancel(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    @param("project")
+    @param("spider", required=False)
+    @param("_version", dest="version", required=False)
+    @param("job", dest="jobs", required=False, multiple=True)
+    @param("min_priority", required=False, type=float)
+    @param("max_priority", required=False, type=float)
+    # See Cancel.
+    @param("signal", required=False, default="INT" if sys.platform != "win32" else "21")
+    @param("escalate", required=False, default=False, type=boolean)
+    def render_POST(self, txrequest, project, spider, version, jobs, min_priority, max_priority, signal, escalate):
+        if project not in self.root.poller.queues:
+            raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
+
+        queue = self.root.poller.queues[project]
+        if hasattr(queue, "remove_matching"):
+            pending = queue.remove_matching(spider, version, jobs, min_priority, max_priority)
+        # Older implementations lack the method, and messages lack priorities.
+        elif min_priority is not None or max_priority is not None:
+            raise error.Error(
+                code=http.OK, message=b"min_priority and max_priority are unsupported by the spider queue"
+            )
+        else:
+            pending = []
+
+            def match(message):
+                if (
+                    (spider is None or message.get("name") == spider)
+                    and (version is None or message.get("_version") == version)
+                    and (jobs is None or message.get("_job") in jobs)
+                ):
+                    pending.append(message.get("_job"))
+                    return True
+                return False
+
+            queue.remove(match)
+        for job in pending:
+            self.root.jobindex.cancel(project, job, "pending")
+
+        if signal.isdigit():
+            signal = int(signal)
+
+        running = []
+        # Running jobs have no priority.
+        if min_priority is None and max_priority is None:
+            job_set = None if jobs is None else set(jobs)
+            for process in list(self.root.launcher.processes.values()):
+                if (
+                    process.project == project
+                    and (spider is None or process.spider == spider)
+                    and (version is None or (process.message or {}).get("_version") == version)
+                    and (job_set is None or process.job in job_set)
+                ):
+                    if process.termination is None:
+                        process.termination = "cancelled"
+                    self.root.launcher.stop(process, signal, escalate=escalate)
+                    self.root.jobindex.cancel(project, process.job, "running")
+                    running.append(process.job)
+
+        log.debug(
+            "Jobs canceled: project={project!r} pending={pending!r} running={running!r}",
+            project=project,
+            pending=len(pending),
+            running=len(running),
+        )
+
+        return {"pending": len(pending), "running": len(running), "jobs": {"pending": pending, "running": running}}
+
+
 class AddVersion(WsResource):
     @param("project")
     @param("version")
@@ -286,11 +863,25 @@ class AddVersion(WsResource):
 
 
 class ListProjects(WsResource):
+    """
+    .. versionchanged:: 1.7.0
+       Cacheable.
+    """
+
+    cacheable = True
+
     def render_GET(self, txrequest):
         return {"projects": self.root.scheduler.list_projects()}
 
 
 class ListVersions(WsResource):
+    """
+    .. versionchanged:: 1.7.0
+       Cacheable.
+    """
+
+    cacheable = True
+
     @param("project")
     def render_GET(self, txrequest, project):
         return {"versions": self.root.eggstorage.list(project)}
@@ -300,8 +891,12 @@ class ListSpiders(WsResource):
     """
     .. versionchanged:: 1.2.0
        Add ``_version`` parameter.
+    .. versionchanged:: 1.7.0
+       Cacheable.
     """
 
+    cacheable = True
+
     @param("project")
     @param("_version", dest="version", required=False, default=None)
     def render_GET(self, txrequest, project, version):
@@ -314,6 +909,60 @@ class ListSpiders(WsResource):
         return {"spiders": spider_list.get(project, version, runner=self.root.runner)}
 
 
+class Summary(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    @param("project", required=False)
+    @param("window", required=False, default=3600, type=float)
+    def render_GET(self, txrequest, project, window):
+        queues = self.root.poller.queues
+        if project is not None and project not in queues:
+            raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
+        if window <= 0:
+            raise error.Error(code=http.OK, message=b"window must be more than 0")
+
+        # Jobs of deleted projects are omitted.
+        projects = {
+            name: {"pending": 0, "running": 0, "finished": 0, "spiders": {}}
+            for name in (queues if project is None else [project])
+        }
+
+        def add(state, name, spider, count):
+            if count and (summary := projects.get(name)) is not None:
+                summary[state] += count
+                if spider not in summary["spiders"]:
+                    summary["spiders"][spider] = {"pending": 0, "running": 0, "finished": 0}
+                summary["spiders"][spider][state] += count
+
+        # The count_by_spider methods are optional, for older implementations.
+        for name in projects:
+            if hasattr(queues[name], "count_by_spider"):
+                counts = queues[name].count_by_spider()
+            else:
+                counts = Counter(message.get("name") for message in queues[name].list())
+            for spider, count in counts.items():
+                add("pending", name, spider, count)
+        for (name, spider), count in self.root.jobindex.running.items():
+            add("running", name, spider, count)
+        since = datetime.datetime.now() - datetime.timedelta(seconds=window)
+        finished = self.root.launcher.finished
+        if hasattr(finished, "count_by_spider"):
+            counts = finished.count_by_spider(since)
+        else:
+            counts = Counter((job.project, job.spider) for job in finished.list() if job.end_time >= since)
+        for (name, spider), count in counts.items():
+            add("finished", name, spider, count)
+
+        return {
+            "pending": sum(summary["pending"] for summary in projects.values()),
+            "running": sum(summary["running"] for summary in projects.values()),
+            "finished": sum(summary["finished"] for summary in projects.values()),
+            "projects": projects,
+        }
+
+
 class Status(WsResource):
     """
     .. versionadded:: 1.5.0
@@ -322,31 +971,189 @@ class Status(WsResource):
     @param("job")
     @param("project", required=False)
     def render_GET(self, txrequest, job, project):
-        queues = self.root.poller.queues
-        if project is not None and project not in queues:
+        if project is not None and project not in self.root.poller.queues:
             raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
 
-        result = {"currstate": None}
+        return {"currstate": self.root.jobindex.state(job, project)}
 
-        for finished in self.root.launcher.finished:
-            if (project is None or finished.project == project) and finished.job == job:
-                result["currstate"] = "finished"
-                return result
 
-        for process in self.root.launcher.processes.values():
-            if (project is None or process.project == project) and process.job == job:
-                result["currstate"] = "running"
-                return result
+class BulkStatus(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
 
-        for queue_name in queues if project is None else [project]:
-            for message in queues[queue_name].list():
-                if message["_job"] == job:
-                    result["currstate"] = "pending"
-                    return result
+    @param("job", dest="jobs", multiple=True)
+    @param("project", required=False)
+    def render_GET(self, txrequest, jobs, project):
+        if project is not None and project not in self.root.poller.queues:
+            raise error.Error(code=http.OK, message=b"project '%b' not found" % project.encode())
 
+        return {"jobs": [self._status(job, project) for job in jobs]}
+
+    def render_POST(self, txrequest):
+        if (txrequest.getHeader("Content-Type") or "").startswith("application/json"):
+            try:
+                data = json.loads(txrequest.content.read())
+            except ValueError as e:
+                raise error.Error(code=http.OK, message=b"JSON body is invalid: %b" % str(e).encode()) from e
+
+            jobs = data.get("jobs") if isinstance(data, dict) else None
+            project = data.get("project") if isinstance(data, dict) else None
+            if (
+                not isinstance(jobs, list)
+                or not all(isinstance(job, str) for job in jobs)
+                or not isinstance(project, str | None)
+            ):
+                raise error.Error(
+                    code=http.OK, message=b"JSON body must be an object with 'jobs' (a list) and optional 'project'"
+                )
+
+            txrequest.args = {b"job": [job.encode() for job in jobs]}
+            if project is not None:
+                txrequest.args[b"project"] = [project.encode()]
+
+        return self.render_GET(txrequest)
+
+    def _status(self, job, project):
+        result = {"id": job, "currstate": None}
+
+        project, entry = self.root.jobindex.find(job, project)
+        if entry is None:
+            return result
+
+        result.update(currstate=entry.state, project=project, spider=entry.spider)
+        if entry.finished is not None:
+            result["start_time"] = str(entry.finished.start_time)
+            result["end_time"] = str(entry.finished.end_time)
+        elif entry.slots:
+            process = self.root.launcher.processes[min(entry.slots)]
+            result["pid"] = process.pid
+            result["start_time"] = str(process.start_time)
         return result
 
 
+class Events(WsResource):
+    """
+    .. versionadded:: 1.7.0
+    """
+
+    keepalive_interval = 15
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.events = deque(maxlen=root.events_to_keep)
+        self.last_event_id = 0
+        self.subscribers = {}
+        self.keepalive = task.LoopingCall(self._keepalive)
+        root.jobindex.add_observer(self.publish)
+
+    @param("project", required=False)
+    @param("spider", required=False)
+    @param("last_event_id", required=False, type=int)
+    def render_GET(self, txrequest, project, spider, last_event_id):
+        if last_event_id is None and (header := txrequest.getHeader("Last-Event-ID")):
+            try:
+                last_event_id = int(header)
+            except ValueError as e:
+                raise error.Error(code=http.OK, message=b"Last-Event-ID is invalid: %b" % str(e).encode()) from e
+
+        txrequest.setHeader("Content-Type", "text/event-stream")
+        txrequest.setHeader("Cache-Control", "no-cache")
+        txrequest.setHeader("Access-Control-Allow-Origin", "*")
+        # Send the headers, even if there are no events to replay.
+        txrequest.write(b": ok\n\n")
+
+        if last_event_id is not None:
+            # The event IDs in the ring buffer are consecutive.
+            start = max(last_event_id - (self.last_event_id - len(self.events)), 0)
+            for event_id, data in islice(self.events, start, None):
+                self._write(txrequest, (project, spider), event_id, data)
+
+        self.subscribers[txrequest] = (project, spider)
+        txrequest.notifyFinish().addBoth(self._unsubscribe, txrequest)
+        if not self.keepalive.running:
+            self.keepalive.start(self.keepalive_interval, now=False)
+
+        return server.NOT_DONE_YET
+
+    def publish(self, data):
+        self.last_event_id += 1
+        self.events.append((self.last_event_id, data))
+        for txrequest, filters in list(self.subscribers.items()):
+            self._write(txrequest, filters, self.last_event_id, data)
+
+    def _write(self, txrequest, filters, event_id, data):
+        project, spider = filters
+        if (project is None or data["project"] == project) and (spider is None or data["spider"] == spider):
+            encoded = self.json_encoder.encode(data).encode()
+            txrequest.write(b"id: %d\nevent: %b\ndata: %b\n\n" % (event_id, data["event"].encode(), encoded))
+
+    def _keepalive(self):
+        for txrequest in list(self.subscribers):
+            txrequest.write(b": keepalive\n\n")
+
+    def _unsubscribe(self, _, txrequest):
+        self.subscribers.pop(txrequest, None)
+        if not self.subscribers and self.keepalive.running:
+            self.keepalive.stop()
+
+
+class Metrics(resource.Resource):
+    """
+    Respond with the Prometheus text format, not JSON.
+
+    This isn't a :class:`WsResource`, so that scrapes aren't rate limited or timed, and don't get CORS headers.
+
+    .. versionadded:: 1.7.0
+    """
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self.pending = GaugeFunction(
+            "scrapyd_jobs_pending",
+            "Pending jobs.",
+            ("project",),
+            lambda: {(project,): count for project, count in root.jobindex.pending.items()},
+        )
+        self.running = GaugeFunction(
+            "scrapyd_jobs_running",
+            "Running jobs.",
+            ("project", "spider"),
+            lambda: root.jobindex.running,
+        )
+        self.rate_limits = GaugeFunction(
+            "scrapyd_api_rate_limit_clients",
+            "Clients with a rate limit bucket.",
+            ("endpoint",),
+            root.rate_limiter.count,
+        )
+        self.rate_limited = GaugeFunction(
+            "scrapyd_api_rate_limited_clients",
+            "Clients that exceeded their rate limit, and whose bucket is empty.",
+            ("endpoint",),
+            lambda: root.rate_limiter.count(limited=True),
+        )
+        # Job IDs aren't labels, since each job would add time series.
+        self.stats = GaugeFunction(
+            "scrapyd_job_stats",
+            "Crawl stats of running jobs, summed by project and spider.",
+            ("project", "spider", "stat"),
+            self._sum_stats,
+        )
+
+    def render_GET(self, txrequest):
+        txrequest.setHeader("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        return REGISTRY.render(self.pending, self.running, self.rate_limits, self.rate_limited, self.stats)
+
+    def _sum_stats(self):
+        totals = defaultdict(int)
+        for process in self.root.launcher.processes.values():
+            for stat, value in (process.read_stats() or {}).items():
+                totals[(process.project, process.spider, stat)] += value
+        return totals
+
+
 class ListJobs(WsResource):
     """
     .. versionchanged:: 1.1.0
@@ -359,8 +1166,27 @@ class ListJobs(WsResource):
        Add ``log_url`` and ``items_url`` to finished jobs in the response.
     .. versionchanged:: 1.5.0
        Add ``version``, ``settings`` and ``args`` to pending jobs in the response.
+    .. versionchanged:: 1.7.0
+       Add ``usage`` to running and finished jobs, and ``termination`` to finished jobs, in the response.
+       Add ``heartbeat`` and ``stalled`` to running jobs in the response.
+       Add ``stats`` to running and finished jobs in the response.
+       Add ``output_url`` to running and finished jobs in the response.
+       Add ``attempt`` and ``retry_of`` to all jobs, and ``retried_as`` to finished jobs, in the response.
+       Add ``not_before`` to pending jobs in the response.
+       Add ``expires_at`` to pending jobs in the response.
+       Cacheable.
     """
 
+    cacheable = True
+
+    def get_generation(self, project):
+        generation = super().get_generation(project)
+        # Running jobs' heartbeats, stats and usage change without changing the generation. Stats are updated every
+        # second, so responses with running jobs are cached for at most a second.
+        if any(count for (name, _), count in self.root.jobindex.running.items() if project in {None, name}):
+            return generation, int(time.time())
+        return generation
+
     @param("project", required=False)
     def render_GET(self, txrequest, project):
         queues = self.root.poller.queues
@@ -375,7 +1201,25 @@ class ListJobs(WsResource):
                     "spider": message["name"],
                     "version": message.get("_version"),
                     "settings": message.get("settings", {}),
-                    "args": {k: v for k, v in message.items() if k not in ("name", "_job", "_version", "settings")},
+                    "args": {
+                        k: v
+                        for k, v in message.items()
+                        if k
+                        not in (
+                            "name",
+                            "_job",
+                            "_version",
+                            "_limits",
+                            "_not_before",
+                            "_expires_at",
+                            "settings",
+                            *RETRY_KEYS,
+                        )
+                    },
+                    "not_before": str(message["_not_before"]) if "_not_before" in message else None,
+                    "expires_at": str(message["_expires_at"]) if "_expires_at" in message else None,
+                    "attempt": message.get("_attempt", 1),
+                    "retry_of": message.get("_retry_of"),
                 }
                 for queue_name in (queues if project is None else [project])
                 for message in queues[queue_name].list()
@@ -388,7 +1232,14 @@ class ListJobs(WsResource):
                     "pid": process.pid,
                     "start_time": str(process.start_time),
                     "log_url": self.root.get_log_url(process),
+                    "output_url": self.root.get_output_url(process),
                     "items_url": self.root.get_item_url(process),
+                    "usage": process.usage,
+                    "heartbeat": process.heartbeat,
+                    "stalled": process.stalled,
+                    "stats": process.read_stats(),
+                    "attempt": process.attempt,
+                    "retry_of": process.retry_of,
                 }
                 for process in self.root.launcher.processes.values()
                 if project is None or process.project == project
@@ -401,7 +1252,14 @@ class ListJobs(WsResource):
                     "start_time": str(finished.start_time),
                     "end_time": str(finished.end_time),
                     "log_url": self.root.get_log_url(finished),
+                    "output_url": self.root.get_output_url(finished),
                     "items_url": self.root.get_item_url(finished),
+                    "usage": getattr(finished, "usage", None),
+                    "termination": getattr(finished, "termination", None),
+                    "stats": getattr(finished, "stats", None),
+                    "attempt": getattr(finished, "attempt", 1),
+                    "retry_of": getattr(finished, "retry_of", None),
+                    "retried_as": getattr(finished, "retried_as", None),
                 }
                 for finished in self.root.launcher.finished
                 if project is None or finished.project == project
@@ -1,26 +1,78 @@
+import math
 import socket
 from datetime import datetime, timedelta
 from html import escape
 from pathlib import Path
 from textwrap import dedent, indent
+from typing import ClassVar
 from urllib.parse import quote, urlsplit
 
 from scrapy.utils.misc import load_object
 from twisted.application.service import IServiceCollection
 from twisted.python import filepath
-from twisted.web import resource, static
+from twisted.web import resource, server, static
 
-from scrapyd.interfaces import IEggStorage, IPoller, ISpiderScheduler
+from scrapyd.basicauth import get_credentials
+from scrapyd.compress import EXTENSIONS, negotiate
+from scrapyd.interfaces import IEggStorage, IJobIndex, IPoller, ISpiderScheduler
+from scrapyd.ratelimit import RateLimiter
 from scrapyd.utils import local_items
 
 
 # Use local DirectoryLister class.
 class File(static.File):
+    """
+    .. versionchanged:: 1.7.0
+       Serve a precompressed file, like ``job.log.gz`` for ``job.log``, if the client accepts its content coding. Compress
+       files larger than ``compression_min_size`` with gzip, if the client accepts it.
+    """
+
+    contentEncodings: ClassVar = {**static.File.contentEncodings, ".zst": "zstd", ".br": "br"}
+    compression_min_size = 0
+
+    def createSimilarFile(self, path):
+        f = super().createSimilarFile(path)
+        f.compression_min_size = self.compression_min_size
+        return f
+
     def directoryListing(self):
         path = self.path
         names = self.listNames()
         return DirectoryLister(path, names, self.contentTypes, self.contentEncodings, self.defaultType)
 
+    def getChild(self, path, request):
+        child = super().getChild(path, request)
+        # Ranges are of the uncompressed file, and encoded files are served as-is.
+        if (
+            not isinstance(child, File)
+            or not child.isfile()
+            or request.getHeader("Range")
+            or child.splitext()[1] in self.contentEncodings
+        ):
+            return child
+
+        precompressed = {
+            coding: sibling
+            for coding, extension in EXTENSIONS.items()
+            if (sibling := child.siblingExtension(extension)).isfile()
+        }
+        compressible = request.method == b"GET" and 0 < self.compression_min_size <= child.getsize()
+        if not precompressed and not compressible:
+            return child
+
+        request.setHeader("Vary", "Accept-Encoding")
+        coding = negotiate(
+            request.getHeader("Accept-Encoding"), [*precompressed, "gzip"] if compressible else precompressed
+        )
+        if coding in precompressed:
+            return self.createSimilarFile(precompressed[coding].path)
+        if coding == "gzip":
+            # Compress on the fly, while the file is produced.
+            encoder = server.GzipEncoderFactory()
+            encoder.compressLevel = 1
+            return resource.EncodingResourceWrapper(child, [encoder])
+        return child
+
 
 # Add "Last modified" column.
 class DirectoryLister(static.DirectoryLister):
@@ -123,7 +175,9 @@ h1 {padding: 0.1em; background-color: #777; color: white; border-bottom: thin wh
 
 
 def _get_file_url(base, directory, job, extension):
-    if (Path(directory) / job.project / job.spider / f"{job.job}.{extension}").exists():
+    path = Path(directory) / job.project / job.spider / f"{job.job}.{extension}"
+    # A precompressed file is served, if the file is absent.
+    if path.exists() or any(path.with_name(f"{path.name}{suffix}").exists() for suffix in EXTENSIONS.values()):
         return f"/{base}/{job.project}/{job.spider}/{job.job}.{extension}"
     return None
 
@@ -133,6 +187,7 @@ class Root(resource.Resource):
         super().__init__()
 
         self.app = app
+        self.config = config
         self.logs_dir = config.get("logs_dir", "logs")
         self.items_dir = config.get("items_dir", "")
         self.debug = config.getboolean("debug", False)
@@ -140,11 +195,26 @@ class Root(resource.Resource):
         self.prefix_header = config.get("prefix_header", "x-forwarded-prefix")
         self.local_items = local_items(self.items_dir, urlsplit(self.items_dir))
         self.node_name = config.get("node_name", socket.gethostname())
-
+        self.events_to_keep = config.getint("events_to_keep", 1000)
+        self.max_pending = config.getint("max_pending", 0)
+        self.max_pending_per_project = config.getint("max_pending_per_project", 0)
+        # Pending jobs start no sooner than the next poll.
+        self.pending_retry_after = max(1, math.ceil(config.getfloat("poll_interval", 5)))
+        # Basic authentication is enabled if both the username and password are set.
+        self.authenticated = all(get_credentials(config))
+        self.rate_limiter = RateLimiter(config)
+        self.compression_min_size = config.getint("compression_min_size", 1024)
+
+        # If a file is absent, serve its precompressed file.
+        ignored_extensions = tuple(EXTENSIONS.values())
         if self.logs_dir:
-            self.putChild(b"logs", File(self.logs_dir, "text/plain"))
+            logs = File(self.logs_dir, "text/plain", ignored_extensions)
+            logs.compression_min_size = self.compression_min_size
+            self.putChild(b"logs", logs)
         if self.local_items:
-            self.putChild(b"items", File(self.items_dir, "text/plain"))
+            items = File(self.items_dir, "text/plain", ignored_extensions)
+            items.compression_min_size = self.compression_min_size
+            self.putChild(b"items", items)
 
         for service_name, service_path in config.items("services", default=[]):
             if service_path:
@@ -158,10 +228,22 @@ class Root(resource.Resource):
     def update_projects(self):
         self.poller.update_projects()
         self.scheduler.update_projects()
+        self.jobindex.update_projects(self.poller.queues)
+
+    def get_max_pending(self, project):
+        """
+        Return the maximum number of pending jobs in the project, from the project's ``[limits.<project>]`` section or
+        the ``[scrapyd]`` section, or 0 if unlimited.
+        """
+        values = dict(self.config.items(f"limits.{project}", default=[]))
+        return int(values.get("max_pending", self.max_pending_per_project))
 
     def get_log_url(self, job):
         return _get_file_url("logs", self.logs_dir, job, "log")
 
+    def get_output_url(self, job):
+        return _get_file_url("logs", self.logs_dir, job, "out")
+
     def get_item_url(self, job):
         if self.local_items:
             return _get_file_url("items", self.items_dir, job, "jl")
@@ -171,6 +253,10 @@ class Root(resource.Resource):
     def launcher(self):
         return IServiceCollection(self.app, self.app).getServiceNamed("launcher")
 
+    @property
+    def periodic(self):
+        return IServiceCollection(self.app, self.app).getServiceNamed("periodic")
+
     @property
     def scheduler(self):
         return self.app.getComponent(ISpiderScheduler)
@@ -183,6 +269,10 @@ class Root(resource.Resource):
     def poller(self):
         return self.app.getComponent(IPoller)
 
+    @property
+    def jobindex(self):
+        return self.app.getComponent(IJobIndex)
+
 
 class PrefixHeaderMixin:
     def get_base_path(self, txrequest):
@@ -256,6 +346,18 @@ def no_microseconds(timelike):
     return timelike - timedelta(microseconds=ms)
 
 
+def format_cpu(usage):
+    if usage is None:
+        return None
+    return f"{usage['cpu_user'] + usage['cpu_system']:.1f}s"
+
+
+def format_memory(usage):
+    if usage is None or (value := usage.get("max_rss", usage.get("rss"))) is None:
+        return None
+    return f"{value / 2**20:.0f} MiB"
+
+
 class Jobs(PrefixHeaderMixin, resource.Resource):
     def __init__(self, root):
         super().__init__()
@@ -269,6 +371,8 @@ class Jobs(PrefixHeaderMixin, resource.Resource):
             "Start",
             "Runtime",
             "Finish",
+            "CPU",
+            "Memory",
             "Log",
         ]
         # Hide the Items column if items_dir isn't local.
@@ -290,9 +394,12 @@ class Jobs(PrefixHeaderMixin, resource.Resource):
         )
 
     def html_log_url(self, job):
+        links = []
         if url := self.root.get_log_url(job):
-            return f'<a href="{self.base_path}{url}">Log</a>'
-        return None
+            links.append(f'<a href="{self.base_path}{url}">Log</a>')
+        if url := self.root.get_output_url(job):
+            links.append(f'<a href="{self.base_path}{url}">Output</a>')
+        return " ".join(links) or None
 
     def html_item_url(self, job):
         if url := self.root.get_item_url(job):
@@ -314,6 +421,8 @@ class Jobs(PrefixHeaderMixin, resource.Resource):
                     "Project": escape(project),
                     "Spider": escape(message["name"]),
                     "Job": escape(message["_job"]),
+                    # A delayed job starts no earlier than its due time.
+                    "Start": no_microseconds(message["_not_before"]) if "_not_before" in message else None,
                     "Cancel": self.cancel_button(project, message["_job"]),
                 }
             )
@@ -331,6 +440,8 @@ class Jobs(PrefixHeaderMixin, resource.Resource):
                     "PID": process.pid,
                     "Start": no_microseconds(process.start_time),
                     "Runtime": no_microseconds(datetime.now() - process.start_time),
+                    "CPU": format_cpu(process.usage),
+                    "Memory": format_memory(process.usage),
                     "Log": self.html_log_url(process),
                     "Items": self.html_item_url(process),
                     "Cancel": self.cancel_button(process.project, process.job),
@@ -349,6 +460,8 @@ class Jobs(PrefixHeaderMixin, resource.Resource):
                     "Start": no_microseconds(job.start_time),
                     "Runtime": no_microseconds(job.end_time - job.start_time),
                     "Finish": no_microseconds(job.end_time),
+                    "CPU": format_cpu(getattr(job, "usage", None)),
+                    "Memory": format_memory(getattr(job, "usage", None)),
                     "Log": self.html_log_url(job),
                     "Items": self.html_item_url(job),
                 }
@@ -7,6 +7,28 @@ from twisted.logger import eventAsText
 
 from scrapyd.launcher import ScrapyProcessProtocol
 
+# Python code that starts a child process that sleeps, and prints its pid.
+SPAWN = (
+    "import subprocess, sys; "
+    "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); "
+    "print(child.pid, flush=True)"
+)
+
+
+class Legacy:
+    """
+    Proxy an object, without the given methods, like an implementation of an older version of its interface.
+    """
+
+    def __init__(self, obj, *missing):
+        self._obj = obj
+        self._missing = missing
+
+    def __getattr__(self, name):
+        if name in self._missing:
+            raise AttributeError(name)
+        return getattr(self._obj, name)
+
 
 def touch(path):
     path.parent.mkdir(parents=True)
@@ -0,0 +1,64 @@
+import signal
+from unittest.mock import MagicMock
+
+import pytest
+from twisted.application.internet import TimerService
+from twisted.logger import LogLevel, capturedLogs
+
+from scrapyd.app import Reloader
+from scrapyd.config import Config
+from scrapyd.launcher import Launcher
+
+
+@pytest.fixture
+def reloader(app):
+    config = Config()
+    config.cp.set(Config.SECTION, "max_proc", "2")
+    launcher = Launcher(config, app)
+    launcher.startService()
+    timer = TimerService(5, MagicMock())
+    timer.startService()
+
+    reloaded = Config()
+    reloaded.cp.set(Config.SECTION, "max_proc", "3")
+    reloaded.cp.set(Config.SECTION, "poll_interval", "1.5")
+    yield Reloader(launcher, timer, lambda: reloaded)
+
+    timer.stopService()
+    launcher.stopService()
+
+
+def test_reload(reloader):
+    loop = reloader.timer._loop  # noqa: SLF001
+
+    reloader.reload()
+
+    assert reloader.launcher.max_proc == 3
+    assert reloader.launcher.slots == {0, 1, 2}
+    assert reloader.timer.step == 1.5
+    assert reloader.timer._loop is not loop  # noqa: SLF001
+    assert reloader.timer._loop.interval == 1.5  # noqa: SLF001
+
+
+def test_reload_error(reloader):
+    reloader.config_factory = MagicMock(side_effect=OSError)
+
+    with capturedLogs() as captured:
+        reloader.reload()
+
+    assert reloader.launcher.max_proc == 2
+    assert reloader.timer.step == 5
+    assert captured[0]["log_level"] == LogLevel.critical
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="requires SIGHUP")
+def test_signal(reloader):
+    previous = signal.getsignal(signal.SIGHUP)
+
+    reloader.startService()
+
+    assert signal.getsignal(signal.SIGHUP) == reloader._signal_received  # noqa: SLF001
+
+    reloader.stopService()
+
+    assert signal.getsignal(signal.SIGHUP) == previous
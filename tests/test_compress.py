@@ -0,0 +1,37 @@
+import gzip
+
+import pytest
+
+from scrapyd.compress import CODINGS, negotiate, parse_accept_encoding
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, BR;q=0.5, zstd ; q=0, *;q=x,") == {
+        "gzip": 1.0,
+        "br": 0.5,
+        "zstd": 0.0,
+        "*": 0.0,
+    }
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        # The client's preference wins.
+        ("gzip, br;q=0.5", "gzip"),
+        ("br;q=0, *", "zstd"),
+        ("*;q=0", None),
+    ],
+)
+def test_negotiate(header, expected):
+    assert negotiate(header, ["zstd", "br", "gzip"]) == expected
+
+
+def test_codings():
+    assert list(CODINGS)[-1] == "gzip"
+    assert gzip.decompress(CODINGS["gzip"](b"abc")) == b"abc"
@@ -7,7 +7,7 @@ import pytest
 from zope.interface.verify import verifyObject
 
 from scrapyd.config import Config
-from scrapyd.environ import Environment
+from scrapyd.environ import Environment, get_job
 from scrapyd.exceptions import DirectoryTraversalError
 from scrapyd.interfaces import IEnvironment
 from tests import has_settings
@@ -114,6 +114,68 @@ def test_jobs_to_keep(chdir):
     assert not (directory / "j2.b").exists()
 
 
+def test_jobs_to_keep_files_per_job(chdir):
+    config = Config(values={"jobs_to_keep": "2"})
+    environ = Environment(config, initenv={})
+    directory = chdir / "logs" / "p1" / "s1"
+    directory.mkdir(parents=True)
+
+    for mtime, name in enumerate(("j1.log", "j1.out", "j2.log", "j2.out", "j3.log", "j3.out"), 1000000000):
+        (directory / name).touch()
+        os.utime(directory / name, (mtime, mtime))
+
+    environ.get_settings({"_project": "p1", "_spider": "s1", "_job": "j4"})
+
+    assert sorted(path.name for path in directory.iterdir()) == ["j2.log", "j2.out", "j3.log", "j3.out"]
+
+
+def test_jobs_to_keep_precompressed(chdir):
+    config = Config(values={"jobs_to_keep": "2"})
+    environ = Environment(config, initenv={})
+    directory = chdir / "logs" / "p1" / "s1"
+    directory.mkdir(parents=True)
+
+    # Precompressed files are newer than their jobs' other files.
+    for mtime, name in enumerate(("j1.log", "j2.log", "j3.log", "j1.log.gz", "j2.log.gz", "j3.log.gz"), 1000000000):
+        (directory / name).touch()
+        os.utime(directory / name, (mtime, mtime))
+
+    environ.get_settings({"_project": "p1", "_spider": "s1", "_job": "j4"})
+
+    assert sorted(path.name for path in directory.iterdir()) == ["j2.log", "j2.log.gz", "j3.log", "j3.log.gz"]
+
+
+def test_jobs_to_keep_dots(chdir):
+    config = Config(values={"jobs_to_keep": "2"})
+    environ = Environment(config, initenv={})
+    directory = chdir / "logs" / "p1" / "s1"
+    directory.mkdir(parents=True)
+
+    for day in range(1, 8):
+        name = f"nightly.2026-10-0{day}.log"
+        (directory / name).touch()
+        os.utime(directory / name, (1000000000 + day, 1000000000 + day))
+
+    environ.get_settings({"_project": "p1", "_spider": "s1", "_job": "nightly.2026-10-08"})
+
+    assert sorted(path.name for path in directory.iterdir()) == ["nightly.2026-10-06.log", "nightly.2026-10-07.log"]
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("j1.log", "j1"),
+        ("j1.log.gz", "j1"),
+        ("j1.jl.zst", "j1"),
+        ("j1.out", "j1"),
+        ("j1.a", "j1.a"),
+        ("nightly.2026-10-01.log.br", "nightly.2026-10-01"),
+    ],
+)
+def test_get_job(name, expected):
+    assert get_job(name) == expected
+
+
 @pytest.mark.parametrize(
     ("message", "run_only_if_has_settings"),
     [
@@ -0,0 +1,143 @@
+import mmap
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.statscollectors import MemoryStatsCollector
+
+from scrapyd.extensions import (
+    SEQUENCE,
+    STATS,
+    STATS_SIZE,
+    Heartbeat,
+    StatsFile,
+    create_stats_file,
+    format_heartbeat,
+    get_extensions,
+    parse_heartbeat,
+    read_stats,
+    write_stats,
+)
+
+
+@pytest.fixture
+def crawler():
+    crawler = MagicMock()
+    crawler.stats = MemoryStatsCollector(crawler)
+    return crawler
+
+
+@pytest.mark.parametrize(
+    ("environ", "expected"),
+    [
+        ({}, {}),
+        ({"SCRAPYD_HEARTBEAT_FD": ""}, {}),
+        ({"SCRAPYD_HEARTBEAT_FD": "3"}, {"scrapyd.extensions.Heartbeat": 0}),
+    ],
+)
+def test_get_extensions(environ, expected):
+    assert get_extensions(environ) == expected
+
+
+def test_format_heartbeat(crawler):
+    crawler.stats.set_value("downloader/request_count", 3)
+    crawler.stats.set_value("item_scraped_count", 1)
+
+    line = format_heartbeat(crawler.stats)
+
+    assert line == b"3 0 1\n"
+    assert parse_heartbeat(line) == {"requests": 3, "responses": 0, "items": 1}
+
+
+@pytest.mark.parametrize("line", [b"1 2", b"1 2 3 4", b"1 2 x", b""])
+def test_parse_heartbeat_invalid(line):
+    with pytest.raises(ValueError):  # noqa: PT011
+        parse_heartbeat(line)
+
+
+@pytest.mark.parametrize(
+    "environ",
+    [{}, {"SCRAPYD_HEARTBEAT_FD": "3"}, {"SCRAPYD_HEARTBEAT_FD": "3", "SCRAPYD_HEARTBEAT_INTERVAL": "0"}],
+)
+def test_heartbeat_not_configured(monkeypatch, crawler, environ):
+    monkeypatch.delenv("SCRAPYD_HEARTBEAT_FD", raising=False)
+    monkeypatch.delenv("SCRAPYD_HEARTBEAT_INTERVAL", raising=False)
+    for key, value in environ.items():
+        monkeypatch.setenv(key, value)
+
+    with pytest.raises(NotConfigured):
+        Heartbeat.from_crawler(crawler)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="requires non-blocking pipes")
+def test_heartbeat(monkeypatch, crawler):
+    read, write = os.pipe()
+    monkeypatch.setenv("SCRAPYD_HEARTBEAT_FD", str(write))
+    monkeypatch.setenv("SCRAPYD_HEARTBEAT_INTERVAL", "60")
+    crawler.stats.set_value("response_received_count", 2)
+
+    extension = Heartbeat.from_crawler(crawler)
+    extension.engine_started()
+
+    assert extension.task.running
+    assert os.read(read, 100) == b"0 2 0\n"
+
+    extension.engine_stopped()
+
+    assert not extension.task.running
+
+    os.close(read)
+    extension.beat()  # the pipe is closed
+
+    os.close(write)
+
+
+def test_stats_file(tmp_path, crawler):
+    buffer = create_stats_file(tmp_path / "0.stats")
+
+    assert read_stats(buffer) == dict.fromkeys(STATS, 0)
+
+    crawler.stats.set_value("item_scraped_count", 5)
+    crawler.stats.set_value("log_count/ERROR", 1)
+    with (tmp_path / "0.stats").open("r+b") as f, mmap.mmap(f.fileno(), STATS_SIZE) as writable:
+        write_stats(writable, crawler.stats)
+
+        assert read_stats(buffer) == {**dict.fromkeys(STATS, 0), "items": 5, "errors": 1}
+
+        # The extension is writing.
+        SEQUENCE.pack_into(writable, 0, 3)
+
+        assert read_stats(buffer) is None
+
+    buffer.close()
+
+
+def test_stats_file_extension(monkeypatch, tmp_path, crawler):
+    path = tmp_path / "0.stats"
+    buffer = create_stats_file(path)
+    monkeypatch.setenv("SCRAPYD_STATS_FILE", str(path))
+    crawler.stats.set_value("downloader/request_count", 2)
+
+    extension = StatsFile.from_crawler(crawler)
+    extension.engine_started()
+
+    assert extension.task.running
+    assert read_stats(buffer)["requests"] == 2
+
+    crawler.stats.set_value("downloader/request_count", 3)
+    extension.engine_stopped()
+
+    assert not extension.task.running
+    assert extension.buffer is None
+    assert read_stats(buffer)["requests"] == 3
+
+    buffer.close()
+
+
+def test_stats_file_extension_not_configured(monkeypatch, crawler):
+    monkeypatch.delenv("SCRAPYD_STATS_FILE", raising=False)
+
+    with pytest.raises(NotConfigured):
+        StatsFile.from_crawler(crawler)
@@ -6,7 +6,16 @@ from zope.interface.verify import verifyClass
 from scrapyd.basicauth import PublicHTMLRealm, StringCredentialsChecker
 from scrapyd.eggstorage import FilesystemEggStorage
 from scrapyd.environ import Environment
-from scrapyd.interfaces import IEggStorage, IEnvironment, IJobStorage, IPoller, ISpiderQueue, ISpiderScheduler
+from scrapyd.interfaces import (
+    IEggStorage,
+    IEnvironment,
+    IJobIndex,
+    IJobStorage,
+    IPoller,
+    ISpiderQueue,
+    ISpiderScheduler,
+)
+from scrapyd.jobindex import JobIndex
 from scrapyd.jobstorage import MemoryJobStorage, SqliteJobStorage
 from scrapyd.poller import QueuePoller
 from scrapyd.scheduler import SpiderScheduler
@@ -20,6 +29,7 @@ from scrapyd.spiderqueue import SqliteSpiderQueue
         (StringCredentialsChecker, ICredentialsChecker),
         (FilesystemEggStorage, IEggStorage),
         (Environment, IEnvironment),
+        (JobIndex, IJobIndex),
         (MemoryJobStorage, IJobStorage),
         (SqliteJobStorage, IJobStorage),
         (QueuePoller, IPoller),
@@ -0,0 +1,245 @@
+import pytest
+from zope.interface.verify import verifyObject
+
+from scrapyd.config import Config
+from scrapyd.interfaces import IJobIndex
+from scrapyd.jobindex import JobIndex
+from scrapyd.jobstorage import MemoryJobStorage
+from scrapyd.launcher import ScrapyProcessProtocol
+from scrapyd.spiderqueue import SqliteSpiderQueue
+from tests import get_finished_job
+
+
+@pytest.fixture
+def config():
+    return Config(values={"dbs_dir": ":memory:", "finished_to_keep": "2"})
+
+
+@pytest.fixture
+def jobindex(config):
+    return JobIndex(config)
+
+
+def test_interface(jobindex):
+    verifyObject(IJobIndex, jobindex)
+
+
+def test_lifecycle(jobindex):
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+
+    assert jobindex.state("j1") is None
+    assert jobindex.get("p1", "j1") is None
+
+    jobindex.schedule("p1", "s1", "j1")
+
+    assert jobindex.state("j1") == "pending"
+    assert jobindex.state("j1", "p1") == "pending"
+    assert jobindex.state("j1", "p2") is None
+    assert jobindex.get("p1", "j1").pending == 1
+
+    jobindex.pop("p1", "j1")
+    jobindex.start(process, 3)
+
+    assert jobindex.state("j1", "p1") == "running"
+    assert jobindex.get("p1", "j1").slots == {3}
+
+    jobindex.finish(process, 3)
+
+    assert jobindex.state("j1", "p1") == "finished"
+    assert jobindex.get("p1", "j1").slots == set()
+    assert jobindex.get("p1", "j1").finished is process
+
+
+def test_pop_cancel(jobindex):
+    jobindex.schedule("p1", "s1", "j1")
+    jobindex.schedule("p1", "s1", "j1")
+    jobindex.pop("p1", "j1")
+
+    assert jobindex.state("j1", "p1") == "pending"
+
+    jobindex.cancel("p1", "j1")
+
+    assert jobindex.state("j1", "p1") is None
+    assert "j1" not in jobindex.jobs
+
+    # Unknown jobs are ignored.
+    jobindex.pop("p1", "j1")
+    jobindex.cancel("p1", "j1")
+
+
+def test_expire(jobindex):
+    events = []
+    jobindex.add_observer(events.append)
+    jobindex.schedule("p1", "s1", "j1")
+    job = get_finished_job("p1", "s1", "j1")
+    job.termination = "expired"
+    jobindex.expire(job)
+
+    assert jobindex.state("j1", "p1") == "finished"
+    assert jobindex.get("p1", "j1").finished is job
+    assert jobindex.pending["p1"] == 0
+    assert [event["event"] for event in events] == ["scheduled", "expired"]
+
+
+def test_state_precedence(jobindex):
+    jobindex.schedule("p1", "s1", "j1")
+    jobindex.start(ScrapyProcessProtocol("p2", "s2", "j1", env={}, args=[]), 0)
+
+    assert jobindex.state("j1") == "running"
+
+    jobindex.finish(get_finished_job("p3", "s3", "j1"))
+
+    assert jobindex.state("j1") == "finished"
+    assert jobindex.state("j1", "p1") == "pending"
+    assert jobindex.state("j1", "p2") == "running"
+
+
+def test_finish_evict(jobindex):
+    jobindex.schedule("p1", "s1", "j1")
+    for job in ("j1", "j2", "j3"):
+        jobindex.finish(get_finished_job("p1", "s1", job))
+
+    assert jobindex.state("j1", "p1") == "pending"  # finished_to_keep = 2
+    assert jobindex.state("j2", "p1") == "finished"
+    assert jobindex.state("j3", "p1") == "finished"
+
+    jobindex.finish(get_finished_job("p1", "s1", "j4"))
+
+    assert jobindex.state("j2", "p1") is None
+    assert "j2" not in jobindex.jobs
+
+
+def test_finish_keep_all():
+    jobindex = JobIndex(Config(values={"finished_to_keep": "0"}))
+    for job in ("j1", "j2", "j3"):
+        jobindex.finish(get_finished_job("p1", "s1", job))
+
+    assert [jobindex.state(job, "p1") for job in ("j1", "j2", "j3")] == ["finished"] * 3
+
+
+def test_rebuild(config, jobindex):
+    queue = SqliteSpiderQueue(config, "p1")
+    queue.add("s1", _job="j1")
+    queue.add("s1")  # no job ID
+    jobstorage = MemoryJobStorage(config)
+    jobstorage.add(get_finished_job("p1", "s1", "j2"))
+    jobindex.schedule("p1", "s1", "j3")
+
+    jobindex.rebuild({"p1": queue}, jobstorage)
+
+    assert jobindex.state("j1", "p1") == "pending"
+    assert jobindex.state("j2", "p1") == "finished"
+    assert jobindex.state("j3", "p1") is None
+
+
+def test_update_projects(config, jobindex):
+    queue = SqliteSpiderQueue(config, "p1")
+    queue.add("s1", _job="j1")
+    jobindex.update_projects({})
+    jobindex.finish(get_finished_job("p1", "s1", "j1"))
+
+    assert jobindex.state("j1", "p1") == "finished"
+
+    jobindex.update_projects({"p1": queue})
+
+    assert jobindex.get("p1", "j1").pending == 1
+
+    jobindex.update_projects({})
+
+    assert jobindex.get("p1", "j1").pending == 0
+    assert jobindex.state("j1", "p1") == "finished"
+
+
+def test_observer(config, jobindex):
+    events = []
+    jobindex.add_observer(events.append)
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    process.pid = 123
+
+    jobindex.schedule("p1", "s1", "j1")
+    jobindex.pop("p1", "j1")
+    jobindex.start(process, 0)
+    process.exit_signal = 15
+    jobindex.finish(process, 0)
+    jobindex.schedule("p1", "s1", "j2")
+    jobindex.cancel("p1", "j2", "pending")
+    jobindex.cancel("p1", "j3", "pending")  # unknown
+    jobindex.finish(get_finished_job("p1", "s1", "j4"))
+    jobindex.rebuild({}, MemoryJobStorage(config))
+
+    assert [(event["event"], event["job"]) for event in events] == [
+        ("scheduled", "j1"),
+        ("started", "j1"),
+        ("failed", "j1"),
+        ("scheduled", "j2"),
+        ("cancelled", "j2"),
+        ("finished", "j4"),
+    ]
+    assert events[1]["pid"] == 123
+    assert events[2]["exit_code"] is None
+    assert events[2]["exit_signal"] == 15
+    assert events[4]["prevstate"] == "pending"
+    assert events[5]["exit_code"] is None
+    assert events[5]["exit_signal"] is None
+    assert all(event["project"] == "p1" and event["spider"] == "s1" and event["time"] for event in events)
+
+
+def test_observer_error(jobindex):
+    events = []
+
+    def fail(event):
+        raise ValueError
+
+    jobindex.add_observer(fail)
+    jobindex.add_observer(events.append)
+    jobindex.schedule("p1", "s1", "j1")
+
+    assert len(events) == 1
+
+
+def test_counts(config, jobindex):
+    queue = SqliteSpiderQueue(config, "p1")
+    queue.add("s1", _job="j1")
+    jobindex.update_projects({"p1": queue, "p2": SqliteSpiderQueue(config, "p2")})
+
+    assert jobindex.pending == {"p1": 1, "p2": 0}
+
+    jobindex.schedule("p1", "s1", "j2")
+    jobindex.schedule("p1", "s1", "j2")
+    jobindex.schedule("p1", "s1", "j3")
+
+    assert jobindex.pending == {"p1": 4, "p2": 0}
+
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    jobindex.pop("p1", "j1")
+    jobindex.pop("p1", "j1")  # not pending
+    jobindex.start(process, 0)
+    jobindex.start(process, 0)  # already started
+    jobindex.cancel("p1", "j2", "pending")
+
+    assert jobindex.pending == {"p1": 1, "p2": 0}
+    assert jobindex.running == {("p1", "s1"): 1}
+
+    jobindex.finish(process, 0)
+    jobindex.finish(get_finished_job("p1", "s1", "j4"))  # not running
+    jobindex.update_projects({"p2": SqliteSpiderQueue(config, "p2")})
+
+    assert jobindex.pending == {"p2": 0}
+    assert jobindex.running == {("p1", "s1"): 0}
+
+
+def test_generations(config, jobindex):
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    jobindex.update_projects({"p1": SqliteSpiderQueue(config, "p1"), "p2": SqliteSpiderQueue(config, "p2")})
+
+    assert jobindex.generations == {"p1": 1, "p2": 1, None: 1}
+
+    jobindex.schedule("p1", "s1", "j1")
+    jobindex.pop("p1", "j1")
+    jobindex.start(process, 0)
+    jobindex.finish(process, 0)
+    jobindex.cancel("p1", "j1")  # not pending
+    jobindex.schedule("p1", "s1", "j2")
+    jobindex.cancel("p1", "j2")
+
+    assert jobindex.generations == {"p1": 7, "p2": 1, None: 7}
@@ -59,3 +59,12 @@ class TestJobStorage:
         assert len(jobstorage) == 2
         assert actual == list(jobstorage)
         assert actual == [job3, job2]
+
+    def test_count_by_spider(self, cls, tmpdir):
+        jobstorage = cls(config(tmpdir))
+        jobstorage.add(job1)
+        jobstorage.add(job2)
+
+        assert jobstorage.count_by_spider() == {("p1", "s1"): 1, ("p2", "s2"): 1}
+        assert jobstorage.count_by_spider(job2.end_time) == {("p2", "s2"): 1}
+        assert jobstorage.count_by_spider(datetime.datetime(2002, 1, 1)) == {}
@@ -1,15 +1,28 @@
+import copy
 import datetime
+import mmap
+import os
 import re
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
 
 import pytest
-from twisted.internet import defer, error
+from twisted.internet import defer, error, reactor
+from twisted.internet.task import deferLater
 from twisted.logger import LogLevel, capturedLogs
 from twisted.python import failure
 
 from scrapyd import __version__
 from scrapyd.config import Config
-from scrapyd.launcher import Launcher, get_crawl_args
-from tests import get_message, has_settings
+from scrapyd.extensions import SEQUENCE, STATS, STATS_SIZE, VALUES
+from scrapyd.interfaces import IPoller, ISpiderScheduler
+from scrapyd.launcher import OUTPUT_TAIL_SIZE, Launcher, ScrapyProcessProtocol, get_crawl_args, read_tail
+from scrapyd.metrics import LEAKED_PROCESSES
+from scrapyd.processes import get_start_ticks
+from tests import SPAWN, Legacy, get_message, has_settings
 
 
 def remove_debug_messages(captured):
@@ -71,6 +84,14 @@ def test_start_service_max_proc(app):
     )
 
 
+def test_start_stop_service_legacy(app):
+    app.setComponent(IPoller, Legacy(app.getComponent(IPoller), "add_observer", "remove_observer"))
+    launcher = Launcher(Config(), app)
+
+    launcher.startService()
+    launcher.stopService()
+
+
 @pytest.mark.parametrize(
     ("message", "expected"),
     [
@@ -104,6 +125,23 @@ def test_spawn_process(launcher, message, expected):
         assert "SCRAPY_SETTINGS_MODULE" not in process.env
 
 
+def test_jobindex(launcher):
+    launcher.jobindex.schedule("p1", "s1", "j1")
+    launcher._spawn_process({"_project": "p1", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+
+    entry = launcher.jobindex.get("p1", "j1")
+
+    assert entry.pending == 0
+    assert entry.slots == {0}
+    assert entry.state == "running"
+
+    launcher._process_finished(None, 0)  # noqa: SLF001
+
+    assert entry.slots == set()
+    assert entry.finished is not None
+    assert entry.state == "finished"
+
+
 def test_out_received(process):
     with capturedLogs() as captured:
         process.outReceived(b"out\n")
@@ -150,6 +188,9 @@ def test_process_ended_done(environ, process):
         process.processEnded(failure.Failure(error.ProcessDone(0)))
     captured = remove_debug_messages(captured)
 
+    assert process.exit_code == 0
+    assert process.exit_signal is None
+
     assert len(captured) == 1
     assert captured[0]["log_level"] == LogLevel.info
     if environ.items_dir:
@@ -173,6 +214,9 @@ def test_process_ended_terminated(environ, process):
         process.processEnded(failure.Failure(error.ProcessTerminated(1)))
     captured = remove_debug_messages(captured)
 
+    assert process.exit_code == 1
+    assert process.exit_signal is None
+
     assert len(captured) == 1
     assert captured[0]["log_level"] == LogLevel.error
     if environ.items_dir:
@@ -192,3 +236,588 @@ def test_process_ended_terminated(environ, process):
 
 def test_repr(process):
     assert repr(process).startswith(f"ScrapyProcessProtocol(project=p1 spider=s1 job=j1 pid={process.pid} start_time=")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="requires childFDs and the resource module")
+@pytest.mark.parametrize("output_to_file", [False, True])
+@defer.inlineCallbacks
+def test_usage(app, tmp_path, output_to_file):
+    config = Config()
+    config.cp.set(Config.SECTION, "logs_dir", str(tmp_path))
+    config.cp.set(Config.SECTION, "output_to_file", str(output_to_file))
+    launcher = Launcher(config, app)
+
+    launcher._spawn_process({"_project": "nonexistent", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+    process = launcher.processes[0]
+    yield launcher.wait(process, 30)
+
+    assert process.usage["cpu_user"] > 0
+    assert process.usage["max_rss"] > 2**20
+    assert set(process.usage) == {
+        "cpu_user",
+        "cpu_system",
+        "max_rss",
+        "read_bytes",
+        "write_bytes",
+        "voluntary_switches",
+        "involuntary_switches",
+    }
+
+
+def test_report_usage(process):
+    process.usage = {"cpu_user": 1.0, "max_rss": 1, "rss": 1}
+    process._usage_buffer = b'{"cpu_user": 2.0, "max_rss": 2}'  # noqa: SLF001
+
+    process.report_usage()
+
+    assert process.usage == {"cpu_user": 2.0, "max_rss": 2}
+
+
+def test_report_usage_invalid(process):
+    process.usage = {"max_rss": 1, "rss": 1}
+    process._usage_buffer = b'{"cpu_user'  # noqa: SLF001
+
+    with capturedLogs() as captured:
+        process.report_usage()
+
+    assert len(captured) == 1
+    assert captured[0]["log_level"] == LogLevel.warn
+    assert get_message(captured).startswith("[Launcher,")
+    assert "Invalid usage report" in get_message(captured)
+    assert process.usage == {"max_rss": 1, "rss": 1}
+
+
+@pytest.mark.skipif(not Path("/proc/self/stat").exists(), reason="requires /proc")
+@pytest.mark.parametrize(("child_fd", "reaped", "sampled"), [(1, False, True), (2, False, True), (1, True, False)])
+def test_usage_connection_lost(child_fd, reaped, sampled):
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    process.pid = os.getpid()
+    process.usage = {"max_rss": 1, "rss": 1}
+    process.transport = MagicMock()
+    process.transport.pid = None if reaped else process.pid
+
+    process.childConnectionLost(child_fd)
+
+    if sampled:
+        assert process.usage["cpu_user"] > 0
+        assert process.usage["max_rss"] > 1
+        assert "rss" not in process.usage
+    else:
+        assert process.usage == {"max_rss": 1, "rss": 1}
+
+
+@pytest.mark.skipif(not Path("/proc/self/stat").exists(), reason="requires /proc")
+def test_sample_usage(launcher):
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    process.pid = os.getpid()
+    launcher.processes[0] = process
+    launcher.processes[1] = ScrapyProcessProtocol("p1", "s1", "j2", env={}, args=[])  # not started
+
+    launcher._sample_usage()  # noqa: SLF001
+
+    assert process.usage["rss"] > 0
+    assert launcher.processes[1].usage is None
+
+
+def test_usage_sampler(app):
+    config = Config()
+    config.cp.set(Config.SECTION, "usage_interval", "5")
+    launcher = Launcher(config, app)
+
+    launcher.startService()
+
+    assert launcher.usage_sampler.running
+
+    launcher.stopService()
+
+    assert not launcher.usage_sampler.running
+
+
+def test_limits(app):
+    config = Config()
+    config.cp.set(Config.SECTION, "cpu_limit", "60")
+    launcher = Launcher(config, app)
+
+    launcher._spawn_process(  # noqa: SLF001
+        {"_project": "p1", "_spider": "s1", "_job": "j1", "_limits": {"files_limit": 100}}, 0
+    )
+    process = launcher.processes[0]
+
+    assert process.limits == {"cpu_limit": 60, "files_limit": 100}
+    assert process.env["SCRAPYD_CPU_LIMIT"] == "60"
+    assert process.env["SCRAPYD_FILES_LIMIT"] == "100"
+    assert "SCRAPYD_MEMORY_LIMIT" not in process.env
+    assert not any(arg.startswith("_limits=") for arg in process.args)
+
+    process.exit_signal = getattr(signal, "SIGXCPU", 24)
+    with capturedLogs() as captured:
+        launcher._process_finished(None, 0)  # noqa: SLF001
+    captured = remove_debug_messages(captured)
+
+    assert process.termination == "cpu_limit"
+    assert next(iter(launcher.finished)).termination == "cpu_limit"
+    assert captured[0]["log_level"] == LogLevel.warn
+    assert get_message(captured).startswith("[scrapyd.launcher#warn] Process exceeded its cpu_limit: project='p1'")
+
+
+@pytest.fixture
+def stoppable(app):
+    config = Config()
+    config.cp.set(Config.SECTION, "sigint_timeout", "0.01")
+    config.cp.set(Config.SECTION, "sigterm_timeout", "0.01")
+    launcher = Launcher(config, app)
+    process = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    process.transport = MagicMock()
+    return launcher, process
+
+
+@pytest.mark.parametrize(("escalate", "expected"), [(True, ["INT", "TERM", "KILL"]), (False, ["INT"])])
+@defer.inlineCallbacks
+def test_stop(stoppable, escalate, expected):
+    launcher, process = stoppable
+
+    launcher.stop(process, "INT", escalate=escalate)
+    yield deferLater(reactor, 0.1)
+
+    assert [c.args[0] for c in process.transport.signalProcess.call_args_list] == expected
+
+
+@defer.inlineCallbacks
+def test_stop_exited(stoppable):
+    launcher, process = stoppable
+    process.transport.signalProcess.side_effect = [None, error.ProcessExitedAlready]
+
+    launcher.stop(process)
+    yield deferLater(reactor, 0.1)
+
+    assert process.transport.signalProcess.call_count == 2
+    assert not process.signal_call.active()
+
+
+def test_stop_again(stoppable):
+    launcher, process = stoppable
+
+    launcher.stop(process)
+    call = process.signal_call
+    launcher.stop(process, "TERM")
+
+    assert not call.active()
+    assert process.signal_call.active()
+
+    process.signal_call.cancel()
+
+
+@defer.inlineCallbacks
+def test_wait(stoppable):
+    launcher, process = stoppable
+
+    exited = yield launcher.wait(process, 0.01)
+
+    assert exited is False
+
+    deferred = launcher.wait(process, 10)
+    process.deferred.callback(process)
+    exited = yield deferred
+
+    assert exited is True
+
+
+def test_max_runtime(stoppable):
+    launcher, _ = stoppable
+    launcher.limits.defaults["max_runtime"] = 3600
+    launcher._spawn_process({"_project": "p1", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+    process = launcher.processes[0]
+
+    assert process.timeout_call.active()
+
+    call = process.timeout_call
+    process.transport = MagicMock()
+    with capturedLogs() as captured:
+        launcher._timeout(process)  # noqa: SLF001
+
+    assert process.termination == "timeout"
+    assert get_message(captured).startswith("[scrapyd.launcher#warn] Process exceeded its max_runtime: project='p1'")
+    process.transport.signalProcess.assert_called_once_with("INT")
+
+    process.exit_signal = signal.SIGKILL
+    launcher._process_finished(None, 0)  # noqa: SLF001
+
+    assert process.termination == "timeout"
+    assert not call.active()
+    assert not process.signal_call.active()
+
+
+@pytest.mark.skipif(not Path("/proc/self/stat").exists(), reason="requires /proc")
+def test_process_exited_leftovers(process):
+    before = LEAKED_PROCESSES.values[("p1",)]
+    with subprocess.Popen([sys.executable, "-c", SPAWN], start_new_session=True, stdout=subprocess.PIPE) as leader:
+        leader.stdout.readline()
+        leader.wait(5)
+        process.pid = leader.pid
+
+        with capturedLogs() as captured:
+            process.processExited(failure.Failure(error.ProcessDone(0)))
+
+    assert LEAKED_PROCESSES.values[("p1",)] == before + 1
+    assert captured[0]["log_level"] == LogLevel.warn
+    assert get_message(captured).startswith(
+        "[scrapyd.launcher#warn] Process left 1 descendant processes running, which were killed: project='p1'"
+    )
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="requires inheritable pipes")
+def test_heartbeat_environment(app, monkeypatch):
+    monkeypatch.setattr(reactor, "spawnProcess", MagicMock())
+    config = Config()
+    config.cp.set(Config.SECTION, "heartbeat_interval", "5")
+    launcher = Launcher(config, app)
+
+    launcher._spawn_process({"_project": "p1", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+    process = launcher.processes[0]
+
+    assert process.env["SCRAPYD_HEARTBEAT_FD"] == "3"
+    assert process.env["SCRAPYD_USAGE_FD"] == "4"
+    assert process.env["SCRAPYD_HEARTBEAT_INTERVAL"] == "5.0"
+
+
+def test_heartbeat_received(process):
+    process.heartbeatReceived(b"1 0 0\n2 1")
+
+    assert process.heartbeat == {"requests": 1, "responses": 0, "items": 0}
+    assert process._heartbeat_buffer == b"2 1"  # noqa: SLF001
+
+    progress_time = process.progress_time
+    process.stalled = True
+    with capturedLogs() as captured:
+        process.heartbeatReceived(b" 0\n")
+
+    assert process.heartbeat == {"requests": 2, "responses": 1, "items": 0}
+    assert process.progress_time >= progress_time
+    assert process.stalled is False
+    assert "Process made progress: project='p1'" in get_message(captured)
+
+
+def test_heartbeat_received_invalid(process):
+    with capturedLogs() as captured:
+        process.heartbeatReceived(b"1 2\n")
+
+    assert process.heartbeat is None
+    assert captured[0]["log_level"] == LogLevel.warn
+
+
+@pytest.mark.parametrize("cancel", [True, False])
+def test_check_stalled(stoppable, cancel):
+    launcher, process = stoppable
+    launcher.stall_timeout = 60
+    launcher.cancel_stalled = cancel
+    launcher.processes[0] = process
+    launcher.processes[1] = ScrapyProcessProtocol("p1", "s1", "j2", env={}, args=[])  # no heartbeat
+    process.progress_time = 0
+
+    with capturedLogs() as captured:
+        launcher._check_stalled()  # noqa: SLF001
+        launcher._check_stalled()  # noqa: SLF001
+
+    assert process.stalled is True
+    assert launcher.processes[1].stalled is False
+    assert len(captured) == 1
+    assert get_message(captured).startswith("[scrapyd.launcher#warn] Process made no progress in 60 seconds:")
+    if cancel:
+        assert process.termination == "stalled"
+        process.transport.signalProcess.assert_called_once_with("INT")
+        process.signal_call.cancel()
+    else:
+        assert process.termination is None
+        process.transport.signalProcess.assert_not_called()
+
+
+def test_stats_file(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(reactor, "spawnProcess", MagicMock())
+    config = Config()
+    config.cp.set(Config.SECTION, "stats_dir", str(tmp_path))
+    launcher = Launcher(config, app)
+
+    launcher._spawn_process({"_project": "p1", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+    process = launcher.processes[0]
+    path = tmp_path / "0.stats"
+
+    assert process.env["SCRAPYD_STATS_FILE"] == str(path)
+    assert process.read_stats()["items"] == 0
+
+    with path.open("r+b") as f, mmap.mmap(f.fileno(), STATS_SIZE) as buffer:
+        VALUES.pack_into(buffer, SEQUENCE.size, *range(len(STATS)))
+
+    launcher._process_finished(None, 0)  # noqa: SLF001
+
+    assert process.stats == dict(zip(STATS, range(len(STATS)), strict=True))
+    assert process.stats_buffer is None
+    assert not path.exists()
+    assert next(iter(launcher.finished)).stats == process.stats
+
+
+def test_read_tail(tmp_path):
+    path = tmp_path / "j1.out"
+    path.write_bytes(b"a" * 10 + b"\xff" + b"b" * 5)
+
+    assert read_tail(path, 6) == "�bbbbb"
+    assert read_tail(path, 100) == "a" * 10 + "�" + "b" * 5
+    assert read_tail(tmp_path / "nonexistent") is None
+
+
+@pytest.mark.skipif(os.name != "posix", reason="requires childFDs")
+@defer.inlineCallbacks
+def test_output_to_file(app, tmp_path):
+    config = Config()
+    config.cp.set(Config.SECTION, "logs_dir", str(tmp_path))
+    config.cp.set(Config.SECTION, "output_to_file", "on")
+    launcher = Launcher(config, app)
+
+    with capturedLogs() as captured:
+        launcher._spawn_process({"_project": "nonexistent", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+        process = launcher.processes[0]
+        exited = yield launcher.wait(process, 30)
+
+    path = tmp_path / "nonexistent" / "s1" / "j1.out"
+
+    assert exited is True
+    assert process.output_file == path
+    assert process.exit_code
+    assert path.read_text()
+    assert process.output_tail == path.read_text()[-OUTPUT_TAIL_SIZE:]
+    systems = {message.get("log_system") for message in captured}
+    assert f"Launcher,{process.pid}/stderr" not in systems
+    assert f"Launcher,{process.pid}/output" in systems
+
+
+def test_resize(app, monkeypatch):
+    config = Config()
+    config.cp.set(Config.SECTION, "max_proc", "2")
+    launcher = Launcher(config, app)
+    monkeypatch.setattr(launcher, "_spawn_process", MagicMock())
+    poller = app.getComponent(IPoller)
+    launcher.startService()
+
+    assert launcher.slots == {0, 1}
+    assert len(poller.dq.waiting) == 2
+
+    # Slot 0 receives a message.
+    poller.dq.put({"_project": "p1", "_spider": "s1", "_job": "j1"})
+    launcher.processes[0] = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+
+    with capturedLogs() as captured:
+        launcher.resize(0)
+    captured = remove_debug_messages(captured)
+
+    assert launcher.slots == {0}
+    assert launcher.max_proc == 0
+    assert not poller.dq.waiting
+    assert get_message(captured) == "[Launcher] Process slots resized: max_proc=2 -> 0, slots=1"
+
+    # Slot 0 is drained.
+    launcher._process_finished(None, 0)  # noqa: SLF001
+
+    assert launcher.slots == set()
+    assert not poller.dq.waiting
+
+    launcher.resize(3)
+
+    assert launcher.slots == {0, 1, 2}
+    assert len(poller.dq.waiting) == 3
+    launcher._spawn_process.assert_called_once()  # noqa: SLF001
+
+
+def test_reattach_disabled(tmp_path, app):
+    config = Config(values={"dbs_dir": str(tmp_path / "launcher")})
+    launcher = Launcher(config, app)
+
+    assert list(launcher.running) == []
+    assert not (tmp_path / "launcher").exists()
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="requires process groups")
+@defer.inlineCallbacks
+def test_reattach(app, monkeypatch):
+    config = Config()
+    config.cp.set(Config.SECTION, "max_proc", "2")
+    config.cp.set(Config.SECTION, "reattach_jobs", "on")
+    launcher = Launcher(config, app)
+    monkeypatch.setattr(launcher, "_spawn_process", MagicMock())
+    start_time = datetime.datetime(2001, 2, 3, 4, 5, 6, 7)
+
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True)
+    try:
+        for slot, job, pid in ((1, "j1", child.pid), (0, "j0", 2**22 + 1)):
+            process = ScrapyProcessProtocol("p1", "s1", job, env={}, args=["s1"])
+            process.pid = pid
+            process.start_time = start_time
+            process.start_ticks = get_start_ticks(pid)
+            launcher.running.add(process, slot)
+
+        with capturedLogs() as captured:
+            launcher.startService()
+
+        process = launcher.processes[1]
+
+        assert [message["action"] for message in captured if "action" in message] == [
+            "Process ended while Scrapyd was stopped:",
+            "Process reattached:",
+        ]
+        assert launcher.slots == {0, 1}
+        assert list(launcher.processes) == [1]
+        assert process.pid == child.pid
+        assert process.start_time == start_time
+        assert launcher.jobindex.get("p1", "j1").state == "running"
+        assert [job.job for job in launcher.finished] == ["j0"]
+        assert launcher.jobindex.get("p1", "j0").state == "finished"
+        assert [row[0] for row in launcher.running] == [1]
+
+        launcher.stop(process, "TERM", escalate=False)
+        yield process.deferred.addTimeout(5, reactor)
+    finally:
+        child.kill()
+        child.wait(5)
+
+    assert process.exit_code is None
+    assert process.end_time is not None
+    assert not launcher.processes
+    assert launcher.slots == {0, 1}
+    assert [job.job for job in launcher.finished] == ["j1", "j0"]
+    assert list(launcher.running) == []
+
+
+def test_drain(app, monkeypatch):
+    config = Config()
+    config.cp.set(Config.SECTION, "max_proc", "2")
+    launcher = Launcher(config, app)
+    monkeypatch.setattr(launcher, "_spawn_process", MagicMock())
+    launcher.startService()
+    launcher.processes[1] = ScrapyProcessProtocol("p1", "s1", "j1", env={}, args=[])
+    launcher.idle.pop(1).cancel()
+
+    launcher.drain()
+
+    assert launcher.draining
+    assert not launcher.drained
+    assert launcher.slots == {1}
+
+    launcher.resize(4)
+
+    assert launcher.max_proc == 0
+    assert launcher.drained_max_proc == 4
+
+    with capturedLogs() as captured:
+        launcher._process_finished(None, 1)  # noqa: SLF001
+
+    assert launcher.drained
+    assert launcher.slots == set()
+    assert get_message(remove_debug_messages(captured)) == "[Launcher] Drained: no processes are running"
+
+    launcher.drain(False)  # noqa: FBT003
+
+    assert not launcher.draining
+    assert launcher.slots == {0, 1, 2, 3}
+    assert launcher.max_proc == 4
+
+
+def test_expire(app, launcher):
+    poller = app.getComponent(IPoller)
+    launcher.startService()
+
+    assert launcher._expire in poller.observers  # noqa: SLF001
+
+    app.getComponent(ISpiderScheduler).jobindex.schedule("p1", "s1", "j2")
+    with capturedLogs() as captured:
+        for observer in poller.observers:
+            observer("p1", {"name": "s1", "_job": "j2", "_attempt": 2, "_retry_of": "j1"})
+    finished = next(iter(launcher.finished))
+
+    assert captured[0]["action"] == "Job expired before it started:"
+    assert (finished.project, finished.spider, finished.job) == ("p1", "s1", "j2")
+    assert finished.start_time == finished.end_time
+    assert finished.termination == "expired"
+    assert finished.attempt == 2
+    assert finished.retry_of == "j1"
+    assert launcher.jobindex.state("j2", "p1") == "finished"
+    assert launcher.jobindex.pending["p1"] == 0
+
+    launcher.stopService()
+
+    assert launcher._expire not in poller.observers  # noqa: SLF001
+
+
+@pytest.mark.parametrize(
+    ("exit_code", "retried"),
+    [(1, True), (0, False)],
+)
+def test_retry(app, monkeypatch, exit_code, retried):
+    config = Config()
+    config.cp.set(Config.SECTION, "max_attempts", "3")
+    launcher = Launcher(config, app)
+    scheduler = MagicMock()
+    app.setComponent(ISpiderScheduler, scheduler)
+    monkeypatch.setattr(reactor, "spawnProcess", MagicMock())
+    message = {
+        "_project": "p1",
+        "_spider": "s1",
+        "_job": "j2",
+        "_version": "v1",
+        "settings": {"ONE": "two"},
+        "_limits": {"max_runtime": 60},
+        "_retry": {"retry_delay": 10.0},
+        "_attempt": 2,
+        "_retry_of": "j1",
+        "_priority": 5.0,
+        "arg1": "val1",
+    }
+    launcher._spawn_process(copy.deepcopy(message), 0)  # noqa: SLF001
+    process = launcher.processes[0]
+    process.exit_code = exit_code
+
+    assert process.attempt == 2
+    assert process.retry_of == "j1"
+    assert "arg1=val1" in process.args
+    assert not [arg for arg in process.args if arg.startswith(("_retry", "_attempt", "_priority"))]
+
+    launcher._process_finished(None, 0)  # noqa: SLF001
+    finished = next(iter(launcher.finished))
+
+    assert finished.attempt == 2
+    assert finished.retry_of == "j1"
+    if retried:
+        (project, spider), kwargs = scheduler.schedule.call_args
+        not_before = kwargs.pop("_not_before")
+
+        assert (project, spider) == ("p1", "s1")
+        assert kwargs == {
+            "priority": 5.0,
+            "_job": finished.retried_as,
+            "_version": "v1",
+            "settings": {"ONE": "two"},
+            "_limits": {"max_runtime": 60},
+            "_retry": {"retry_delay": 10.0},
+            "_attempt": 3,
+            "_retry_of": "j2",
+            "arg1": "val1",
+        }
+        # 10 seconds, doubled after the second attempt, minus up to half.
+        assert 10 <= (not_before - datetime.datetime.now()).total_seconds() <= 20
+        assert finished.retried_as is not None
+    else:
+        scheduler.schedule.assert_not_called()
+        assert finished.retried_as is None
+
+
+def test_retry_deleted_project(app, monkeypatch):
+    config = Config()
+    config.cp.set(Config.SECTION, "max_attempts", "2")
+    launcher = Launcher(config, app)
+    app.setComponent(ISpiderScheduler, MagicMock(**{"schedule.side_effect": KeyError("p1")}))
+    monkeypatch.setattr(reactor, "spawnProcess", MagicMock())
+    launcher._spawn_process({"_project": "p1", "_spider": "s1", "_job": "j1"}, 0)  # noqa: SLF001
+    launcher.processes[0].exit_code = 1
+
+    with capturedLogs() as captured:
+        launcher._process_finished(None, 0)  # noqa: SLF001
+
+    assert next(iter(launcher.finished)).retried_as is None
+    assert any(message.get("action", "").startswith("Process can't be retried") for message in captured)
@@ -0,0 +1,158 @@
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+from twisted.logger import LogLevel, capturedLogs
+
+from scrapyd.config import Config
+from scrapyd.limits import MEGABYTE, Limits, get_termination, oom_killed, remove_cgroup
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.cp.set(Config.SECTION, "memory_limit", "1024")
+    config.cp.set(Config.SECTION, "cpu_limit", "60")
+    config.cp.add_section("limits.p1")
+    config.cp.set("limits.p1", "cpu_limit", "0")
+    config.cp.set("limits.p1", "files_limit", "100")
+    config.cp.add_section("limits.p1.s1")
+    config.cp.set("limits.p1.s1", "files_limit", "200")
+    config.cp.set("limits.p1.s1", "max_runtime", "3600")
+    return config
+
+
+@pytest.mark.parametrize(
+    ("project", "spider", "overrides", "expected"),
+    [
+        ("p0", "s1", None, {"memory_limit": 1024, "cpu_limit": 60}),
+        ("p1", "s0", None, {"memory_limit": 1024, "files_limit": 100}),
+        ("p1", "s1", None, {"memory_limit": 1024, "files_limit": 200, "max_runtime": 3600}),
+        ("p1", "s0", {"memory_limit": 0, "cpu_limit": 10}, {"cpu_limit": 10, "files_limit": 100}),
+        ("p1", "s1", {"max_runtime": 60}, {"memory_limit": 1024, "files_limit": 200, "max_runtime": 60}),
+    ],
+)
+def test_get(config, project, spider, overrides, expected):
+    assert Limits(config).get(project, spider, overrides) == expected
+
+
+def test_get_default():
+    assert Limits(Config()).get("p1", "s1") == {}
+
+
+def test_create_cgroup(config, tmp_path):
+    config.cp.set(Config.SECTION, "cgroup_dir", str(tmp_path))
+    limits = Limits(config)
+
+    assert limits.create_cgroup({"cpu_limit": 60}) is None
+
+    cgroup = limits.create_cgroup({"memory_limit": 1024})
+
+    assert cgroup.parent == tmp_path
+    assert (cgroup / "memory.max").read_text() == f"{1024 * MEGABYTE}\n"
+    assert limits.get_environment({"memory_limit": 1024, "cpu_limit": 60}, cgroup) == {
+        "SCRAPYD_MEMORY_LIMIT": "1024",
+        "SCRAPYD_CPU_LIMIT": "60",
+        "SCRAPYD_CGROUP": str(cgroup),
+    }
+
+
+def test_create_cgroup_error(config, tmp_path):
+    config.cp.set(Config.SECTION, "cgroup_dir", str(tmp_path / "nonexistent"))
+
+    with capturedLogs() as captured:
+        cgroup = Limits(config).create_cgroup({"memory_limit": 1024})
+    # Ignore messages about other tests' processes.
+    captured = [event for event in captured if event["log_namespace"] == "scrapyd.limits"]
+
+    assert cgroup is None
+    assert len(captured) == 1
+    assert captured[0]["log_level"] == LogLevel.warn
+
+
+def test_get_environment(config):
+    assert Limits(config).get_environment({"memory_limit": 1024, "files_limit": 100, "max_runtime": 60}) == {
+        "SCRAPYD_MEMORY_LIMIT": "1024",
+        "SCRAPYD_FILES_LIMIT": "100",
+    }
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGXCPU"), reason="requires SIGXCPU")
+@pytest.mark.parametrize(
+    ("limits", "exit_signal", "usage", "expected"),
+    [
+        ({}, None, None, None),
+        ({"cpu_limit": 60}, None, None, None),
+        ({"cpu_limit": 60}, signal.SIGTERM, None, None),
+        ({}, getattr(signal, "SIGXCPU", None), None, None),
+        ({"cpu_limit": 60}, getattr(signal, "SIGXCPU", None), None, "cpu_limit"),
+        ({"cpu_limit": 60}, getattr(signal, "SIGKILL", None), None, None),
+        ({"cpu_limit": 60}, getattr(signal, "SIGKILL", None), {"cpu_user": 30, "cpu_system": 10}, None),
+        ({"cpu_limit": 60}, getattr(signal, "SIGKILL", None), {"cpu_user": 60, "cpu_system": 5}, "cpu_limit"),
+    ],
+)
+def test_get_termination(limits, exit_signal, usage, expected):
+    assert get_termination(limits, exit_signal, usage) == expected
+
+
+@pytest.mark.parametrize(("count", "expected"), [(0, False), (1, True)])
+def test_oom_killed(tmp_path, count, expected):
+    (tmp_path / "memory.events").write_text(f"low 0\nhigh 0\nmax 3\noom 1\noom_kill {count}\n")
+
+    assert oom_killed(tmp_path) is expected
+    assert get_termination({"memory_limit": 1024}, signal.SIGTERM, cgroup=tmp_path) == (
+        "memory_limit" if count else None
+    )
+
+
+def test_oom_killed_missing(tmp_path):
+    assert oom_killed(tmp_path / "nonexistent") is False
+
+
+def test_remove_cgroup(tmp_path):
+    cgroup = tmp_path / "cgroup"
+    cgroup.mkdir()
+    (tmp_path / "busy").mkdir()
+    (tmp_path / "busy" / "cgroup.procs").touch()
+
+    remove_cgroup(cgroup)
+
+    assert not cgroup.exists()
+
+    with capturedLogs() as captured:
+        remove_cgroup(tmp_path / "busy")
+
+    assert len(captured) == 1
+    assert captured[0]["log_level"] == LogLevel.warn
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="requires setrlimit")
+@pytest.mark.parametrize("cgroup", [None, "joined", "failed"])
+def test_set_limits(tmp_path, cgroup):
+    resource = pytest.importorskip("resource")
+    code = (
+        "import resource; from scrapyd.limits import set_limits; set_limits(); "
+        "print(*resource.getrlimit(resource.RLIMIT_AS), *resource.getrlimit(resource.RLIMIT_CPU), "
+        "*resource.getrlimit(resource.RLIMIT_NOFILE))"
+    )
+    env = {**os.environ, "SCRAPYD_MEMORY_LIMIT": "4096", "SCRAPYD_CPU_LIMIT": "60", "SCRAPYD_FILES_LIMIT": "64"}
+    if cgroup:
+        env["SCRAPYD_CGROUP"] = str(tmp_path / "cgroup")
+    if cgroup == "joined":
+        (tmp_path / "cgroup").mkdir()
+
+    process = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    # The cgroup applies the memory limit, instead of the address space limit.
+    if cgroup == "joined":
+        memory = [str(value) for value in resource.getrlimit(resource.RLIMIT_AS)]
+    else:
+        memory = [str(4096 * MEGABYTE)] * 2
+    assert process.stdout.split() == [*memory, "60", "65", "64", "64"]
+    if cgroup == "joined":
+        assert (tmp_path / "cgroup" / "cgroup.procs").read_text().strip().isdigit()
+        assert not process.stderr
+    if cgroup == "failed":
+        assert process.stderr.startswith(f"Failed to join cgroup {tmp_path / 'cgroup'}, applying the memory limit")
@@ -0,0 +1,162 @@
+import datetime
+import time
+
+import pytest
+
+from scrapyd import metrics
+from scrapyd.config import Config
+from scrapyd.metrics import Counter, Gauge, GaugeFunction, Histogram, JobMetrics, LagMonitor, Metric, Registry
+from scrapyd.spiderqueue import SqliteSpiderQueue
+
+
+def get_count(histogram, *labelvalues):
+    state = histogram.values.get(labelvalues)
+    return 0 if state is None else sum(state[0])
+
+
+def test_metric_abstract():
+    with pytest.raises(TypeError, match="abstract"):
+        Metric("m", "A metric.")
+
+
+def test_counter():
+    counter = Counter("c_total", "A counter.", ("project",))
+    counter.inc("p1")
+    counter.inc("p1", amount=2)
+    counter.inc('p"2\\\n')
+
+    assert list(counter.render()) == [
+        "# HELP c_total A counter.",
+        "# TYPE c_total counter",
+        'c_total{project="p1"} 3.0',
+        'c_total{project="p\\"2\\\\\\n"} 1.0',
+    ]
+
+
+def test_gauge():
+    gauge = Gauge("g", "A gauge.")
+    gauge.set(5)
+    gauge.inc(amount=-2)
+
+    assert list(gauge.render()) == ["# HELP g A gauge.", "# TYPE g gauge", "g 3.0"]
+
+
+def test_gauge_function():
+    gauge = GaugeFunction("g", "A gauge.", ("project", "spider"), lambda: {("p1", "s1"): 2})
+
+    assert list(gauge.render()) == ["# HELP g A gauge.", "# TYPE g gauge", 'g{project="p1",spider="s1"} 2.0']
+
+
+def test_histogram():
+    histogram = Histogram("h_seconds", "A histogram.", ("project",), buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value, "p1")
+
+    assert list(histogram.render()) == [
+        "# HELP h_seconds A histogram.",
+        "# TYPE h_seconds histogram",
+        'h_seconds_bucket{project="p1",le="1.0"} 2.0',
+        'h_seconds_bucket{project="p1",le="5.0"} 3.0',
+        'h_seconds_bucket{project="p1",le="+Inf"} 4.0',
+        'h_seconds_sum{project="p1"} 14.5',
+        'h_seconds_count{project="p1"} 4.0',
+    ]
+
+
+def test_histogram_time():
+    histogram = Histogram("h_seconds", "A histogram.")
+
+    with histogram.time():
+        pass
+
+    @histogram.time()
+    def recurse(n):
+        if n:
+            recurse(n - 1)
+
+    recurse(2)
+
+    assert get_count(histogram) == 4
+
+
+def test_registry():
+    registry = Registry()
+    counter = registry.register(Counter("c_total", "A counter."))
+    counter.inc()
+    gauge = Gauge("g", "A gauge.")
+
+    assert (
+        registry.render(gauge)
+        == b"# HELP c_total A counter.\n# TYPE c_total counter\nc_total 1.0\n# HELP g A gauge.\n# TYPE g gauge\n"
+    )
+
+
+def test_sqlite():
+    queue = SqliteSpiderQueue(Config(values={"dbs_dir": ":memory:"}), "p1")
+    before = get_count(metrics.SQLITE_SECONDS, "spider_queue", "put")
+
+    queue.add("s1")
+
+    assert get_count(metrics.SQLITE_SECONDS, "spider_queue", "put") == before + 1
+
+
+@pytest.mark.parametrize(("exit_code", "counter"), [(None, metrics.JOBS_FINISHED), (1, metrics.JOBS_FAILED)])
+def test_job_metrics(exit_code, counter):
+    observer = JobMetrics()
+    project = f"test_job_metrics_{exit_code}"
+    start_time = datetime.datetime(2001, 2, 3, 4, 5, 6)
+    event = {"project": project, "spider": "s1", "job": "j1"}
+
+    observer({**event, "event": "scheduled"})
+    observer({**event, "event": "scheduled"})
+    observer({**event, "event": "started"})
+
+    assert get_count(metrics.JOB_QUEUE_WAIT, project) == 1
+    assert list(observer.scheduled) == [(project, "j1")]
+
+    observer({**event, "event": "cancelled", "prevstate": "pending"})
+
+    assert not observer.scheduled
+
+    observer({**event, "event": "started"})  # not scheduled since startup
+    observer(
+        {
+            **event,
+            "event": "finished" if exit_code is None else "failed",
+            "start_time": str(start_time),
+            "end_time": str(start_time + datetime.timedelta(seconds=90)),
+            "exit_code": exit_code,
+        }
+    )
+
+    assert get_count(metrics.JOB_QUEUE_WAIT, project) == 1
+    assert counter.values[(project,)] == 1
+    assert metrics.JOB_RUNTIME.values[(project,)][1] == 90
+
+
+def test_job_metrics_expired():
+    observer = JobMetrics()
+    project = "test_job_metrics_expired"
+    event = {"project": project, "spider": "s1", "job": "j1"}
+
+    observer({**event, "event": "scheduled"})
+    observer({**event, "event": "expired"})
+
+    assert not observer.scheduled
+    assert metrics.JOBS_EXPIRED.values[(project,)] == 1
+
+
+def test_lag_monitor(monkeypatch):
+    monitor = LagMonitor(1)
+    before = get_count(metrics.REACTOR_LAG)
+    now = time.monotonic()
+
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    monitor.tick()
+
+    assert get_count(metrics.REACTOR_LAG) == before
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 1.5)
+    monitor.tick()
+
+    assert get_count(metrics.REACTOR_LAG) == before + 1
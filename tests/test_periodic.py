@@ -0,0 +1,271 @@
+import datetime
+import re
+from unittest.mock import MagicMock
+
+import pytest
+from twisted.internet import defer, reactor
+from twisted.internet.task import deferLater
+from twisted.logger import capturedLogs
+
+from scrapyd.config import Config
+from scrapyd.jobindex import JobIndex
+from scrapyd.metrics import PERIODIC_FIRES
+from scrapyd.periodic import Cron, PeriodicSchedule, PeriodicScheduler
+
+NOW = datetime.datetime(2001, 2, 3, 4, 5, 6, 7)  # a Saturday
+
+
+def definition(**kwargs):
+    return {
+        "spider": "s1",
+        "cron": None,
+        "interval": None,
+        "jitter": 0,
+        "skip_if_running": False,
+        "skip_if_pending": True,
+        "priority": 0,
+        "settings": {},
+        "args": {},
+        **kwargs,
+    }
+
+
+@pytest.fixture
+def periodic(chdir):
+    periodic = PeriodicScheduler(Config(), MagicMock(), JobIndex(Config()))
+    yield periodic
+    if periodic.running:
+        periodic.stopService()
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("* * * * *", datetime.datetime(2001, 2, 3, 4, 6)),
+        ("*/15 * * * *", datetime.datetime(2001, 2, 3, 4, 15)),
+        ("0 * * * *", datetime.datetime(2001, 2, 3, 5, 0)),
+        ("@hourly", datetime.datetime(2001, 2, 3, 5, 0)),
+        ("@daily", datetime.datetime(2001, 2, 4, 0, 0)),
+        ("30 2 * * mon-fri", datetime.datetime(2001, 2, 5, 2, 30)),
+        ("0 0 * * 7", datetime.datetime(2001, 2, 4, 0, 0)),
+        ("0 0 1 jan *", datetime.datetime(2002, 1, 1, 0, 0)),
+        ("0 0 29 2 *", datetime.datetime(2004, 2, 29, 0, 0)),
+        ("5,10/20 4 * * *", datetime.datetime(2001, 2, 3, 4, 10)),
+        # Either the day of month or the day of week.
+        ("0 0 10 * mon", datetime.datetime(2001, 2, 5, 0, 0)),
+    ],
+)
+def test_cron(expression, expected):
+    assert Cron(expression).next(NOW) == expected
+
+
+@pytest.mark.parametrize(
+    ("expression", "message"),
+    [
+        ("* * * *", "'* * * *' doesn't have 5 fields"),
+        ("60 * * * *", "'60' is out of range"),
+        ("5-1 * * * *", "'5-1' is out of range"),
+        ("*/0 * * * *", "'*/0' is out of range"),
+        ("x * * * *", "invalid literal for int() with base 10: 'x'"),
+        ("0 0 30 2 *", "'0 0 30 2 *' matches no time"),
+    ],
+)
+def test_cron_invalid(expression, message):
+    with pytest.raises(ValueError, match=f"^{re.escape(message)}$"):
+        Cron(expression)
+
+
+@pytest.mark.parametrize(
+    ("next_time", "expected"),
+    [
+        (None, NOW + datetime.timedelta(seconds=90)),
+        (NOW, NOW + datetime.timedelta(seconds=90)),
+        # Keep the phase, after missing times.
+        (NOW - datetime.timedelta(seconds=200), NOW + datetime.timedelta(seconds=70)),
+    ],
+)
+def test_advance_interval(next_time, expected):
+    schedule = PeriodicSchedule("p1", "n1", definition(interval=90), next_time)
+    schedule.advance(NOW)
+
+    assert schedule.next_time == expected
+
+
+def test_fire_time_jitter():
+    schedule = PeriodicSchedule("p1", "n1", definition(cron="@daily", jitter=60), NOW)
+
+    for _ in range(10):
+        assert NOW <= schedule.get_fire_time() <= NOW + datetime.timedelta(seconds=60)
+
+
+def test_add_remove(periodic):
+    periodic.add("p1", "n2", definition(interval=60))
+    schedule = periodic.add("p1", "n1", definition(cron="@daily"))
+    periodic.add("p2", "n1", definition(interval=60))
+
+    assert periodic.list() == [periodic.schedules[key] for key in (("p1", "n1"), ("p1", "n2"), ("p2", "n1"))]
+    assert [schedule.name for schedule in periodic.list("p1")] == ["n1", "n2"]
+    assert periodic.get_fire_time(schedule) == schedule.next_time
+    assert list(periodic.storage) == [
+        ("p1", "n1", definition(cron="@daily"), schedule.next_time, None),
+        ("p1", "n2", definition(interval=60), periodic.schedules[("p1", "n2")].next_time, None),
+        ("p2", "n1", definition(interval=60), periodic.schedules[("p2", "n1")].next_time, None),
+    ]
+
+    # Replace.
+    periodic.add("p1", "n1", definition(interval=30))
+
+    assert periodic.schedules[("p1", "n1")].interval == datetime.timedelta(seconds=30)
+    assert len(periodic.storage) == 3
+    # The replaced entry is marked as removed.
+    assert sum(entry[-1] is None for entry in periodic.heap) == 1
+
+    assert periodic.remove("p1", "n1")
+    assert not periodic.remove("p1", "n1")
+    assert [schedule.name for schedule in periodic.list("p1")] == ["n2"]
+    assert len(periodic.storage) == 2
+
+
+def test_add_invalid(periodic):
+    with pytest.raises(ValueError, match="doesn't have 5 fields"):
+        periodic.add("p1", "n1", definition(cron="@never"))
+
+    assert periodic.list() == []
+    assert len(periodic.storage) == 0
+
+
+def test_storage_lazy(chdir):
+    periodic = PeriodicScheduler(Config(), MagicMock(), JobIndex(Config()))
+
+    assert not (chdir / "dbs" / "jobs.db").exists()
+
+    assert periodic.remove("p1", "n1") is False
+    assert not (chdir / "dbs" / "jobs.db").exists()
+
+    periodic.add("p1", "n1", definition(interval=100))
+
+    assert (chdir / "dbs" / "jobs.db").exists()
+
+
+def test_load(chdir):
+    past = datetime.datetime.now() - datetime.timedelta(seconds=150)
+    periodic = PeriodicScheduler(Config(), MagicMock(), JobIndex(Config()))
+    periodic.storage.put("p1", "n1", definition(interval=100), past, "j1")
+    future = periodic.add("p1", "n2", definition(cron="@daily")).next_time
+
+    periodic = PeriodicScheduler(Config(), MagicMock(), JobIndex(Config()))
+
+    # The time that passed while stopped is skipped, keeping the phase.
+    assert periodic.schedules[("p1", "n1")].next_time == past + datetime.timedelta(seconds=200)
+    assert periodic.schedules[("p1", "n1")].last_job == "j1"
+    assert periodic.schedules[("p1", "n2")].next_time == future
+    assert next(iter(periodic.storage))[3] == past + datetime.timedelta(seconds=200)
+
+
+def test_start_stop(periodic):
+    periodic.startService()
+
+    assert periodic.call is None
+
+    periodic.add("p1", "n1", definition(interval=3600))
+
+    assert 3599 < periodic.call.getTime() - reactor.seconds() <= 3600
+
+    call = periodic.call
+    periodic.remove("p1", "n1")
+    periodic.add("p1", "n2", definition(interval=60))
+
+    assert not call.active()
+    assert 59 < periodic.call.getTime() - reactor.seconds() <= 60
+
+    periodic.stopService()
+
+    assert periodic.call is None
+
+
+def test_fire(periodic):
+    periodic.add("p1", "n1", definition(interval=60, priority=2, settings={"ONE": "two"}, args={"arg1": "val1"}))
+    schedule = periodic.schedules[("p1", "n1")]
+    next_time = schedule.next_time
+    periodic.entries[("p1", "n1")][0] = datetime.datetime.now()
+
+    with capturedLogs() as captured:
+        periodic.fire()
+
+    (project, spider), kwargs = periodic.scheduler.schedule.call_args
+    job = kwargs.pop("_job")
+
+    assert (project, spider) == ("p1", "s1")
+    assert kwargs == {"priority": 2, "settings": {"ONE": "two"}, "arg1": "val1"}
+    assert schedule.last_job == job
+    assert schedule.next_time == next_time + datetime.timedelta(seconds=60)
+    assert next(iter(periodic.storage))[3:] == (schedule.next_time, job)
+    assert captured[0]["log_format"].startswith("Periodic schedule fired:")
+    # The schedule is back in the heap.
+    assert periodic.heap[0][-1] is schedule
+
+
+@pytest.mark.parametrize(
+    ("state", "skip_if_running", "skip_if_pending", "skipped"),
+    [
+        ("pending", False, True, True),
+        ("pending", False, False, False),
+        ("running", False, True, False),
+        ("running", True, False, True),
+        ("finished", True, True, False),
+    ],
+)
+def test_fire_skip(periodic, state, skip_if_running, skip_if_pending, skipped):
+    periodic.add("p1", "n1", definition(interval=60, skip_if_running=skip_if_running, skip_if_pending=skip_if_pending))
+    schedule = periodic.schedules[("p1", "n1")]
+    schedule.last_job = "j1"
+    periodic.jobindex.schedule("p1", "s1", "j1")
+    if state != "pending":
+        periodic.jobindex.pop("p1", "j1")
+        process = MagicMock(project="p1", spider="s1", job="j1", pid=1)
+        periodic.jobindex.start(process, 0)
+        if state == "finished":
+            periodic.jobindex.finish(
+                MagicMock(project="p1", spider="s1", job="j1", exit_code=0, exit_signal=None, termination=None), 0
+            )
+    before = PERIODIC_FIRES.values[("p1", "skipped")]
+    periodic.entries[("p1", "n1")][0] = datetime.datetime.now()
+
+    with capturedLogs() as captured:
+        periodic.fire()
+
+    if skipped:
+        periodic.scheduler.schedule.assert_not_called()
+        assert schedule.last_job == "j1"
+        assert PERIODIC_FIRES.values[("p1", "skipped")] == before + 1
+        assert captured[0]["log_format"].startswith("Periodic schedule skipped, because its last job is still")
+        assert captured[0]["state"] == state
+    else:
+        periodic.scheduler.schedule.assert_called_once()
+        assert schedule.last_job != "j1"
+
+
+def test_fire_deleted_project(periodic):
+    periodic.scheduler.schedule.side_effect = KeyError("p1")
+    periodic.add("p1", "n1", definition(interval=60))
+    periodic.entries[("p1", "n1")][0] = datetime.datetime.now()
+    before = PERIODIC_FIRES.values[("p1", "failed")]
+
+    with capturedLogs() as captured:
+        periodic.fire()
+
+    assert PERIODIC_FIRES.values[("p1", "failed")] == before + 1
+    assert captured[0]["log_format"].startswith("Periodic schedule can't fire, because its project was deleted:")
+    # The schedule is kept.
+    assert periodic.list() == [periodic.schedules[("p1", "n1")]]
+
+
+@defer.inlineCallbacks
+def test_fire_timer(periodic):
+    periodic.startService()
+    periodic.add("p1", "n1", definition(interval=0.1))
+
+    yield deferLater(reactor, 0.3, lambda: None)
+
+    assert periodic.scheduler.schedule.call_count >= 1
+    assert periodic.call.active()
@@ -1,13 +1,17 @@
+import datetime
 from pathlib import Path
+from unittest.mock import MagicMock
 
 import pytest
-from twisted.internet.defer import Deferred
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, inlineCallbacks
 from zope.interface.verify import verifyObject
 
 from scrapyd.config import Config
 from scrapyd.interfaces import IPoller
 from scrapyd.poller import QueuePoller
 from scrapyd.utils import get_spider_queues
+from tests import Legacy
 
 
 @pytest.fixture
@@ -80,3 +84,69 @@ def test_poll_empty(poller):
     assert hasattr(value, "result")
     assert getattr(value, "called", False)
     assert value.result is None
+
+
+def test_poll_not_before(poller):
+    queues = get_spider_queues(poller.config)
+    queues["mybot1"].add("spider1", _not_before=datetime.datetime.now() + datetime.timedelta(hours=1))
+    queues["mybot1"].add("spider2", _not_before=datetime.datetime.now() - datetime.timedelta(hours=1))
+
+    deferred1 = poller.next()
+    deferred2 = poller.next()
+    poller.poll()
+
+    assert deferred1.result == {"_project": "mybot1", "_spider": "spider2"}
+    assert not hasattr(deferred2, "result")
+    assert queues["mybot1"].count() == 1
+    # The poller polls again when the job is due.
+    assert 3590 < poller.due_call.getTime() - reactor.seconds() <= 3600
+
+    poller.due_call.cancel()
+
+
+def test_poll_expired(poller):
+    queues = get_spider_queues(poller.config)
+    queues["mybot1"].add("spider1", _expires_at=datetime.datetime.now() - datetime.timedelta(seconds=1), _job="j1")
+    queues["mybot2"].add("spider2", _expires_at=datetime.datetime.now() + datetime.timedelta(hours=1), _job="j2")
+    observer = MagicMock()
+    poller.add_observer(observer)
+
+    # Expired jobs are purged, even if no slot is waiting.
+    poller.poll()
+
+    observer.assert_called_once_with("mybot1", {"name": "spider1", "_job": "j1"})
+    assert queues["mybot1"].count() == 0
+    assert queues["mybot2"].count() == 1
+
+    poller.remove_observer(observer)
+
+    assert poller.observers == []
+
+
+def test_poll_legacy(poller):
+    queues = get_spider_queues(poller.config)
+    queues["mybot1"].add("spider1")
+    for project, queue in poller.queues.items():
+        poller.queues[project] = Legacy(queue, "next_due", "purge_expired")
+
+    deferred = poller.next()
+    poller.poll()
+
+    assert deferred.result == {"_project": "mybot1", "_spider": "spider1"}
+    assert poller.due_call is None
+
+
+@inlineCallbacks
+def test_poll_due_call(poller):
+    queues = get_spider_queues(poller.config)
+    queues["mybot2"].add("spider1", _not_before=datetime.datetime.now() + datetime.timedelta(seconds=0.1))
+    deferred = poller.next()
+    poller.poll()
+
+    assert not hasattr(deferred, "result")
+    assert poller.due_call.active()
+
+    # The poller polls again when the job is due, without waiting for poll_interval.
+    result = yield deferred.addTimeout(5, reactor)
+
+    assert result == {"_project": "mybot2", "_spider": "spider1"}
@@ -0,0 +1,183 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from twisted.internet import defer, error, reactor
+
+from scrapyd.processes import (
+    ProcessWatcher,
+    find_leftovers,
+    get_start_ticks,
+    is_running,
+    kill_leftovers,
+    signal_process,
+    start_session,
+)
+from tests import SPAWN
+
+posix = pytest.mark.skipif(not hasattr(os, "killpg"), reason="requires process groups")
+proc = pytest.mark.skipif(not Path("/proc/self/stat").exists(), reason="requires /proc")
+
+
+def stat(pid, state, pgrp, session):
+    return f"{pid} (sh (x)) {state} 1 {pgrp} {session} 0 -1 4194304 " + " ".join(["0"] * 44)
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child of this process is a zombie until reaped.
+    return Path(f"/proc/{pid}/stat").read_text().split(") ")[1][0] != "Z" if Path("/proc").exists() else True
+
+
+@posix
+def test_start_session():
+    sid = os.getsid(0)
+
+    start_session({})
+
+    assert os.getsid(0) == sid
+
+
+@posix
+def test_start_session_setsid():
+    code = (
+        "import os; from scrapyd.processes import start_session; start_session(); print(os.getsid(0) == os.getpid())"
+    )
+    env = {**os.environ, "SCRAPYD_SETSID": "1"}
+
+    process = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    assert process.stdout == "True\n"
+
+
+@posix
+@proc
+def test_signal_process():
+    with subprocess.Popen(
+        [sys.executable, "-c", f"{SPAWN}; child.wait()"], start_new_session=True, stdout=subprocess.PIPE
+    ) as leader:
+        child = int(leader.stdout.readline())
+        process = MagicMock(pid=leader.pid)
+
+        signal_process(process, "TERM")
+        leader.wait(5)
+        time.sleep(0.2)
+
+        assert not alive(child)
+        process.transport.signalProcess.assert_not_called()
+
+
+def test_signal_process_not_leader():
+    process = MagicMock(pid=None)
+
+    signal_process(process, "INT")
+
+    process.transport.signalProcess.assert_called_once_with("INT")
+
+
+@pytest.mark.parametrize(("cgroup", "expected"), [(False, {101, 102}), (True, {101, 102, 201})])
+def test_find_leftovers(tmp_path, cgroup, expected):
+    for pid, state, pgrp, session in (
+        (100, "S", 100, 100),  # the process itself, if not yet reaped
+        (101, "S", 100, 100),
+        (102, "R", 102, 100),  # a new process group in the session
+        (103, "Z", 100, 100),  # a zombie
+        (104, "S", 104, 104),  # another session
+    ):
+        (tmp_path / str(pid)).mkdir()
+        (tmp_path / str(pid) / "stat").write_text(stat(pid, state, pgrp, session))
+    (tmp_path / "self").mkdir()
+    (tmp_path / "cgroup").mkdir()
+    (tmp_path / "cgroup" / "cgroup.procs").write_text("201\n")
+
+    assert find_leftovers(100, tmp_path / "cgroup" if cgroup else None, proc=tmp_path) == expected
+
+
+def test_find_leftovers_missing(tmp_path):
+    assert find_leftovers(100, tmp_path / "cgroup", proc=tmp_path / "proc") == set()
+
+
+@posix
+@proc
+def test_kill_leftovers():
+    with subprocess.Popen([sys.executable, "-c", SPAWN], start_new_session=True, stdout=subprocess.PIPE) as leader:
+        child = int(leader.stdout.readline())
+        leader.wait(5)
+
+        leftovers = find_leftovers(leader.pid)
+
+        assert leftovers == {child}
+        assert kill_leftovers(leftovers | {2**22 + 1}) == 1
+        time.sleep(0.2)
+        assert not alive(child)
+
+
+def test_get_start_ticks(tmp_path):
+    (tmp_path / "100").mkdir()
+    (tmp_path / "100" / "stat").write_text(
+        stat(100, "S", 100, 100).replace(" 0" * 44, " 0" * 12 + " 1234" + " 0" * 31)
+    )
+
+    assert get_start_ticks(100, proc=tmp_path) == 1234
+    assert get_start_ticks(101, proc=tmp_path) is None
+
+
+@posix
+def test_is_running():
+    assert is_running(os.getpid())
+    assert not is_running(None)
+    assert not is_running(2**22 + 1)
+
+
+@posix
+@proc
+def test_is_running_start_ticks():
+    start_ticks = get_start_ticks(os.getpid())
+
+    assert is_running(os.getpid(), start_ticks)
+    assert not is_running(os.getpid(), start_ticks + 1)  # the ID was reused
+
+
+@posix
+@pytest.mark.parametrize("pidfd", [True, False])
+@defer.inlineCallbacks
+def test_process_watcher(monkeypatch, pidfd):
+    if pidfd and not hasattr(os, "pidfd_open"):
+        pytest.skip("requires pidfd_open")
+    if not pidfd:
+        monkeypatch.delattr(os, "pidfd_open", raising=False)
+
+    with subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]) as child:
+        ended = defer.Deferred()
+        watcher = ProcessWatcher(child.pid, lambda: ended.callback(None), interval=0.05)
+        watcher.start()
+
+        assert (watcher.pidfd is not None) is pidfd
+        assert watcher.poller.running is not pidfd
+        assert not ended.called
+
+        watcher.signalProcess("TERM")
+        yield ended.addTimeout(5, reactor)
+
+        assert watcher.pid is None
+        assert watcher.pidfd is None
+        assert not watcher.poller.running
+        with pytest.raises(error.ProcessExitedAlready):
+            watcher.signalProcess("TERM")
+
+
+@posix
+def test_process_watcher_ended():
+    callback = MagicMock()
+    watcher = ProcessWatcher(2**22 + 1, callback)
+
+    watcher.start()
+
+    callback.assert_called_once_with()
@@ -0,0 +1,93 @@
+from unittest.mock import patch
+
+import pytest
+
+from scrapyd.config import Config
+from scrapyd.ratelimit import RateLimiter, parse_limit
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.cp.set(Config.SECTION, "rate_limit", "1")
+    config.cp.set(Config.SECTION, "rate_limit_burst", "2")
+    config.cp.add_section("rate_limits")
+    config.cp.set("rate_limits", "schedule.json", "10 20")
+    config.cp.set("rate_limits", "metrics", "0")
+    return config
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("2", (2.0, 10)),
+        ("0.5 3", (0.5, 3.0)),
+        ("2 0", (2.0, 1)),
+        ("0", None),
+    ],
+)
+def test_parse_limit(value, expected):
+    assert parse_limit(value, 10) == expected
+
+
+def test_parse_limit_invalid():
+    with pytest.raises(ValueError, match="^rate limit '-1' is less than 0$"):
+        parse_limit("-1", 10)
+
+
+def test_check(config):
+    limiter = RateLimiter(config)
+
+    assert limiter.check("c1", "listjobs.json", 0) == 0
+    assert limiter.check("c1", "listjobs.json", 0) == 0
+    # The burst is spent.
+    assert limiter.check("c1", "listjobs.json", 0) == 1
+    assert limiter.check("c1", "listjobs.json", 0.25) == 0.75
+    # Other clients and endpoints have their own buckets.
+    assert limiter.check("c2", "listjobs.json", 0.25) == 0
+    assert limiter.check("c1", "status.json", 0.25) == 0
+    # The bucket is refilled.
+    assert limiter.check("c1", "listjobs.json", 1) == 0
+    assert limiter.check("c1", "listjobs.json", 1) == 1
+
+    # Per-endpoint limits.
+    assert all(limiter.check("c1", "schedule.json", 0) == 0 for _ in range(20))
+    assert limiter.check("c1", "schedule.json", 0) == 0.1
+    assert all(limiter.check("c1", "metrics", 0) == 0 for _ in range(100))
+
+    with patch("scrapyd.ratelimit.time.monotonic", return_value=1.5):
+        assert limiter.count() == {("listjobs.json",): 2, ("status.json",): 1, ("schedule.json",): 1}
+        assert limiter.count(limited=True) == {("listjobs.json",): 1}
+
+
+def test_check_unlimited():
+    limiter = RateLimiter(Config())
+
+    assert all(limiter.check("c1", "listjobs.json") == 0 for _ in range(100))
+    assert limiter.buckets == {}
+
+
+def test_prune(config):
+    limiter = RateLimiter(config)
+    limiter.check("c1", "listjobs.json", 0)
+    limiter.check("c2", "listjobs.json", 0)
+    limiter.check("c2", "listjobs.json", 0)
+
+    with patch("scrapyd.ratelimit.MAX_BUCKETS", 2):
+        limiter.check("c3", "listjobs.json", 1)
+
+    # c1's bucket is full again, but c2's isn't.
+    assert sorted(client for client, _ in limiter.buckets) == ["c2", "c3"]
+
+
+def test_prune_oldest(config):
+    limiter = RateLimiter(config)
+    for client in ("c1", "c2", "c3"):
+        limiter.check(client, "listjobs.json", 0)
+        limiter.check(client, "listjobs.json", 0)
+
+    with patch("scrapyd.ratelimit.MAX_BUCKETS", 2):
+        limiter.check("c4", "listjobs.json", 0)
+
+    # No bucket is full, so the oldest buckets are removed.
+    assert [client for client, _ in limiter.buckets] == ["c3", "c4"]
@@ -0,0 +1,117 @@
+import datetime
+import re
+import signal
+from unittest.mock import patch
+
+import pytest
+
+from scrapyd.config import Config
+from scrapyd.retries import DEFAULTS, RetryPolicies, get_not_before, get_signal_name, parse_overrides, should_retry
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.cp.set(Config.SECTION, "max_attempts", "2")
+    config.cp.add_section("retry.p1")
+    config.cp.set("retry.p1", "max_attempts", "3")
+    config.cp.set("retry.p1", "retry_signals", "KILL")
+    config.cp.add_section("retry.p1.s1")
+    config.cp.set("retry.p1.s1", "retry_delay", "5")
+    return config
+
+
+@pytest.mark.parametrize(
+    ("project", "spider", "overrides", "expected"),
+    [
+        ("p0", "s1", None, {"max_attempts": 2}),
+        ("p1", "s0", None, {"max_attempts": 3, "retry_signals": "KILL"}),
+        ("p1", "s1", None, {"max_attempts": 3, "retry_signals": "KILL", "retry_delay": 5.0}),
+        ("p1", "s1", {"max_attempts": 1}, {"max_attempts": 1, "retry_signals": "KILL", "retry_delay": 5.0}),
+    ],
+)
+def test_get(config, project, spider, overrides, expected):
+    assert RetryPolicies(config).get(project, spider, overrides) == {**DEFAULTS, **expected}
+
+
+@pytest.mark.parametrize(
+    ("values", "expected"),
+    [
+        ({"max_attempts": "3", "retry_signals": None}, {"max_attempts": 3}),
+        (
+            {"retry_exit_codes": "1 2", "retry_signals": "TERM SIGKILL 9"},
+            {"retry_exit_codes": "1 2", "retry_signals": "TERM SIGKILL 9"},
+        ),
+        ({"retry_delay": "0.5"}, {"retry_delay": 0.5}),
+    ],
+)
+def test_parse_overrides(values, expected):
+    assert parse_overrides(values) == expected
+
+
+@pytest.mark.parametrize(
+    ("values", "message"),
+    [
+        ({"max_attempts": "0"}, "max_attempts must be 1 or more"),
+        ({"retry_max_delay": "-1"}, "retry_max_delay must be 0 or more"),
+        ({"retry_exit_codes": "1 x"}, "invalid literal for int() with base 10: 'x'"),
+        ({"retry_signals": "NOPE"}, "unknown signal 'NOPE'"),
+    ],
+)
+def test_parse_overrides_invalid(values, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        parse_overrides(values)
+
+
+def test_parse_overrides_invalid_prefix():
+    with pytest.raises(ValueError, match="^_max_attempts must be 1 or more$"):
+        parse_overrides({"max_attempts": "0"}, prefix="_")
+
+
+@pytest.mark.parametrize(
+    ("signum", "expected"),
+    [(signal.SIGTERM, "TERM"), ("15", "TERM"), ("term", "TERM"), ("SIGTERM", "TERM"), ("NOPE", None), (999, None)],
+)
+def test_get_signal_name(signum, expected):
+    assert get_signal_name(signum) == expected
+
+
+@pytest.mark.parametrize(
+    ("policy", "attempt", "exit_code", "exit_signal", "termination", "expected"),
+    [
+        # Exit codes.
+        ({}, 1, 1, None, None, True),
+        ({}, 3, 1, None, None, False),  # the last attempt
+        ({}, 1, 0, None, None, False),
+        ({"retry_exit_codes": "2 3"}, 1, 1, None, None, False),
+        ({"retry_exit_codes": "2 3"}, 1, 3, None, None, True),
+        ({"retry_exit_codes": ""}, 1, 1, None, None, False),
+        # Signals.
+        ({}, 1, None, signal.SIGTERM, None, False),
+        ({"retry_signals": "TERM"}, 1, None, signal.SIGTERM, None, True),
+        ({"retry_signals": "SIGKILL 15"}, 1, None, signal.SIGTERM, None, True),
+        # Terminations.
+        ({"retry_terminations": "stalled timeout"}, 1, 0, None, "timeout", True),
+        ({"retry_terminations": "stalled timeout"}, 1, None, signal.SIGINT, "stalled", True),
+        ({"retry_terminations": "cancelled"}, 1, 1, None, "cancelled", False),
+        ({}, 1, 1, None, "memory_limit", True),  # a retryable exit code
+    ],
+)
+def test_should_retry(policy, attempt, exit_code, exit_signal, termination, expected):
+    policy = {**DEFAULTS, "max_attempts": 3, **policy}
+
+    assert should_retry(policy, attempt, exit_code, exit_signal, termination) is expected
+
+
+@pytest.mark.parametrize(
+    ("attempt", "uniform", "expected"),
+    [(1, 1.0, 10), (1, 0.5, 5), (2, 1.0, 20), (3, 1.0, 25), (10, 0.5, 12.5)],
+)
+def test_get_not_before(attempt, uniform, expected):
+    now = datetime.datetime(2001, 2, 3, 4, 5, 6, 7)
+    policy = {**DEFAULTS, "retry_delay": 10.0, "retry_max_delay": 25.0}
+
+    with patch("random.uniform", lambda low, high: high * uniform):
+        not_before = get_not_before(policy, attempt, now)
+
+    assert not_before == now + datetime.timedelta(seconds=expected)
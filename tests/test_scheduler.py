@@ -5,8 +5,12 @@ from zope.interface.verify import verifyObject
 
 from scrapyd.config import Config
 from scrapyd.interfaces import ISpiderScheduler
+from scrapyd.jobindex import JobIndex
+from scrapyd.metrics import JOBS_DEDUPLICATED
 from scrapyd.scheduler import SpiderScheduler
+from scrapyd.spiderqueue import SqliteSpiderQueue
 from scrapyd.utils import get_spider_queues
+from tests import Legacy
 
 
 @pytest.fixture
@@ -48,6 +52,53 @@ def test_schedule(scheduler):
     scheduler.schedule("mybot2", "myspider2", 1, c="d")
     scheduler.schedule("mybot2", "myspider3", 10, e="f")
 
-    assert mybot1_queue.pop() == {"name": "myspider1", "a": "b"}
-    assert mybot2_queue.pop() == {"name": "myspider3", "e": "f"}
-    assert mybot2_queue.pop() == {"name": "myspider2", "c": "d"}
+    assert mybot1_queue.pop() == {"name": "myspider1", "a": "b", "_priority": 2}
+    assert mybot2_queue.pop() == {"name": "myspider3", "e": "f", "_priority": 10}
+    assert mybot2_queue.pop() == {"name": "myspider2", "c": "d", "_priority": 1}
+
+
+def test_schedule_default_priority(scheduler):
+    scheduler.schedule("mybot1", "myspider1", a="b")
+
+    # The default priority isn't recorded.
+    assert scheduler.queues["mybot1"].pop() == {"name": "myspider1", "a": "b"}
+
+
+def test_schedule_jobindex(scheduler):
+    scheduler.jobindex = JobIndex(scheduler.config)
+
+    scheduler.schedule("mybot1", "myspider1", _job="j1")
+    scheduler.schedule("mybot1", "myspider1")  # no job ID
+
+    assert scheduler.jobindex.state("j1", "mybot1") == "pending"
+    assert list(scheduler.jobindex.jobs) == ["j1"]
+
+
+def test_schedule_dedupe_key(scheduler):
+    scheduler.jobindex = JobIndex(scheduler.config)
+    before = JOBS_DEDUPLICATED.values[("mybot1",)]
+
+    assert scheduler.schedule("mybot1", "myspider1", _job="j1", _dedupe_key="k1") == "j1"
+    assert scheduler.schedule("mybot1", "myspider1", _job="j2", _dedupe_key="k1") == "j1"
+    assert scheduler.schedule("mybot1", "myspider1", _job="j3", _dedupe_key="k2") == "j3"
+
+    assert JOBS_DEDUPLICATED.values[("mybot1",)] == before + 1
+    assert sorted(scheduler.jobindex.jobs) == ["j1", "j3"]
+    assert scheduler.queues["mybot1"].count() == 2
+
+
+class OldSpiderQueue(SqliteSpiderQueue):
+    # The signature of ISpiderQueue.add before 1.7.0.
+    def add(self, name, priority=0.0, **spider_args):
+        message = spider_args.copy()
+        message["name"] = name
+        self.q.put(message, priority=priority)
+
+
+def test_schedule_legacy(scheduler):
+    queue = OldSpiderQueue(scheduler.config, "mybot1")
+    scheduler.queues["mybot1"] = Legacy(queue, "get_duplicate", "next_due", "purge_expired")
+
+    assert scheduler.schedule("mybot1", "myspider1", 2, _job="j1", a="b") == "j1"
+
+    assert queue.pop() == {"name": "myspider1", "_job": "j1", "a": "b", "_priority": 2}
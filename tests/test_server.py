@@ -67,10 +67,18 @@ def test_error():
     ("method", "basename"),
     [
         ("GET", "daemonstatus"),
+        ("GET", "summary"),
+        ("POST", "resize"),
+        ("GET, POST", "drain"),
         ("POST", "addversion"),
         ("POST", "schedule"),
+        ("POST", "addschedule"),
+        ("GET", "listschedules"),
+        ("POST", "delschedule"),
         ("POST", "cancel"),
+        ("POST", "bulkcancel"),
         ("GET", "status"),
+        ("GET, POST", "bulkstatus"),
         ("GET", "listprojects"),
         ("GET", "listversions"),
         ("GET", "listspiders"),
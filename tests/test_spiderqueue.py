@@ -1,3 +1,5 @@
+import datetime
+
 import pytest
 from twisted.internet.defer import inlineCallbacks, maybeDeferred
 from zope.interface.verify import verifyObject
@@ -72,3 +74,43 @@ def test_clear(spiderqueue):
     yield maybeDeferred(spiderqueue.clear)
 
     assert (yield maybeDeferred(spiderqueue.count)) == 0
+
+
+@inlineCallbacks
+def test_not_before(spiderqueue):
+    not_before = datetime.datetime.now() + datetime.timedelta(hours=1)
+    yield maybeDeferred(spiderqueue.add, "spider1", 10, _not_before=not_before, **spider_args)
+    yield maybeDeferred(spiderqueue.add, "spider0", 5)
+
+    assert (yield maybeDeferred(spiderqueue.list)) == [{**expected, "_not_before": not_before}, {"name": "spider0"}]
+    assert (yield maybeDeferred(spiderqueue.next_due)) == not_before
+    assert (yield maybeDeferred(spiderqueue.pop)) == {"name": "spider0"}
+    assert (yield maybeDeferred(spiderqueue.pop)) is None
+    assert (yield maybeDeferred(spiderqueue.count)) == 1
+
+
+@inlineCallbacks
+def test_dedupe_key(spiderqueue):
+    assert (yield maybeDeferred(spiderqueue.add, "spider1", 1, _dedupe_key="k1", **spider_args)) is None
+    assert (yield maybeDeferred(spiderqueue.add, "spider1", 5, _dedupe_key="k1", _job="j2")) == expected
+    assert (yield maybeDeferred(spiderqueue.count)) == 1
+
+
+@inlineCallbacks
+def test_expires_at(spiderqueue):
+    expires_at = datetime.datetime.now() - datetime.timedelta(seconds=1)
+    yield maybeDeferred(spiderqueue.add, "spider1", 10, _expires_at=expires_at, **spider_args)
+
+    assert (yield maybeDeferred(spiderqueue.list)) == [{**expected, "_expires_at": expires_at}]
+    assert (yield maybeDeferred(spiderqueue.pop)) is None
+    assert (yield maybeDeferred(spiderqueue.purge_expired)) == [expected]
+    assert (yield maybeDeferred(spiderqueue.count)) == 0
+
+
+@inlineCallbacks
+def test_remove_matching(spiderqueue):
+    yield maybeDeferred(spiderqueue.add, "spider1", 10, **spider_args)
+    yield maybeDeferred(spiderqueue.add, "spider2", 5, _job="j2")
+
+    assert (yield maybeDeferred(spiderqueue.remove_matching, spider="spider2")) == ["j2"]
+    assert (yield maybeDeferred(spiderqueue.list)) == [expected]
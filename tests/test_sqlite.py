@@ -1,8 +1,10 @@
 import datetime
+import sqlite3
 
 import pytest
 
-from scrapyd.sqlite import JsonSqlitePriorityQueue, SqliteFinishedJobs
+from scrapyd.launcher import ScrapyProcessProtocol
+from scrapyd.sqlite import JsonSqlitePriorityQueue, SqliteFinishedJobs, SqlitePeriodicSchedules, SqliteRunningJobs
 from tests import get_finished_job
 
 
@@ -78,6 +80,12 @@ def test_jsonsqlitepriorityqueue_iter_len_clear(jsonsqlitepriorityqueue):
 
     assert len(jsonsqlitepriorityqueue) == 4
     assert list(jsonsqlitepriorityqueue) == [(msg2, 5.0), (msg3, 3.0), (msg4, 2.0), (msg1, 1.0)]
+    assert list(jsonsqlitepriorityqueue.iter_with_times()) == [
+        (msg2, 5.0, None, None),
+        (msg3, 3.0, None, None),
+        (msg4, 2.0, None, None),
+        (msg1, 1.0, None, None),
+    ]
 
     jsonsqlitepriorityqueue.clear()
 
@@ -120,6 +128,103 @@ def test_jsonsqlitepriorityqueue_types(jsonsqlitepriorityqueue, value):
     assert jsonsqlitepriorityqueue.pop() == value
 
 
+def test_jsonsqlitepriorityqueue_not_before(jsonsqlitepriorityqueue):
+    now = datetime.datetime.now()
+    jsonsqlitepriorityqueue.put("later", priority=2, not_before=now + datetime.timedelta(hours=1))
+    jsonsqlitepriorityqueue.put("due", priority=1, not_before=now - datetime.timedelta(seconds=1))
+    jsonsqlitepriorityqueue.put("now", priority=0)
+
+    assert jsonsqlitepriorityqueue.next_due() == now + datetime.timedelta(hours=1)
+    assert jsonsqlitepriorityqueue.pop() == "due"
+    assert jsonsqlitepriorityqueue.pop() == "now"
+    assert jsonsqlitepriorityqueue.pop() is None
+    assert list(jsonsqlitepriorityqueue.iter_with_times()) == [("later", 2.0, now + datetime.timedelta(hours=1), None)]
+
+    jsonsqlitepriorityqueue.clear()
+
+    assert jsonsqlitepriorityqueue.next_due() is None
+
+
+def test_jsonsqlitepriorityqueue_expires_at(jsonsqlitepriorityqueue):
+    now = datetime.datetime.now()
+    jsonsqlitepriorityqueue.put("expired", priority=2, expires_at=now - datetime.timedelta(seconds=1))
+    jsonsqlitepriorityqueue.put("later", priority=1, expires_at=now + datetime.timedelta(hours=1))
+    jsonsqlitepriorityqueue.put("expired too", priority=0, expires_at=now - datetime.timedelta(hours=1))
+    jsonsqlitepriorityqueue.put("never", priority=0)
+
+    # Expired messages are skipped, without being purged.
+    assert jsonsqlitepriorityqueue.pop() == "later"
+    assert len(jsonsqlitepriorityqueue) == 3
+    assert jsonsqlitepriorityqueue.purge_expired() == ["expired too", "expired"]
+    assert jsonsqlitepriorityqueue.purge_expired() == []
+    assert list(jsonsqlitepriorityqueue.iter_with_times()) == [("never", 0.0, None, None)]
+
+
+def test_jsonsqlitepriorityqueue_dedupe_key(jsonsqlitepriorityqueue):
+    assert jsonsqlitepriorityqueue.put("first", priority=1, dedupe_key="k1") is None
+    assert jsonsqlitepriorityqueue.put("other", priority=2) is None
+    assert jsonsqlitepriorityqueue.put("other", priority=2) is None
+    assert jsonsqlitepriorityqueue.get_duplicate("k1") == "first"
+    assert jsonsqlitepriorityqueue.get_duplicate("k2") is None
+    # A lower priority is ignored.
+    assert jsonsqlitepriorityqueue.put("second", priority=0, dedupe_key="k1") == "first"
+
+    assert list(jsonsqlitepriorityqueue) == [("other", 2.0), ("other", 2.0), ("first", 1.0)]
+
+    # A higher priority is applied.
+    assert jsonsqlitepriorityqueue.put("third", priority=3, dedupe_key="k1") == "first"
+
+    assert list(jsonsqlitepriorityqueue) == [("first", 3.0), ("other", 2.0), ("other", 2.0)]
+    assert jsonsqlitepriorityqueue.pop() == "first"
+    # The key is free once the message is popped.
+    assert jsonsqlitepriorityqueue.put("fourth", dedupe_key="k1") is None
+
+
+def test_jsonsqlitepriorityqueue_remove_matching(jsonsqlitepriorityqueue):
+    for priority, message in enumerate(
+        [
+            {"name": "s1", "_job": "j1"},
+            {"name": "s1", "_job": "j2", "_version": "r1"},
+            {"name": "s2", "_job": "j3", "_version": "r1"},
+            {"name": "s2", "_job": "j4"},
+            "other",
+        ]
+    ):
+        jsonsqlitepriorityqueue.put(message, priority=priority)
+
+    assert jsonsqlitepriorityqueue.remove_matching(version="r1", jobs=["j1", "j3"]) == ["j3"]
+    assert jsonsqlitepriorityqueue.remove_matching(spider="s2") == ["j4"]
+    assert jsonsqlitepriorityqueue.remove_matching(spider="s1", min_priority=1, max_priority=1) == ["j2"]
+    assert jsonsqlitepriorityqueue.remove_matching(jobs=[]) == []
+    assert jsonsqlitepriorityqueue.remove_matching() == ["j1", None]
+    assert len(jsonsqlitepriorityqueue) == 0
+
+
+def test_jsonsqlitepriorityqueue_count_by_spider(jsonsqlitepriorityqueue):
+    for message in ({"name": "s1"}, {"name": "s1"}, {"name": "s2"}, "other"):
+        jsonsqlitepriorityqueue.put(message)
+
+    assert jsonsqlitepriorityqueue.count_by_spider() == {"s1": 2, "s2": 1, None: 1}
+
+
+def test_jsonsqlitepriorityqueue_migrate(tmp_path):
+    database = str(tmp_path / "p1.db")
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE TABLE queue (id integer PRIMARY KEY, priority real key, message blob)")
+    conn.execute("INSERT INTO queue (priority, message) VALUES (?, ?)", (0, b'"message"'))
+    conn.execute("INSERT INTO queue (priority, message) VALUES (?, ?)", (0, b'{"name": "s1", "_job": "j1"}'))
+    conn.commit()
+    conn.close()
+
+    q = JsonSqlitePriorityQueue(database)
+
+    assert q.put("duplicate", dedupe_key="k1") is None
+    assert q.put("duplicate", dedupe_key="k1") == "duplicate"
+    # Existing rows are filled in.
+    assert q.remove_matching(spider="s1") == ["j1"]
+    assert q.pop() == "message"
+
+
 def test_sqlitefinishedjobs_add(sqlitefinishedjobs):
     assert len(sqlitefinishedjobs) == 3
 
@@ -148,3 +253,90 @@ def test_sqlitefinishedjobs__iter__(sqlitefinishedjobs):
     assert (actual[0][0], actual[0][1]) == ("p3", "s3")
     assert (actual[1][0], actual[1][1]) == ("p2", "s2")
     assert (actual[2][0], actual[2][1]) == ("p1", "s1")
+    assert actual[0][5] is None
+    assert actual[0][6] is None
+    assert actual[0][7] is None
+    assert actual[0][8:] == (1, None, None)
+
+
+def test_sqlitefinishedjobs_usage(sqlitefinishedjobs):
+    job = get_finished_job("p4", "s4", "j4", end_time=datetime.datetime(2001, 2, 3, 4, 5, 6, 10))
+    job.usage = {"cpu_user": 1.5, "max_rss": 1024}
+    job.termination = "cpu_limit"
+    job.stats = {"requests": 3, "items": 1}
+    job.attempt = 2
+    job.retry_of = "j3"
+    job.retried_as = "j5"
+    sqlitefinishedjobs.add(job)
+
+    assert next(iter(sqlitefinishedjobs))[5:] == (
+        {"cpu_user": 1.5, "max_rss": 1024},
+        "cpu_limit",
+        {"requests": 3, "items": 1},
+        2,
+        "j3",
+        "j5",
+    )
+
+
+def test_sqlitefinishedjobs_migrate(tmp_path):
+    database = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "CREATE TABLE finished_jobs "
+        "(id integer PRIMARY KEY, project text, spider text, job text, start_time datetime, end_time datetime)"
+    )
+    conn.execute(
+        "INSERT INTO finished_jobs (project, spider, job, start_time, end_time) VALUES (?, ?, ?, ?, ?)",
+        ("p1", "s1", "j1", "2001-02-03 04:05:06.000007", "2001-02-03 04:05:06.000008"),
+    )
+    conn.commit()
+    conn.close()
+
+    jobs = SqliteFinishedJobs(database)
+
+    assert [row[:3] for row in jobs] == [("p1", "s1", "j1")]
+    assert next(iter(jobs))[5:] == (None, None, None, 1, None, None)
+
+
+def test_sqliterunningjobs():
+    start_time = datetime.datetime(2001, 2, 3, 4, 5, 6, 7)
+    running = SqliteRunningJobs(":memory:")
+    for slot, pid in ((1, 101), (0, 100)):
+        process = ScrapyProcessProtocol("p1", "s1", f"j{slot}", env={}, args=["-a", "arg1=val1"])
+        process.pid = pid
+        process.start_time = start_time
+        process.start_ticks = pid * 10
+        process.log_file = f"logs/p1/s1/j{slot}.log"
+        running.add(process, slot)
+
+    assert list(running) == [
+        (0, "p1", "s1", "j0", 100, start_time, 1000, "logs/p1/s1/j0.log", ["-a", "arg1=val1"]),
+        (1, "p1", "s1", "j1", 101, start_time, 1010, "logs/p1/s1/j1.log", ["-a", "arg1=val1"]),
+    ]
+
+    running.remove(100)
+
+    assert [row[0] for row in running] == [1]
+
+
+def test_sqliteperiodicschedules():
+    time = datetime.datetime(2001, 2, 3, 4, 5, 6, 7)
+    schedules = SqlitePeriodicSchedules(":memory:")
+    schedules.put("p2", "n1", {"spider": "s1"}, time)
+    schedules.put("p1", "n1", {"spider": "s1"}, time)
+
+    assert list(schedules) == [("p1", "n1", {"spider": "s1"}, time, None), ("p2", "n1", {"spider": "s1"}, time, None)]
+
+    # Replace.
+    schedules.put("p1", "n1", {"spider": "s2"}, time, "j1")
+    schedules.update("p2", "n1", time + datetime.timedelta(days=1), "j2")
+
+    assert list(schedules) == [
+        ("p1", "n1", {"spider": "s2"}, time, "j1"),
+        ("p2", "n1", {"spider": "s1"}, time + datetime.timedelta(days=1), "j2"),
+    ]
+
+    assert schedules.remove("p1", "n1") == 1
+    assert schedules.remove("p1", "n1") == 0
+    assert len(schedules) == 1
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from scrapyd.usage import CLOCK_TICKS, PAGE_SIZE, from_rusage, read_proc, report_usage
+
+STAT = "123 (scrapy (crawl) x) S 1 123 123 0 -1 4194304 100 0 0 0 250 50 0 0 20 0 3 0 100 1000000 2048 " + " ".join(
+    ["0"] * 27
+)
+STATUS = """\
+Name:\tpython
+VmHWM:\t   16384 kB
+VmRSS:\t    8192 kB
+voluntary_ctxt_switches:\t12
+nonvoluntary_ctxt_switches:\t3
+"""
+IO = """\
+rchar: 100
+wchar: 200
+read_bytes: 4096
+write_bytes: 8192
+"""
+
+
+def test_from_rusage():
+    resource = pytest.importorskip("resource")
+
+    usage = from_rusage(resource.getrusage(resource.RUSAGE_SELF))
+
+    assert usage["cpu_user"] > 0
+    assert usage["max_rss"] > (2**20 if sys.platform != "darwin" else 0)
+
+
+def test_report_usage():
+    pytest.importorskip("resource")
+    read, write = os.pipe()
+
+    report_usage({"SCRAPYD_USAGE_FD": str(write)})
+
+    with os.fdopen(read, "rb") as f:
+        usage = json.loads(f.read())
+
+    assert usage["cpu_user"] > 0
+    assert usage["max_rss"] > 0
+    with pytest.raises(OSError, match="Bad file descriptor"):
+        os.fstat(write)
+
+
+def test_report_usage_unset():
+    report_usage({})
+
+
+@pytest.mark.parametrize("io", [True, False])
+def test_read_proc(tmp_path, io):
+    (tmp_path / "123").mkdir()
+    (tmp_path / "123" / "stat").write_text(STAT)
+    (tmp_path / "123" / "status").write_text(STATUS)
+    if io:
+        (tmp_path / "123" / "io").write_text(IO)
+
+    expected = {
+        "cpu_user": 250 / CLOCK_TICKS,
+        "cpu_system": 50 / CLOCK_TICKS,
+        "rss": 2048 * PAGE_SIZE,
+        "max_rss": 16384 * 1024,
+        "voluntary_switches": 12,
+        "involuntary_switches": 3,
+    }
+    if io:
+        expected.update({"read_bytes": 4096, "write_bytes": 8192})
+
+    assert read_proc(123, proc=tmp_path) == expected
+
+
+def test_read_proc_nonexistent(tmp_path):
+    assert read_proc(123, proc=tmp_path) is None
+
+
+@pytest.mark.skipif(not Path("/proc/self/stat").exists(), reason="requires /proc")
+def test_read_proc_self():
+    usage = read_proc(os.getpid())
+
+    assert usage["rss"] > 0
+    assert usage["max_rss"] >= usage["rss"]
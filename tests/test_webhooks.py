@@ -0,0 +1,213 @@
+import datetime
+import json
+
+import pytest
+from twisted.internet import defer, reactor, task
+from twisted.logger import LogLevel, capturedLogs
+from twisted.web import resource, server
+
+from scrapyd.config import Config
+from scrapyd.webhooks import Webhooks
+from scrapyd.website import Root
+from tests import get_finished_job, get_message, root_add_version
+
+job1 = get_finished_job(
+    start_time=datetime.datetime(2001, 2, 3, 4, 5, 6, 7),
+    end_time=datetime.datetime(2001, 2, 3, 4, 5, 6, 8),
+)
+
+
+# A stand-in for a webhook consumer.
+class Endpoint(resource.Resource):
+    isLeaf = True
+
+    def __init__(self):
+        super().__init__()
+        self.codes = []
+        self.requests = []
+        self.waiting = []
+
+    def wait(self, count):
+        d = defer.Deferred()
+        self.waiting.append((count, d))
+        return d
+
+    def render_POST(self, txrequest):
+        self.requests.append((txrequest.getHeader(b"Content-Type"), json.loads(txrequest.content.read())))
+        txrequest.setResponseCode(self.codes.pop(0) if self.codes else 200)
+        for count, d in list(self.waiting):
+            if len(self.requests) >= count:
+                self.waiting.remove((count, d))
+                reactor.callLater(0, d.callback, None)
+        return b"{}"
+
+    def jobs(self):
+        return [[job["job"] for job in body["jobs"]] for _, body in self.requests]
+
+
+def get_captured(captured):
+    return [event for event in captured if event.get("log_namespace") == "scrapyd.webhooks"]
+
+
+@pytest.fixture
+def endpoint():
+    endpoint = Endpoint()
+    port = reactor.listenTCP(0, server.Site(endpoint), interface="127.0.0.1")
+    endpoint.url = f"http://127.0.0.1:{port.getHost().port}/"
+    yield endpoint
+    port.stopListening()
+
+
+def get_webhooks(app, url, **options):
+    config = Config()
+    config.cp.set(Config.SECTION, "webhook_retry_delay", "0.01")
+    for key, value in options.items():
+        config.cp.set(Config.SECTION, key, value)
+    if url:
+        config.cp.add_section("webhooks")
+        config.cp.set("webhooks", "p1", url)
+
+    root = Root(config, app)
+    root_add_version(root, "p1", "r1", "mybot")
+    root_add_version(root, "p2", "r2", "mybot")
+    root.update_projects()
+
+    return Webhooks(config, root), root
+
+
+def test_no_urls(app):
+    webhooks, root = get_webhooks(app, None)
+
+    assert webhooks.notify not in root.jobindex.observers
+
+
+@defer.inlineCallbacks
+def test_notify(app, endpoint):
+    webhooks, root = get_webhooks(app, endpoint.url)
+
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.jobindex.finish(get_finished_job("p2", "s1", "j2"))
+    root.jobindex.finish(get_finished_job("p1", "s1", "j1", start_time=job1.start_time, end_time=job1.end_time))
+    yield endpoint.wait(1)
+    yield webhooks.stopService()
+
+    assert len(endpoint.requests) == 1
+    content_type, body = endpoint.requests[0]
+    assert content_type == b"application/json"
+    assert body["node_name"] == root.node_name
+    assert len(body["jobs"]) == 1
+    job = body["jobs"][0]
+    assert job.pop("time")
+    assert job == {
+        "event": "finished",
+        "project": "p1",
+        "spider": "s1",
+        "job": "j1",
+        "start_time": "2001-02-03 04:05:06.000007",
+        "end_time": "2001-02-03 04:05:06.000008",
+        "exit_code": None,
+        "exit_signal": None,
+        "termination": None,
+        "log_url": None,
+        "output_url": None,
+        "items_url": None,
+    }
+
+
+@defer.inlineCallbacks
+def test_cancel(app, endpoint):
+    webhooks, root = get_webhooks(app, endpoint.url)
+
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.jobindex.cancel("p1", "j1", "pending")
+    yield endpoint.wait(1)
+    yield webhooks.stopService()
+
+    [(_, body)] = endpoint.requests
+    assert body["jobs"][0]["event"] == "cancelled"
+    assert body["jobs"][0]["prevstate"] == "pending"
+
+
+@defer.inlineCallbacks
+def test_batch(app, endpoint):
+    webhooks, root = get_webhooks(app, endpoint.url, webhook_batch_size="2")
+
+    for job in ("j1", "j2", "j3", "j4"):
+        root.jobindex.finish(get_finished_job("p1", "s1", job))
+    yield endpoint.wait(3)
+    yield webhooks.stopService()
+
+    # The first job is sent immediately. The others are batched while a request is in flight.
+    assert endpoint.jobs() == [["j1"], ["j2", "j3"], ["j4"]]
+
+
+@defer.inlineCallbacks
+def test_queue_size(app, endpoint):
+    webhooks, root = get_webhooks(app, endpoint.url, webhook_queue_size="1")
+
+    with capturedLogs() as captured:
+        for job in ("j1", "j2", "j3"):
+            root.jobindex.finish(get_finished_job("p1", "s1", job))
+    yield endpoint.wait(2)
+    yield webhooks.stopService()
+    captured = get_captured(captured)
+
+    assert endpoint.jobs() == [["j1"], ["j3"]]
+    assert len(captured) == 1
+    assert captured[0]["log_level"] == LogLevel.warn
+    assert get_message(captured).endswith(f"Webhook queue is full, dropping the oldest job: url={endpoint.url!r}")
+
+
+@defer.inlineCallbacks
+def test_retry(app, endpoint):
+    webhooks, root = get_webhooks(app, endpoint.url)
+    endpoint.codes = [500, 503]
+
+    with capturedLogs() as captured:
+        root.jobindex.finish(get_finished_job("p1", "s1", "j1"))
+        yield endpoint.wait(3)
+    yield webhooks.stopService()
+    captured = get_captured(captured)
+
+    assert endpoint.jobs() == [["j1"], ["j1"], ["j1"]]
+    assert [event["log_level"] for event in captured] == [LogLevel.warn, LogLevel.warn]
+    assert get_message(captured[:1]).endswith(
+        f"Webhook failed, retrying in 0.01s: url={endpoint.url!r} error=HTTP status code 500"
+    )
+    assert get_message(captured[1:]).endswith(
+        f"Webhook failed, retrying in 0.02s: url={endpoint.url!r} error=HTTP status code 503"
+    )
+
+
+@defer.inlineCallbacks
+def test_retry_exhausted(app, endpoint):
+    webhooks, root = get_webhooks(app, endpoint.url, webhook_max_retries="1")
+    endpoint.codes = [500, 500]
+
+    with capturedLogs() as captured:
+        root.jobindex.finish(get_finished_job("p1", "s1", "j1"))
+        root.jobindex.finish(get_finished_job("p1", "s1", "j2"))
+        yield endpoint.wait(3)
+    yield webhooks.stopService()
+    captured = get_captured(captured)
+
+    assert endpoint.jobs() == [["j1"], ["j1"], ["j2"]]
+    assert captured[-1]["log_level"] == LogLevel.error
+    assert get_message(captured[-1:]).endswith(
+        f"Webhook failed, dropping 1 jobs: url={endpoint.url!r} error=HTTP status code 500"
+    )
+
+
+@defer.inlineCallbacks
+def test_connection_refused(app):
+    webhooks, root = get_webhooks(app, "http://127.0.0.1:1/", webhook_max_retries="0")
+
+    with capturedLogs() as captured:
+        root.jobindex.finish(get_finished_job("p1", "s1", "j1"))
+        while not get_captured(captured):
+            yield task.deferLater(reactor, 0.01, lambda: None)
+    yield webhooks.stopService()
+    captured = get_captured(captured)
+
+    assert captured[0]["log_level"] == LogLevel.error
+    assert "Webhook failed, dropping 1 jobs: url='http://127.0.0.1:1/' error=" in get_message(captured)
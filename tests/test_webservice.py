@@ -1,21 +1,27 @@
 import datetime
+import gzip
 import io
 import json
 import os
 import re
 import signal
 import sys
-from unittest.mock import MagicMock, PropertyMock, call
+import time
+from collections import deque
+from unittest.mock import MagicMock, PropertyMock, call, patch
 
 import pytest
+from twisted.internet import defer, reactor
 from twisted.logger import LogLevel, capturedLogs
-from twisted.web import error
+from twisted.web import error, http, server
+from twisted.web.test.requesthelper import DummyChannel, DummyRequest
 
 from scrapyd.exceptions import DirectoryTraversalError, RunnerError
 from scrapyd.interfaces import IEggStorage
 from scrapyd.launcher import ScrapyProcessProtocol
+from scrapyd.metrics import API_CACHE, API_RATE_LIMITED, JOBS_REJECTED
 from scrapyd.webservice import spider_list
-from tests import get_egg_data, get_finished_job, get_message, has_settings, root_add_version, touch
+from tests import Legacy, get_egg_data, get_finished_job, get_message, has_settings, root_add_version, touch
 
 cliargs = [sys.executable, "-m", "scrapyd.runner", "crawl", "s2", "-s", "DOWNLOAD_DELAY=2", "-a", "arg1=val1"]
 
@@ -128,12 +134,14 @@ def test_spider_list_error(app):
         ("POST", "cancel", "project", {}),
         ("POST", "cancel", "project", {b"job": [b"aaa"]}),
         ("POST", "cancel", "job", {b"project": [b"mybot"]}),
+        ("POST", "bulkcancel", "project", {}),
         ("POST", "addversion", "project", {}),
         ("POST", "addversion", "project", {b"version": [b"0.1"]}),
         ("POST", "addversion", "version", {b"project": [b"mybot"]}),
         ("GET", "listversions", "project", {}),
         ("GET", "listspiders", "project", {}),
         ("GET", "status", "job", {}),
+        ("GET", "bulkstatus", "job", {}),
         ("POST", "delproject", "project", {}),
         ("POST", "delversion", "project", {}),
         ("POST", "delversion", "project", {b"version": [b"0.1"]}),
@@ -161,10 +169,18 @@ def test_invalid_type(txrequest, root):
     ("method", "basename"),
     [
         ("GET", "daemonstatus"),
+        ("GET", "summary"),
+        ("POST", "resize"),
+        ("GET, POST", "drain"),
         ("POST", "addversion"),
         ("POST", "schedule"),
+        ("POST", "addschedule"),
+        ("GET", "listschedules"),
+        ("POST", "delschedule"),
         ("POST", "cancel"),
+        ("POST", "bulkcancel"),
         ("GET", "status"),
+        ("GET, POST", "bulkstatus"),
         ("GET", "listprojects"),
         ("GET", "listversions"),
         ("GET", "listspiders"),
@@ -215,7 +231,7 @@ def test_debug(txrequest, root):
 
 
 def test_daemonstatus(txrequest, root_with_egg, scrapy_process):
-    expected = {"running": 0, "pending": 0, "finished": 0}
+    expected = {"running": 0, "pending": 0, "finished": 0, "slots": 0, "max_proc": root_with_egg.launcher.max_proc}
     assert_content(txrequest, root_with_egg, "GET", "daemonstatus", {}, expected)
 
     root_with_egg.launcher.finished.add(job1)
@@ -231,6 +247,59 @@ def test_daemonstatus(txrequest, root_with_egg, scrapy_process):
     assert_content(txrequest, root_with_egg, "GET", "daemonstatus", {}, expected)
 
 
+def test_resize(txrequest, root, scrapy_process):
+    root.launcher.max_proc = 0
+    root.launcher.processes[1] = scrapy_process
+    root.launcher.slots.add(1)
+
+    assert_content(txrequest, root, "POST", "resize", {b"max_proc": [b"3"]}, {"slots": 3, "max_proc": 3})
+    assert root.launcher.slots == {0, 1, 2}
+    assert len(root.poller.dq.waiting) == 2
+
+    assert_content(txrequest, root, "POST", "resize", {b"max_proc": [b"0"]}, {"slots": 1, "max_proc": 0})
+    assert root.launcher.slots == {1}
+    assert not root.poller.dq.waiting
+
+
+@pytest.mark.parametrize(
+    ("args", "message"),
+    [
+        ({}, b"'max_proc' parameter is required"),
+        ({b"max_proc": [b"-1"]}, b"max_proc must be 0 or more"),
+        ({b"max_proc": [b"x"]}, b"max_proc is invalid: invalid literal for int() with base 10: b'x'"),
+    ],
+)
+def test_resize_invalid(txrequest, root, args, message):
+    assert_error(txrequest, root, "POST", "resize", args, message)
+
+
+def test_drain(txrequest, root, scrapy_process):
+    root.launcher.max_proc = 2
+    root.launcher.processes[1] = scrapy_process
+    root.launcher.slots.add(1)
+
+    expected = {"draining": False, "drained": False, "running": 1}
+    assert_content(txrequest, root, "GET", "drain", {}, expected)
+
+    expected["draining"] = True
+    assert_content(txrequest, root, "POST", "drain", {}, expected)
+    assert root.launcher.slots == {1}
+    assert root.launcher.max_proc == 0
+
+    # The target is restored after draining.
+    root.launcher.resize(3)
+    assert root.launcher.max_proc == 0
+
+    del root.launcher.processes[1]
+    expected.update(drained=True, running=0)
+    assert_content(txrequest, root, "GET", "drain", {}, expected)
+
+    expected.update(draining=False, drained=False)
+    assert_content(txrequest, root, "POST", "drain", {b"drain": [b"false"]}, expected)
+    assert root.launcher.slots == {0, 1, 2}
+    assert root.launcher.max_proc == 3
+
+
 @pytest.mark.parametrize(
     ("args", "spiders", "run_only_if_has_settings"),
     [
@@ -297,34 +366,283 @@ def test_status(txrequest, root, scrapy_process, args):
     root.update_projects()
 
     if args:
-        root.launcher.finished.add(get_finished_job("p2", "s2", "j1"))
-        root.launcher.processes[0] = ScrapyProcessProtocol("p2", "s2", "j1", env={}, args=[])
-        root.poller.queues["p2"].add("s2", _job="j1")
+        process = ScrapyProcessProtocol("p2", "s2", "j1", env={}, args=[])
+        root.jobindex.finish(get_finished_job("p2", "s2", "j1"))
+        root.launcher.processes[1] = process
+        root.jobindex.start(process, 1)
+        root.scheduler.schedule("p2", "s2", _job="j1")
 
     expected = {"currstate": None}
     assert_content(txrequest, root, "GET", "status", {b"job": [b"j1"], **args}, expected)
 
-    root.poller.queues["p1"].add("s1", _job="j1")
+    root.scheduler.schedule("p1", "s1", _job="j1")
 
     expected["currstate"] = "pending"
     assert_content(txrequest, root, "GET", "status", {b"job": [b"j1"], **args}, expected)
 
+    root.jobindex.pop("p1", "j1")
     root.launcher.processes[0] = scrapy_process
+    root.jobindex.start(scrapy_process, 0)
 
     expected["currstate"] = "running"
     assert_content(txrequest, root, "GET", "status", {b"job": [b"j1"], **args}, expected)
 
     root.launcher.finished.add(job1)
+    root.jobindex.finish(job1, 0)
 
     expected["currstate"] = "finished"
     assert_content(txrequest, root, "GET", "status", {b"job": [b"j1"], **args}, expected)
 
 
+def test_status_rebuild(txrequest, root, scrapy_process):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+
+    # Jobs that were added before the application started are indexed.
+    root.poller.queues["p1"].add("s1", _job="j1")
+    root.launcher.finished.add(get_finished_job("p1", "s1", "j2"))
+    root.jobindex.rebuild(root.poller.queues, root.launcher.finished)
+
+    assert_content(txrequest, root, "GET", "status", {b"job": [b"j1"]}, {"currstate": "pending"})
+    assert_content(txrequest, root, "GET", "status", {b"job": [b"j2"]}, {"currstate": "finished"})
+
+
 def test_status_nonexistent(txrequest, root):
     args = {b"job": [b"aaa"], b"project": [b"nonexistent"]}
     assert_error(txrequest, root, "GET", "status", args, b"project 'nonexistent' not found")
 
 
+@pytest.fixture
+def root_with_jobs(root):
+    root_add_version(root, "p1", "r1", "mybot")
+    root_add_version(root, "p2", "r2", "mybot2")
+    root.update_projects()
+
+    process = ScrapyProcessProtocol("p2", "s2", "j2", env={}, args=[])
+    process.pid = 12345
+    process.start_time = datetime.datetime(2001, 2, 3, 4, 5, 6, 9)
+
+    root.launcher.finished.add(job1)
+    root.jobindex.finish(job1)
+    root.launcher.processes[0] = process
+    root.jobindex.start(process, 0)
+    root.scheduler.schedule("p1", "s1", _job="j3")
+    return root
+
+
+@pytest.mark.parametrize(
+    ("args", "expected"),
+    [
+        (
+            {b"job": [b"j1", b"j2", b"j3", b"j4"]},
+            [
+                {
+                    "id": "j1",
+                    "currstate": "finished",
+                    "project": "p1",
+                    "spider": "s1",
+                    "start_time": "2001-02-03 04:05:06.000007",
+                    "end_time": "2001-02-03 04:05:06.000008",
+                },
+                {
+                    "id": "j2",
+                    "currstate": "running",
+                    "project": "p2",
+                    "spider": "s2",
+                    "pid": 12345,
+                    "start_time": "2001-02-03 04:05:06.000009",
+                },
+                {"id": "j3", "currstate": "pending", "project": "p1", "spider": "s1"},
+                {"id": "j4", "currstate": None},
+            ],
+        ),
+        (
+            {b"job": [b"j2", b"j3"], b"project": [b"p1"]},
+            [
+                {"id": "j2", "currstate": None},
+                {"id": "j3", "currstate": "pending", "project": "p1", "spider": "s1"},
+            ],
+        ),
+    ],
+)
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_bulk_status(txrequest, root_with_jobs, args, expected, method):
+    assert_content(txrequest, root_with_jobs, method, "bulkstatus", args, {"jobs": expected})
+
+
+def test_bulk_status_json(txrequest, root_with_jobs):
+    txrequest.requestHeaders.setRawHeaders(b"Content-Type", [b"application/json"])
+    txrequest.content = io.BytesIO(b'{"jobs": ["j3", "j4"], "project": "p1"}')
+
+    expected = [{"id": "j3", "currstate": "pending", "project": "p1", "spider": "s1"}, {"id": "j4", "currstate": None}]
+    assert_content(txrequest, root_with_jobs, "POST", "bulkstatus", {}, {"jobs": expected})
+
+
+@pytest.mark.parametrize(
+    ("body", "message"),
+    [
+        (b"{", b"JSON body is invalid: Expecting property name enclosed in double quotes: line 1 column 2 (char 1)"),
+        (b'["j1"]', b"JSON body must be an object with 'jobs' (a list) and optional 'project'"),
+        (b'{"jobs": "j1"}', b"JSON body must be an object with 'jobs' (a list) and optional 'project'"),
+        (
+            b'{"jobs": ["j1"], "project": 1}',
+            b"JSON body must be an object with 'jobs' (a list) and optional 'project'",
+        ),
+    ],
+)
+def test_bulk_status_json_invalid(txrequest, root, body, message):
+    txrequest.requestHeaders.setRawHeaders(b"Content-Type", [b"application/json"])
+    txrequest.content = io.BytesIO(body)
+
+    assert_error(txrequest, root, "POST", "bulkstatus", {}, message)
+
+
+def test_bulk_status_nonexistent(txrequest, root):
+    args = {b"job": [b"aaa"], b"project": [b"nonexistent"]}
+    assert_error(txrequest, root, "GET", "bulkstatus", args, b"project 'nonexistent' not found")
+
+
+def get_events(request):
+    return [
+        (event_id, event, json.loads(data))
+        for event_id, event, data in re.findall(rb"id: (\d+)\nevent: (\w+)\ndata: (.+)\n\n", b"".join(request.written))
+    ]
+
+
+def test_events(root):
+    resource = root.children[b"events"]
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    request = DummyRequest([b""])
+    filtered = DummyRequest([b""])
+    filtered.args = {b"spider": [b"s2"]}
+
+    assert resource.render(request) is server.NOT_DONE_YET
+    assert resource.render(filtered) is server.NOT_DONE_YET
+    assert request.responseHeaders.getRawHeaders(b"Content-Type") == [b"text/event-stream"]
+    assert request.written == [b": ok\n\n"]
+
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.scheduler.schedule("p1", "s2", _job="j2")
+    resource._keepalive()  # noqa: SLF001
+
+    assert [(event_id, event) for event_id, event, _ in get_events(request)] == [
+        (b"1", b"scheduled"),
+        (b"2", b"scheduled"),
+    ]
+    assert [(event_id, event) for event_id, event, _ in get_events(filtered)] == [(b"2", b"scheduled")]
+    assert get_events(request)[0][2]["job"] == "j1"
+    assert request.written[-1] == b": keepalive\n\n"
+    assert resource.keepalive.running
+
+    request.finish()
+    filtered.finish()
+    root.scheduler.schedule("p1", "s1", _job="j3")
+
+    assert len(get_events(request)) == 2
+    assert not resource.subscribers
+    assert not resource.keepalive.running
+
+
+@pytest.mark.parametrize(
+    ("args", "headers", "expected"),
+    [
+        ({}, {}, []),
+        ({b"last_event_id": [b"0"]}, {}, [b"1", b"2", b"3"]),
+        ({b"last_event_id": [b"2"]}, {}, [b"3"]),
+        ({b"last_event_id": [b"3"]}, {}, []),
+        ({}, {b"Last-Event-ID": [b"1"]}, [b"2", b"3"]),
+        ({b"last_event_id": [b"2"]}, {b"Last-Event-ID": [b"1"]}, [b"3"]),
+    ],
+)
+def test_events_replay(root, args, headers, expected):
+    resource = root.children[b"events"]
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    for job in ("j1", "j2", "j3"):
+        root.scheduler.schedule("p1", "s1", _job=job)
+
+    request = DummyRequest([b""])
+    request.args = args.copy()
+    for name, value in headers.items():
+        request.requestHeaders.setRawHeaders(name, value)
+    resource.render(request)
+    request.finish()
+
+    assert [event_id for event_id, _, _ in get_events(request)] == expected
+
+
+def test_events_replay_evicted(root):
+    resource = root.children[b"events"]
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    resource.events = deque(maxlen=2)
+    for job in ("j1", "j2", "j3"):
+        root.scheduler.schedule("p1", "s1", _job=job)
+
+    request = DummyRequest([b""])
+    request.args = {b"last_event_id": [b"0"]}
+    resource.render(request)
+    request.finish()
+
+    assert [event_id for event_id, _, _ in get_events(request)] == [b"2", b"3"]
+
+
+def test_events_invalid(txrequest, root):
+    txrequest.requestHeaders.setRawHeaders(b"Last-Event-ID", [b"x"])
+    txrequest.args = {}
+    with pytest.raises(error.Error) as exc:
+        root.children[b"events"].render_GET(txrequest)
+
+    assert exc.value.status == b"200"
+    assert exc.value.message == b"Last-Event-ID is invalid: invalid literal for int() with base 10: 'x'"
+
+
+def test_events_cancel(root):
+    resource = root.children[b"events"]
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.scheduler.schedule("p1", "s1", _job="j1")
+
+    request = DummyRequest([b""])
+    resource.render(request)
+    txrequest = DummyRequest([b""])
+    txrequest.method = b"POST"
+    txrequest.args = {b"project": [b"p1"], b"job": [b"j1"]}
+    root.children[b"cancel.json"].render(txrequest)
+    request.finish()
+
+    [(_, event, data)] = get_events(request)
+    assert event == b"cancelled"
+    assert data["prevstate"] == "pending"
+
+
+def test_metrics(txrequest, root):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.jobindex.start(ScrapyProcessProtocol("p1", "s2", "j2", env={}, args=[]), 0)
+    assert_content(
+        txrequest,
+        root,
+        "GET",
+        "daemonstatus",
+        {},
+        {"running": 0, "pending": 1, "finished": 0, "slots": 0, "max_proc": root.launcher.max_proc},
+    )
+
+    content = root.children[b"metrics"].render_GET(txrequest).decode()
+
+    assert txrequest.responseHeaders.getRawHeaders(b"Content-Type") == [b"text/plain; version=0.0.4; charset=utf-8"]
+    assert "# TYPE scrapyd_jobs_pending gauge\n" in content
+    assert '\nscrapyd_jobs_pending{project="p1"} 1.0\n' in content
+    assert '# TYPE scrapyd_jobs_running gauge\nscrapyd_jobs_running{project="p1",spider="s2"} 1.0\n' in content
+    assert re.search(
+        r'^scrapyd_api_request_seconds_count\{endpoint="daemonstatus\.json"\} [1-9]', content, re.MULTILINE
+    )
+    assert "# TYPE scrapyd_sqlite_seconds histogram\n" in content
+
+
 @pytest.mark.parametrize("args", [{}, {b"project": [b"p1"]}])
 @pytest.mark.parametrize("exists", [True, False])
 def test_list_jobs(txrequest, root, scrapy_process, args, exists, chdir):
@@ -344,7 +662,9 @@ def test_list_jobs(txrequest, root, scrapy_process, args, exists, chdir):
     expected = {"pending": [], "running": [], "finished": []}
     assert_content(txrequest, root, "GET", "listjobs", args, expected)
 
+    # Like the launcher, record state transitions in the job index.
     root.launcher.finished.add(job1)
+    root.jobindex.finish(job1)
 
     expected["finished"].append(
         {
@@ -354,12 +674,22 @@ def test_list_jobs(txrequest, root, scrapy_process, args, exists, chdir):
             "start_time": "2001-02-03 04:05:06.000007",
             "end_time": "2001-02-03 04:05:06.000008",
             "log_url": "/logs/p1/s1/j1.log" if exists else None,
+            "output_url": None,
             "items_url": "/items/p1/s1/j1.jl" if exists and root.local_items else None,
+            "usage": None,
+            "termination": None,
+            "stats": None,
+            "attempt": 1,
+            "retry_of": None,
+            "retried_as": None,
         },
     )
     assert_content(txrequest, root, "GET", "listjobs", args, expected)
 
+    scrapy_process.usage = {"cpu_user": 1.5, "cpu_system": 0.5, "rss": 1024}
+    scrapy_process.heartbeat = {"requests": 3, "responses": 2, "items": 1}
     root.launcher.processes[0] = scrapy_process
+    root.jobindex.start(scrapy_process, 0)
 
     expected["running"].append(
         {
@@ -369,7 +699,14 @@ def test_list_jobs(txrequest, root, scrapy_process, args, exists, chdir):
             "pid": None,
             "start_time": "2001-02-03 04:05:06.000009",
             "log_url": "/logs/p1/s1/j1.log" if exists else None,
+            "output_url": None,
             "items_url": "/items/p1/s1/j1.jl" if exists and root.local_items else None,
+            "usage": {"cpu_user": 1.5, "cpu_system": 0.5, "rss": 1024},
+            "heartbeat": {"requests": 3, "responses": 2, "items": 1},
+            "stalled": False,
+            "stats": None,
+            "attempt": 1,
+            "retry_of": None,
         }
     )
     assert_content(txrequest, root, "GET", "listjobs", args, expected)
@@ -381,7 +718,13 @@ def test_list_jobs(txrequest, root, scrapy_process, args, exists, chdir):
         _version="0.1",
         settings={"DOWNLOAD_DELAY=2": "TRACK=Cause = Time"},
         arg1="val1",
+        _not_before=datetime.datetime(2001, 2, 3, 4, 5, 6, 10),
+        _expires_at=datetime.datetime(2001, 2, 3, 5, 5, 6, 10),
+        _retry={"max_attempts": 3},
+        _attempt=2,
+        _retry_of="j0",
     )
+    root.jobindex.schedule("p1", "s1", "j1")
 
     expected["pending"].append(
         {
@@ -391,6 +734,10 @@ def test_list_jobs(txrequest, root, scrapy_process, args, exists, chdir):
             "version": "0.1",
             "settings": {"DOWNLOAD_DELAY=2": "TRACK=Cause = Time"},
             "args": {"arg1": "val1"},
+            "not_before": "2001-02-03 04:05:06.000010",
+            "expires_at": "2001-02-03 05:05:06.000010",
+            "attempt": 2,
+            "retry_of": "j0",
         },
     )
     assert_content(txrequest, root, "GET", "listjobs", args, expected)
@@ -646,9 +993,339 @@ def test_schedule_parameters(txrequest, root_with_egg):
             "TRACK": "Cause = Time",
         },
         "arg1": "val1",  # users are encouraged in api.rst to open an issue if they want multiple values
+        "_priority": 5.0,
     }
 
 
+def test_schedule_limits(txrequest, root_with_egg):
+    txrequest.args = {
+        b"project": [b"mybot"],
+        b"spider": [b"spider1"],
+        b"_memory_limit": [b"1024"],
+        b"_cpu_limit": [b"0"],
+        b"memory_limit": [b"1"],  # a spider argument
+    }
+    txrequest.method = "POST"
+    root_with_egg.children[b"schedule.json"].render(txrequest)
+
+    message = root_with_egg.poller.queues["mybot"].list()[0]
+
+    assert message["_limits"] == {"memory_limit": 1024, "cpu_limit": 0}
+    assert message["memory_limit"] == "1"
+
+    txrequest.args = {}
+    txrequest.method = "GET"
+    content = root_with_egg.children[b"listjobs.json"].render(txrequest)
+
+    assert json.loads(content)["pending"][0]["args"] == {"memory_limit": "1"}
+
+
+def test_schedule_limits_invalid(txrequest, root_with_egg):
+    txrequest.args = {b"project": [b"mybot"], b"spider": [b"spider1"], b"_files_limit": [b"-1"]}
+    txrequest.method = "POST"
+    content = root_with_egg.children[b"schedule.json"].render(txrequest)
+    data = json.loads(content)
+
+    assert data["status"] == "error"
+    assert data["message"] == "_files_limit must be 0 or more"
+
+
+def test_schedule_retry(txrequest, root_with_egg):
+    txrequest.args = {
+        b"project": [b"mybot"],
+        b"spider": [b"spider1"],
+        b"_max_attempts": [b"3"],
+        b"_retry_signals": [b"KILL"],
+        b"_retry_delay": [b"5"],
+        b"retry_delay": [b"1"],  # a spider argument
+    }
+    txrequest.method = "POST"
+    root_with_egg.children[b"schedule.json"].render(txrequest)
+
+    message = root_with_egg.poller.queues["mybot"].list()[0]
+
+    assert message["_retry"] == {"max_attempts": 3, "retry_signals": "KILL", "retry_delay": 5.0}
+
+    txrequest.args = {}
+    txrequest.method = "GET"
+    content = root_with_egg.children[b"listjobs.json"].render(txrequest)
+    pending = json.loads(content)["pending"][0]
+
+    assert pending["args"] == {"retry_delay": "1"}
+    assert pending["attempt"] == 1
+    assert pending["retry_of"] is None
+
+
+@pytest.mark.parametrize(
+    ("args", "message"),
+    [
+        ({b"_max_attempts": [b"0"]}, b"_max_attempts must be 1 or more"),
+        ({b"_retry_delay": [b"-1"]}, b"_retry_delay must be 0 or more"),
+        ({b"_retry_signals": [b"NOPE"]}, b"unknown signal 'NOPE'"),
+    ],
+)
+def test_schedule_retry_invalid(txrequest, root_with_egg, args, message):
+    assert_error(
+        txrequest,
+        root_with_egg,
+        "POST",
+        "schedule",
+        {b"project": [b"mybot"], b"spider": [b"spider1"], **args},
+        message,
+    )
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (b"3600", lambda now: now + datetime.timedelta(hours=1)),
+        (b"2001-02-03T04:05:06", lambda now: datetime.datetime(2001, 2, 3, 4, 5, 6)),
+        (
+            b"2001-02-03T04:05:06+00:00",
+            lambda now: datetime.datetime(2001, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc)
+            .astimezone()
+            .replace(tzinfo=None),
+        ),
+    ],
+)
+def test_schedule_not_before(txrequest, root_with_egg, value, expected):
+    txrequest.args = {b"project": [b"mybot"], b"spider": [b"spider1"], b"_not_before": [value], b"not_before": [b"x"]}
+    txrequest.method = "POST"
+    now = datetime.datetime.now()
+    root_with_egg.children[b"schedule.json"].render(txrequest)
+
+    queue = root_with_egg.poller.queues["mybot"]
+    message = queue.list()[0]
+
+    assert abs((message["_not_before"] - expected(now)).total_seconds()) < 1
+    assert message["not_before"] == "x"  # a spider argument
+    # Only the job that is delayed by an hour isn't due yet.
+    assert (queue.pop() is None) == (value == b"3600")
+
+
+def test_schedule_not_before_invalid(txrequest, root_with_egg):
+    args = {b"project": [b"mybot"], b"spider": [b"spider1"], b"_not_before": [b"tomorrow"]}
+    message = b"_not_before is invalid: Invalid isoformat string: 'tomorrow'"
+    assert_error(txrequest, root_with_egg, "POST", "schedule", args, message)
+
+
+@pytest.mark.parametrize(
+    ("settings", "limit", "message"),
+    [
+        ({"max_pending_per_project": 2}, "project", "project 'mybot' has too many pending jobs (2)"),
+        (
+            {"project_max_pending": 2, "max_pending_per_project": 1},
+            "project",
+            "project 'mybot' has too many pending jobs (2)",
+        ),
+        ({"max_pending": 2}, "node", "node has too many pending jobs (2)"),
+    ],
+)
+def test_schedule_max_pending(txrequest, root_with_egg, settings, limit, message):
+    def schedule():
+        txrequest.args = {b"project": [b"mybot"], b"spider": [b"spider1"]}
+        return json.loads(root_with_egg.children[b"schedule.json"].render(txrequest))
+
+    root_with_egg.max_pending = settings.get("max_pending", 0)
+    root_with_egg.max_pending_per_project = settings.get("max_pending_per_project", 0)
+    if "project_max_pending" in settings:
+        root_with_egg.config.cp.add_section("limits.mybot")
+        root_with_egg.config.cp.set("limits.mybot", "max_pending", str(settings["project_max_pending"]))
+    txrequest.method = "POST"
+    before = JOBS_REJECTED.values[("mybot", limit)]
+
+    assert schedule()["status"] == "ok"
+    assert schedule()["status"] == "ok"
+
+    data = schedule()
+    data.pop("node_name")
+
+    assert data == {"status": "error", "message": message, "retry_after": 5}
+    assert txrequest.code == 503
+    assert txrequest.responseHeaders.getRawHeaders(b"Retry-After") == [b"5"]
+    assert JOBS_REJECTED.values[("mybot", limit)] == before + 1
+    assert root_with_egg.poller.queues["mybot"].count() == 2
+
+
+def test_schedule_max_pending_dedupe(txrequest, root_with_egg):
+    def schedule(args):
+        txrequest.args = {b"project": [b"mybot"], b"spider": [b"spider1"], **args}
+        return json.loads(root_with_egg.children[b"schedule.json"].render(txrequest))
+
+    root_with_egg.max_pending_per_project = 1
+    txrequest.method = "POST"
+
+    jobid = schedule({b"_dedupe_key": [b"k1"]})["jobid"]
+
+    # A duplicate doesn't add a pending job, so it isn't rejected.
+    data = schedule({b"_dedupe_key": [b"k1"]})
+
+    assert data["status"] == "ok"
+    assert data["jobid"] == jobid
+    assert data["deduplicated"] is True
+    assert schedule({b"_dedupe_key": [b"k2"]})["status"] == "error"
+    assert root_with_egg.poller.queues["mybot"].count() == 1
+
+
+@pytest.mark.parametrize(
+    ("args", "expected"),
+    [
+        ({b"_ttl": [b"3600"]}, lambda now: now + datetime.timedelta(hours=1)),
+        ({b"_expires_at": [b"60"]}, lambda now: now + datetime.timedelta(minutes=1)),
+        ({b"_expires_at": [b"2001-02-03T04:05:06"]}, lambda now: datetime.datetime(2001, 2, 3, 4, 5, 6)),
+        # A spider argument.
+        ({b"_ttl": [b"3600"], b"ttl": [b"x"]}, lambda now: now + datetime.timedelta(hours=1)),
+    ],
+)
+def test_schedule_expires_at(txrequest, root_with_egg, args, expected):
+    txrequest.args = {b"project": [b"mybot"], b"spider": [b"spider1"], **args}
+    txrequest.method = "POST"
+    now = datetime.datetime.now()
+    root_with_egg.children[b"schedule.json"].render(txrequest)
+
+    queue = root_with_egg.poller.queues["mybot"]
+    message = queue.list()[0]
+
+    assert abs((message["_expires_at"] - expected(now)).total_seconds()) < 1
+    assert message.get("ttl") == ("x" if b"ttl" in args else None)
+    # Only the job that expired in 2001 isn't popped.
+    assert (queue.pop() is None) == (b"_expires_at" in args and args[b"_expires_at"] != [b"60"])
+
+
+@pytest.mark.parametrize(
+    ("args", "message"),
+    [
+        (
+            {b"_expires_at": [b"60"], b"_ttl": [b"60"]},
+            b"'_expires_at' and '_ttl' parameters are mutually exclusive",
+        ),
+        ({b"_ttl": [b"0"]}, b"_ttl must be more than 0"),
+        ({b"_ttl": [b"soon"]}, b"_ttl is invalid: could not convert string to float: b'soon'"),
+    ],
+)
+def test_schedule_expires_at_invalid(txrequest, root_with_egg, args, message):
+    args = {b"project": [b"mybot"], b"spider": [b"spider1"], **args}
+    assert_error(txrequest, root_with_egg, "POST", "schedule", args, message)
+
+
+@pytest.mark.parametrize(
+    ("args", "duplicate"),
+    [
+        ({b"_dedupe_key": [b"k1"]}, {b"_dedupe_key": [b"k1"], b"arg1": [b"val2"]}),
+        ({b"_dedupe": [b"true"], b"arg1": [b"val1"]}, {b"_dedupe": [b"true"], b"arg1": [b"val1"]}),
+        # A spider argument.
+        ({b"_dedupe": [b"true"], b"dedupe_key": [b"k1"]}, {b"_dedupe": [b"true"], b"dedupe_key": [b"k1"]}),
+    ],
+)
+def test_schedule_dedupe(txrequest, root_with_egg, args, duplicate):
+    def schedule(args, jobid):
+        txrequest.args = {b"project": [b"mybot"], b"spider": [b"spider1"], b"jobid": [jobid], **args}
+        data = json.loads(root_with_egg.children[b"schedule.json"].render(txrequest))
+        data.pop("node_name")
+        return data
+
+    txrequest.method = "POST"
+    queue = root_with_egg.poller.queues["mybot"]
+
+    assert schedule(args, b"j1") == {"status": "ok", "jobid": "j1", "deduplicated": False}
+    assert schedule({**duplicate, b"priority": [b"5"]}, b"j2") == {"status": "ok", "jobid": "j1", "deduplicated": True}
+    assert [message["_job"] for message in queue.list()] == ["j1"]
+    assert next(iter(queue.q))[1] == 5.0
+    assert root_with_egg.jobindex.state("j2", "mybot") is None
+
+    # Different arguments have a different hash.
+    assert schedule({b"_dedupe": [b"true"], b"arg1": [b"val3"]}, b"j3")["deduplicated"] is False
+
+
+def test_schedules(txrequest, root_with_egg):
+    txrequest.args = {
+        b"project": [b"mybot"],
+        b"name": [b"daily"],
+        b"spider": [b"spider1"],
+        b"cron": [b"@daily"],
+        b"jitter": [b"60"],
+        b"setting": [b"DOWNLOAD_DELAY=2"],
+        b"arg1": [b"val1"],
+    }
+    txrequest.method = "POST"
+    data = json.loads(root_with_egg.children[b"addschedule.json"].render(txrequest))
+    next_time = datetime.datetime.strptime(data.pop("next_time"), "%Y-%m-%d %H:%M:%S.%f")
+
+    assert data.pop("node_name")
+    assert data == {"status": "ok", "name": "daily"}
+    assert next_time.time() <= datetime.time(0, 1)
+
+    txrequest.args = {b"project": [b"mybot"], b"name": [b"often"], b"spider": [b"spider2"], b"interval": [b"60"]}
+    root_with_egg.children[b"addschedule.json"].render(txrequest)
+
+    txrequest.args = {b"project": [b"mybot"]}
+    txrequest.method = "GET"
+    data = json.loads(root_with_egg.children[b"listschedules.json"].render(txrequest))
+    schedules = data.pop("schedules")
+    for schedule in schedules:
+        assert schedule.pop("next_time")
+
+    assert schedules == [
+        {
+            "project": "mybot",
+            "name": "daily",
+            "spider": "spider1",
+            "cron": "@daily",
+            "interval": None,
+            "jitter": 60.0,
+            "skip_if_running": False,
+            "skip_if_pending": True,
+            "priority": 0,
+            "settings": {"DOWNLOAD_DELAY": "2"},
+            "args": {"arg1": "val1"},
+            "last_job": None,
+        },
+        {
+            "project": "mybot",
+            "name": "often",
+            "spider": "spider2",
+            "cron": None,
+            "interval": 60.0,
+            "jitter": 0.0,
+            "skip_if_running": False,
+            "skip_if_pending": True,
+            "priority": 0,
+            "settings": {},
+            "args": {},
+            "last_job": None,
+        },
+    ]
+
+    txrequest.args = {b"project": [b"mybot"], b"name": [b"daily"]}
+    txrequest.method = "POST"
+    data = json.loads(root_with_egg.children[b"delschedule.json"].render(txrequest))
+
+    assert data.pop("node_name")
+    assert data == {"status": "ok"}
+    assert [schedule.name for schedule in root_with_egg.periodic.list()] == ["often"]
+
+
+@pytest.mark.parametrize(
+    ("args", "message"),
+    [
+        ({}, b"either 'cron' or 'interval' parameter is required"),
+        ({b"cron": [b"@daily"], b"interval": [b"60"]}, b"either 'cron' or 'interval' parameter is required"),
+        ({b"interval": [b"0"]}, b"interval must be more than 0"),
+        ({b"interval": [b"60"], b"jitter": [b"-1"]}, b"jitter must be 0 or more"),
+        ({b"cron": [b"60 * * * *"]}, b"cron is invalid: '60' is out of range"),
+        ({b"interval": [b"60"], b"spider": [b"nonexistent"]}, b"spider 'nonexistent' not found"),
+    ],
+)
+def test_addschedule_invalid(txrequest, root_with_egg, args, message):
+    args = {b"project": [b"mybot"], b"name": [b"n1"], b"spider": [b"spider1"], **args}
+    assert_error(txrequest, root_with_egg, "POST", "addschedule", args, message)
+
+
+def test_delschedule_nonexistent(txrequest, root_with_egg):
+    args = {b"project": [b"mybot"], b"name": [b"nonexistent"]}
+    assert_error(txrequest, root_with_egg, "POST", "delschedule", args, b"schedule 'nonexistent' not found")
+
+
 # Like test_list_spiders_nonexistent.
 @pytest.mark.parametrize(
     ("args", "param", "run_only_if_has_settings"),
@@ -683,23 +1360,276 @@ def test_cancel(txrequest, root, scrapy_process, args):
     expected = {"prevstate": None}
     assert_content(txrequest, root, "POST", "cancel", args, expected)
 
-    root.poller.queues["p1"].add("s1", _job="j1")
-    root.poller.queues["p1"].add("s1", _job="j1")
-    root.poller.queues["p1"].add("s1", _job="j2")
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.scheduler.schedule("p1", "s1", _job="j2")
 
     assert root.poller.queues["p1"].count() == 3
     expected["prevstate"] = "pending"
     assert_content(txrequest, root, "POST", "cancel", args, expected)
     assert root.poller.queues["p1"].count() == 1
+    assert root.jobindex.state("j1", "p1") is None
 
-    root.launcher.processes[0] = scrapy_process
-    root.launcher.processes[1] = scrapy_process
-    root.launcher.processes[2] = ScrapyProcessProtocol("p2", "s2", "j2", env={}, args=[])
+    process = ScrapyProcessProtocol("p2", "s2", "j2", env={}, args=[])
+    for slot, running in enumerate([scrapy_process, scrapy_process, process]):
+        root.launcher.processes[slot] = running
+        root.jobindex.start(running, slot)
 
     expected["prevstate"] = "running"
     assert_content(txrequest, root, "POST", "cancel", args, expected)
     assert scrapy_process.transport.signalProcess.call_count == 2
     scrapy_process.transport.signalProcess.assert_has_calls([call(expected_signal), call(expected_signal)])
+    assert root.jobindex.state("j1", "p1") == "running"
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_cancel_unindexed(txrequest, root, legacy):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    queue = root.poller.queues["p1"]
+    # Another process that shares the dbs_dir queued the job.
+    queue.add("s1", _job="j1")
+    queue.add("s1", _job="j2")
+    if legacy:
+        root.poller.queues["p1"] = Legacy(queue, "remove_matching")
+
+    with patch.object(queue, "remove", wraps=queue.remove) as remove:
+        assert_content(
+            txrequest, root, "POST", "cancel", {b"project": [b"p1"], b"job": [b"j1"]}, {"prevstate": "pending"}
+        )
+
+    assert remove.called is legacy
+    assert [message["_job"] for message in queue.list()] == ["j2"]
+
+
+def test_cancel_escalate(txrequest, root, scrapy_process):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.launcher.processes[0] = scrapy_process
+    root.jobindex.start(scrapy_process, 0)
+
+    args = {b"project": [b"p1"], b"job": [b"j1"], b"escalate": [b"1"]}
+    assert_content(txrequest, root, "POST", "cancel", args, {"prevstate": "running"})
+
+    scrapy_process.transport.signalProcess.assert_called_once()
+    assert scrapy_process.signal_call.active()
+    assert scrapy_process.termination == "cancelled"
+
+    scrapy_process.signal_call.cancel()
+
+
+def test_cancel_escalate_invalid(txrequest, root):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+
+    args = {b"project": [b"p1"], b"job": [b"j1"], b"escalate": [b"yes"]}
+    assert_error(txrequest, root, "POST", "cancel", args, b"escalate is invalid: 'yes' is not 1, 0, true or false")
+
+
+@pytest.mark.parametrize("exits", [True, False])
+@defer.inlineCallbacks
+def test_cancel_wait(root, scrapy_process, exits):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.launcher.processes[0] = scrapy_process
+    root.jobindex.start(scrapy_process, 0)
+    scrapy_process.deferred.addBoth(root.launcher._process_finished, 0)  # noqa: SLF001
+    if exits:
+        scrapy_process.transport.signalProcess.side_effect = lambda signal: reactor.callLater(
+            0, scrapy_process.deferred.callback, scrapy_process
+        )
+
+    request = DummyRequest([])
+    request.method = b"POST"
+    request.args = {b"project": [b"p1"], b"job": [b"j1"], b"wait": [b"0.1"]}
+    content = root.children[b"cancel.json"].render(request)
+
+    assert content == server.NOT_DONE_YET
+
+    yield request.notifyFinish()
+    data = json.loads(b"".join(request.written))
+
+    assert data.pop("node_name")
+    assert data == {"status": "ok", "prevstate": "running", "exited": exits}
+    if exits:
+        assert root.jobindex.state("j1", "p1") == "finished"
+
+
+def test_cancel_wait_error(root, scrapy_process):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.launcher.processes[0] = scrapy_process
+    root.jobindex.start(scrapy_process, 0)
+    root.launcher.stop = MagicMock()
+    root.launcher.wait = MagicMock(return_value=defer.fail(RuntimeError("boom")))
+
+    request = DummyRequest([])
+    request.method = b"POST"
+    request.args = {b"project": [b"p1"], b"job": [b"j1"], b"wait": [b"0.1"]}
+
+    with capturedLogs() as captured:
+        content = root.children[b"cancel.json"].render(request)
+    data = json.loads(b"".join(request.written))
+
+    assert content == server.NOT_DONE_YET
+    assert request.finished
+    assert data.pop("node_name")
+    assert data == {"status": "error", "message": "RuntimeError: boom"}
+    assert any(event.get("log_failure") and event["log_failure"].check(RuntimeError) for event in captured)
+
+
+def test_cancel_wait_pending(root):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.scheduler.schedule("p1", "s1", _job="j1")
+
+    request = DummyRequest([])
+    request.method = b"POST"
+    request.args = {b"project": [b"p1"], b"job": [b"j1"], b"wait": [b"10"]}
+    root.children[b"cancel.json"].render(request)
+    data = json.loads(b"".join(request.written))
+
+    assert request.finished
+    assert data.pop("node_name")
+    assert data == {"status": "ok", "prevstate": "pending", "exited": True}
+
+
+@pytest.mark.parametrize(
+    ("args", "pending", "running"),
+    [
+        ({}, ["j1", "j2", "j3", "j4"], ["j5", "j6"]),
+        ({b"spider": [b"s1"]}, ["j1", "j2"], ["j5"]),
+        ({b"_version": [b"r1"]}, ["j2"], ["j6"]),
+        ({b"job": [b"j2", b"j3", b"j6", b"j7"]}, ["j2", "j3"], ["j6"]),
+        ({b"min_priority": [b"1"], b"max_priority": [b"2"]}, ["j2", "j3"], []),
+        ({b"spider": [b"s2"], b"_version": [b"r1"]}, [], ["j6"]),
+    ],
+)
+def test_bulk_cancel(txrequest, root, args, pending, running):
+    root_add_version(root, "p1", "r1", "mybot")
+    root_add_version(root, "p2", "r2", "mybot2")
+    root.update_projects()
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.scheduler.schedule("p1", "s1", priority=1, _job="j2", _version="r1")
+    root.scheduler.schedule("p1", "s2", priority=2, _job="j3")
+    root.scheduler.schedule("p1", "s2", priority=3, _job="j4")
+    root.scheduler.schedule("p2", "s1", _job="j7")
+    for slot, (project, spider, job, version) in enumerate(
+        [("p1", "s1", "j5", None), ("p1", "s2", "j6", "r1"), ("p2", "s1", "j7", None)]
+    ):
+        process = ScrapyProcessProtocol(project, spider, job, env={}, args=[])
+        process.message = {"_version": version} if version else {}
+        process.transport = MagicMock()
+        root.launcher.processes[slot] = process
+        root.jobindex.start(process, slot)
+
+    expected = {"pending": len(pending), "running": len(running), "jobs": {"pending": pending, "running": running}}
+    assert_content(txrequest, root, "POST", "bulkcancel", {b"project": [b"p1"], **args}, expected)
+
+    assert sorted(message["_job"] for message in root.poller.queues["p1"].list()) == sorted(
+        {"j1", "j2", "j3", "j4"} - set(pending)
+    )
+    assert root.poller.queues["p2"].count() == 1
+    assert root.jobindex.pending["p1"] == 4 - len(pending)
+    for process in root.launcher.processes.values():
+        if process.job in running:
+            process.transport.signalProcess.assert_called_once()
+            assert process.termination == "cancelled"
+        else:
+            process.transport.signalProcess.assert_not_called()
+            assert process.termination is None
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_summary(txrequest, root, legacy):
+    root_add_version(root, "p1", "r1", "mybot")
+    root_add_version(root, "p2", "r2", "mybot2")
+    root.update_projects()
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.scheduler.schedule("p1", "s1", _job="j2")
+    root.scheduler.schedule("p1", "s2", _job="j3")
+    root.jobindex.start(ScrapyProcessProtocol("p1", "s2", "j4", env={}, args=[]), 0)
+    root.jobindex.start(ScrapyProcessProtocol("p2", "s1", "j5", env={}, args=[]), 1)
+    now = datetime.datetime.now()
+    root.launcher.finished.add(get_finished_job("p1", "s1", "j6", end_time=now))
+    root.launcher.finished.add(get_finished_job("p1", "s1", "j7", end_time=now - datetime.timedelta(hours=2)))
+    # Deleted projects are omitted.
+    root.launcher.finished.add(get_finished_job("p3", "s1", "j8", end_time=now))
+    if legacy:
+        for project, queue in root.poller.queues.items():
+            root.poller.queues[project] = Legacy(queue, "count_by_spider")
+        root.launcher.finished = Legacy(root.launcher.finished, "count_by_spider")
+
+    p1 = {
+        "pending": 3,
+        "running": 1,
+        "finished": 1,
+        "spiders": {
+            "s1": {"pending": 2, "running": 0, "finished": 1},
+            "s2": {"pending": 1, "running": 1, "finished": 0},
+        },
+    }
+    p2 = {"pending": 0, "running": 1, "finished": 0, "spiders": {"s1": {"pending": 0, "running": 1, "finished": 0}}}
+    local = {"pending": 0, "running": 0, "finished": 0, "spiders": {}}
+    projects = {"p1": p1, "p2": p2} | dict.fromkeys(get_local_projects(root), local)
+
+    expected = {"pending": 3, "running": 2, "finished": 1, "projects": projects}
+    assert_content(txrequest, root, "GET", "summary", {}, expected)
+
+    p1["finished"] = p1["spiders"]["s1"]["finished"] = 2
+    expected = {"pending": 3, "running": 1, "finished": 2, "projects": {"p1": p1}}
+    assert_content(txrequest, root, "GET", "summary", {b"project": [b"p1"], b"window": [b"86400"]}, expected)
+
+
+@pytest.mark.parametrize(
+    ("args", "message"),
+    [
+        ({b"project": [b"nonexistent"]}, b"project 'nonexistent' not found"),
+        ({b"window": [b"0"]}, b"window must be more than 0"),
+    ],
+)
+def test_summary_invalid(txrequest, root, args, message):
+    assert_error(txrequest, root, "GET", "summary", args, message)
+
+
+@pytest.mark.parametrize(
+    ("args", "pending"),
+    [
+        ({}, ["j1", "j2", "j3"]),
+        ({b"spider": [b"s1"]}, ["j1", "j2"]),
+        ({b"_version": [b"r1"]}, ["j2"]),
+        ({b"job": [b"j2", b"j3"]}, ["j2", "j3"]),
+    ],
+)
+def test_bulk_cancel_legacy(txrequest, root, args, pending):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.scheduler.schedule("p1", "s1", _job="j1")
+    root.scheduler.schedule("p1", "s1", priority=1, _job="j2", _version="r1")
+    root.scheduler.schedule("p1", "s2", priority=2, _job="j3")
+    root.poller.queues["p1"] = Legacy(root.poller.queues["p1"], "remove_matching")
+
+    expected = {"pending": len(pending), "running": 0, "jobs": {"pending": pending, "running": []}}
+    assert_content(txrequest, root, "POST", "bulkcancel", {b"project": [b"p1"], **args}, expected)
+
+    assert sorted(message["_job"] for message in root.poller.queues["p1"].list()) == sorted(
+        {"j1", "j2", "j3"} - set(pending)
+    )
+
+
+def test_bulk_cancel_legacy_priority(txrequest, root):
+    root_add_version(root, "p1", "r1", "mybot")
+    root.update_projects()
+    root.poller.queues["p1"] = Legacy(root.poller.queues["p1"], "remove_matching")
+
+    args = {b"project": [b"p1"], b"min_priority": [b"1"]}
+    message = b"min_priority and max_priority are unsupported by the spider queue"
+    assert_error(txrequest, root, "POST", "bulkcancel", args, message)
+
+
+def test_bulk_cancel_nonexistent(txrequest, root):
+    args = {b"project": [b"nonexistent"]}
+    assert_error(txrequest, root, "POST", "bulkcancel", args, b"project 'nonexistent' not found")
 
 
 def test_cancel_nonexistent(txrequest, root):
@@ -715,6 +1645,7 @@ def test_cancel_nonexistent(txrequest, root):
     [
         ("POST", "cancel", {b"project": [b"../p"], b"job": [b"aaa"]}),
         ("GET", "status", {b"project": [b"../p"], b"job": [b"aaa"]}),
+        ("GET", "bulkstatus", {b"project": [b"../p"], b"job": [b"aaa"]}),
         ("GET", "listspiders", {b"project": [b"../p"]}),
         ("GET", "listjobs", {b"project": [b"../p"]}),
     ],
@@ -745,3 +1676,225 @@ def test_project_directory_traversal(txrequest, root, method, basename, attach_e
 
     eggstorage = root.app.getComponent(IEggStorage)
     assert eggstorage.get("mybot") == (None, None)
+
+
+def test_rate_limit(txrequest, root):
+    root.rate_limiter.default = (1, 2)
+    txrequest.method = "GET"
+    resource = root.children[b"daemonstatus.json"]
+    before = API_RATE_LIMITED.values[("daemonstatus.json",)]
+
+    assert json.loads(resource.render(txrequest))["status"] == "ok"
+    assert json.loads(resource.render(txrequest))["status"] == "ok"
+
+    data = json.loads(resource.render(txrequest))
+    data.pop("node_name")
+
+    assert data == {"status": "error", "message": "too many requests", "retry_after": 1}
+    assert txrequest.code == 429
+    assert txrequest.responseHeaders.getRawHeaders(b"Retry-After") == [b"1"]
+    assert API_RATE_LIMITED.values[("daemonstatus.json",)] == before + 1
+    assert next(iter(root.rate_limiter.buckets)) == ("192.168.1.1", "daemonstatus.json")
+
+    # Preflight requests aren't limited.
+    txrequest.method = "OPTIONS"
+    resource.render(txrequest)
+
+    assert txrequest.code == 204
+
+    # Basic authentication users have their own buckets, if basic authentication is enabled.
+    channel = http.HTTPChannel()
+    channel.makeConnection(DummyChannel.TCP())
+    authenticated = http.Request(channel)
+    authenticated.method = "GET"
+    authenticated.requestHeaders.setRawHeaders(b"Authorization", [b"Basic dXNlcjpwYXNz"])  # user:pass
+
+    # The remote address's bucket is empty.
+    assert json.loads(resource.render(authenticated))["status"] == "error"
+    assert ("user", "daemonstatus.json") not in root.rate_limiter.buckets
+
+    root.authenticated = True
+
+    assert json.loads(resource.render(authenticated))["status"] == "ok"
+    assert ("user", "daemonstatus.json") in root.rate_limiter.buckets
+
+    content = root.children[b"metrics"].render_GET(txrequest).decode()
+
+    assert '\nscrapyd_api_rate_limit_clients{endpoint="daemonstatus.json"} 2.0\n' in content
+    assert '\nscrapyd_api_rate_limited_clients{endpoint="daemonstatus.json"} 1.0\n' in content
+
+
+def conditional_get(resource, args, etag=None, accept_encoding=None):
+    channel = http.HTTPChannel()
+    channel.makeConnection(DummyChannel.TCP())
+    txrequest = http.Request(channel)
+    txrequest.method = "GET"
+    txrequest.args = args.copy()
+    if etag:
+        txrequest.requestHeaders.setRawHeaders(b"If-None-Match", [etag])
+    if accept_encoding:
+        txrequest.requestHeaders.setRawHeaders(b"Accept-Encoding", [accept_encoding])
+    content = resource.render(txrequest)
+    return txrequest, content
+
+
+def test_conditional_get(root_with_egg):
+    resource = root_with_egg.children[b"listversions.json"]
+    args = {b"project": [b"mybot"]}
+    before = {result: API_CACHE.values[("listversions.json", result)] for result in ("hit", "miss", "not_modified")}
+
+    txrequest, content = conditional_get(resource, args)
+    etag = txrequest.responseHeaders.getRawHeaders(b"ETag")[0]
+
+    assert txrequest.code == 200
+    assert json.loads(content)["versions"] == ["0_1"]
+    assert re.match(rb'^"[0-9a-f]{32}"$', etag)
+
+    # Not modified.
+    for value in (etag, b"W/" + etag, b'"other", ' + etag, b"*"):
+        txrequest, empty = conditional_get(resource, args, value)
+
+        assert txrequest.code == 304
+        assert empty == b""
+        assert txrequest.responseHeaders.getRawHeaders(b"ETag") == [etag]
+        assert txrequest.responseHeaders.getRawHeaders(b"Access-Control-Allow-Origin") == [b"*"]
+
+    # Cached.
+    resource.render_GET = MagicMock()
+    txrequest, cached = conditional_get(resource, args, b'"other"')
+
+    resource.render_GET.assert_not_called()
+    assert txrequest.code == 200
+    assert cached == content
+    assert txrequest.responseHeaders.getRawHeaders(b"Content-Type") == [b"application/json"]
+    assert txrequest.responseHeaders.getRawHeaders(b"Content-Length") == [str(len(content)).encode()]
+    del resource.render_GET
+
+    # Other arguments have other ETags.
+    txrequest, _ = conditional_get(resource, {**args, b"_": [b"1"]}, etag)
+
+    assert txrequest.code == 200
+
+    # Version changes increase the generation.
+    root_add_version(root_with_egg, "mybot", "0_2", "mybot")
+    root_with_egg.update_projects()
+    txrequest, content = conditional_get(resource, args, etag)
+
+    assert txrequest.code == 200
+    assert json.loads(content)["versions"] == ["0_1", "0_2"]
+    assert txrequest.responseHeaders.getRawHeaders(b"ETag")[0] != etag
+    # The previous generation's response is replaced.
+    assert len(resource.cache) == 2
+
+    assert {result: API_CACHE.values[("listversions.json", result)] - before[result] for result in before} == {
+        "hit": 1,
+        "miss": 3,
+        "not_modified": 4,
+    }
+
+
+def test_conditional_get_uncacheable(root_with_egg):
+    # Errors aren't cached, and have no ETag.
+    for basename, args in (("listversions", {}), ("listspiders", {b"project": [b"nonexistent"]})):
+        resource = root_with_egg.children[b"%b.json" % basename.encode()]
+        txrequest, content = conditional_get(resource, args)
+
+        assert json.loads(content)["status"] == "error"
+        assert not txrequest.responseHeaders.hasHeader(b"ETag")
+        assert resource.cache == {}
+
+    # Other webservices aren't cacheable.
+    txrequest, _ = conditional_get(root_with_egg.children[b"daemonstatus.json"], {})
+
+    assert not txrequest.responseHeaders.hasHeader(b"ETag")
+
+
+def test_conditional_get_list_jobs(root_with_egg):
+    resource = root_with_egg.children[b"listjobs.json"]
+    args = {b"project": [b"mybot"]}
+
+    txrequest, _ = conditional_get(resource, args)
+    etag = txrequest.responseHeaders.getRawHeaders(b"ETag")[0]
+
+    root_with_egg.scheduler.schedule("mybot", "spider1", _job="j1")
+    txrequest, content = conditional_get(resource, args, etag)
+
+    assert txrequest.code == 200
+    assert [job["id"] for job in json.loads(content)["pending"]] == ["j1"]
+
+    # Running jobs' stats change without changing the generation.
+    process = ScrapyProcessProtocol("mybot", "spider1", "j2", env={}, args=[])
+    root_with_egg.launcher.processes[0] = process
+    root_with_egg.jobindex.start(process, 0)
+    etag = conditional_get(resource, args)[0].responseHeaders.getRawHeaders(b"ETag")[0]
+
+    with patch("scrapyd.webservice.time.time", return_value=time.time() + 1):
+        txrequest, _ = conditional_get(resource, args, etag)
+
+    assert txrequest.code == 200
+
+
+def test_compression(root_with_egg):
+    resource = root_with_egg.children[b"listprojects.json"]
+
+    txrequest, content = conditional_get(resource, {}, accept_encoding=b"gzip")
+
+    assert not txrequest.responseHeaders.hasHeader(b"Content-Encoding")
+    assert not txrequest.responseHeaders.hasHeader(b"Vary")
+
+    root_with_egg.compression_min_size = len(content)
+    txrequest, compressed = conditional_get(resource, {}, accept_encoding=b"gzip")
+    etag = txrequest.responseHeaders.getRawHeaders(b"ETag")[0]
+
+    assert gzip.decompress(compressed) == content
+    assert txrequest.responseHeaders.getRawHeaders(b"Content-Encoding") == [b"gzip"]
+    assert txrequest.responseHeaders.getRawHeaders(b"Content-Length") == [str(len(compressed)).encode()]
+    assert txrequest.responseHeaders.getRawHeaders(b"Vary") == [b"Accept-Encoding"]
+    assert etag.endswith(b'-gzip"')
+    # The compressed response is cached.
+    assert next(iter(resource.cache.values()))[2] == {"gzip": compressed}
+
+    # The compressed response's ETag matches.
+    txrequest, _ = conditional_get(resource, {}, etag)
+
+    assert txrequest.code == 304
+
+    txrequest, uncompressed = conditional_get(resource, {})
+
+    assert uncompressed == content
+    assert not txrequest.responseHeaders.hasHeader(b"Content-Encoding")
+    assert txrequest.responseHeaders.getRawHeaders(b"ETag")[0] == etag.replace(b"-gzip", b"")
+
+    # Uncacheable webservices are compressed, too.
+    root_with_egg.compression_min_size = 1
+    txrequest, compressed = conditional_get(root_with_egg.children[b"daemonstatus.json"], {}, accept_encoding=b"gzip")
+
+    assert json.loads(gzip.decompress(compressed))["status"] == "ok"
+
+    # Compression is disabled.
+    root_with_egg.compression_min_size = 0
+    txrequest, _ = conditional_get(root_with_egg.children[b"daemonstatus.json"], {}, accept_encoding=b"gzip")
+
+    assert not txrequest.responseHeaders.hasHeader(b"Content-Encoding")
+
+
+def test_metrics_stats(txrequest, root):
+    for slot, (spider, job, stats) in enumerate(
+        [
+            ("s1", "j1", {"items": 5, "requests": 1}),
+            ("s1", "j2", {"items": 2}),
+            ("s2", "j3", {"items": 1}),
+            ("s1", "j4", None),  # no stats
+        ]
+    ):
+        process = ScrapyProcessProtocol("p1", spider, job, env={}, args=[])
+        process.stats = stats
+        root.launcher.processes[slot] = process
+
+    content = root.children[b"metrics"].render_GET(txrequest).decode()
+
+    assert "# TYPE scrapyd_job_stats gauge\n" in content
+    assert '\nscrapyd_job_stats{project="p1",spider="s1",stat="items"} 7.0\n' in content
+    assert '\nscrapyd_job_stats{project="p1",spider="s1",stat="requests"} 1.0\n' in content
+    assert '\nscrapyd_job_stats{project="p1",spider="s2",stat="items"} 1.0\n' in content
+    assert "job=" not in content
@@ -1,3 +1,5 @@
+import datetime
+import gzip
 from pathlib import Path
 
 import pytest
@@ -8,7 +10,7 @@ from twisted.web.test.requesthelper import DummyRequest
 
 from scrapyd.app import application
 from scrapyd.launcher import ScrapyProcessProtocol
-from scrapyd.website import Root
+from scrapyd.website import Root, format_cpu, format_memory
 from tests import get_finished_job, has_settings, root_add_version, touch
 
 LOGS_DIR = Path("logs")
@@ -72,6 +74,89 @@ def test_logs_file(txrequest, root):
     return d
 
 
+@pytest.mark.parametrize(
+    ("accept_encoding", "encoding"),
+    [
+        (None, None),
+        (b"gzip", b"gzip"),
+        (b"br, gzip;q=0.5", b"gzip"),  # no foo.log.br
+        (b"gzip;q=0", None),
+    ],
+)
+def test_logs_file_precompressed(txrequest, root, accept_encoding, encoding):
+    LOGS_DIR.mkdir()
+    (LOGS_DIR / "foo.log").write_bytes(b"baz")
+    (LOGS_DIR / "foo.log.gz").write_bytes(gzip.compress(b"baz"))
+
+    request = DummyRequest([b"foo.log"])
+    if accept_encoding:
+        request.requestHeaders.setRawHeaders(b"Accept-Encoding", [accept_encoding])
+    child = resource.getChildForRequest(root.children[b"logs"], request)
+
+    d = _render(child, request)
+
+    def cbRendered(ignored):
+        assert request.responseHeaders.getRawHeaders(b"Vary") == [b"Accept-Encoding"]
+        assert request.responseHeaders.getRawHeaders(b"Content-Type") == [b"text/plain"]
+        if encoding:
+            assert request.responseHeaders.getRawHeaders(b"Content-Encoding") == [encoding]
+            assert gzip.decompress(b"".join(request.written)) == b"baz"
+        else:
+            assert not request.responseHeaders.hasHeader(b"Content-Encoding")
+            assert b"".join(request.written) == b"baz"
+
+    d.addCallback(cbRendered)
+    return d
+
+
+def test_logs_file_precompressed_only(txrequest, root):
+    (LOGS_DIR / "p1" / "s1").mkdir(parents=True)
+    (LOGS_DIR / "p1" / "s1" / "j1.log.gz").write_bytes(gzip.compress(b"baz"))
+
+    assert root.get_log_url(get_finished_job("p1", "s1", "j1")) == "/logs/p1/s1/j1.log"
+
+    request = DummyRequest([b"p1", b"s1", b"j1.log"])
+    child = resource.getChildForRequest(root.children[b"logs"], request)
+
+    d = _render(child, request)
+
+    def cbRendered(ignored):
+        assert request.responseHeaders.getRawHeaders(b"Content-Encoding") == [b"gzip"]
+        assert gzip.decompress(b"".join(request.written)) == b"baz"
+
+    d.addCallback(cbRendered)
+    return d
+
+
+@pytest.mark.parametrize(("size", "compressed"), [(1023, False), (1024, True)])
+def test_logs_file_compress(txrequest, root, size, compressed):
+    LOGS_DIR.mkdir()
+    (LOGS_DIR / "foo.log").write_bytes(b"x" * size)
+
+    request = DummyRequest([b"foo.log"])
+    request.requestHeaders.setRawHeaders(b"Accept-Encoding", [b"gzip"])
+    child = resource.getChildForRequest(root.children[b"logs"], request)
+
+    d = _render(child, request)
+
+    def cbRendered(ignored):
+        content = b"".join(request.written)
+        if compressed:
+            # DummyRequest doesn't encode what is written.
+            request.startedWriting = False
+            encoder = child.getEncoder(request)
+            content = gzip.decompress(encoder.encode(content) + encoder.finish())
+
+            assert request.responseHeaders.getRawHeaders(b"Content-Encoding") == [b"gzip"]
+            assert not request.responseHeaders.hasHeader(b"Content-Length")
+        else:
+            assert not request.responseHeaders.hasHeader(b"Content-Encoding")
+        assert content == b"x" * size
+
+    d.addCallback(cbRendered)
+    return d
+
+
 @pytest.mark.parametrize("cancel", [True, False], ids=["cancel", "no_cancel"])
 @pytest.mark.parametrize("header", [True, False], ids=["header", "no_header"])
 @pytest.mark.parametrize("exists", [True, False], ids=["exists", "no_exists"])
@@ -145,6 +230,26 @@ def test_jobs(txrequest, config, cancel, header, exists, chdir):
     assert b' value="j1-finished">' not in content
 
 
+def test_jobs_output(txrequest, root, chdir):
+    touch(chdir / "logs" / "p1" / "s1" / "j1.log")
+    (chdir / "logs" / "p1" / "s1" / "j1.out").touch()
+    root.launcher.finished.add(get_finished_job("p1", "s1", "j1"))
+
+    txrequest.method = "GET"
+    text = root.children[b"jobs"].render(txrequest).decode()
+
+    assert '<td><a href="/logs/p1/s1/j1.log">Log</a> <a href="/logs/p1/s1/j1.out">Output</a></td>' in text
+
+
+def test_jobs_not_before(txrequest, root_with_egg, chdir):
+    root_with_egg.poller.queues["mybot"].add("mybot", _not_before=datetime.datetime(2001, 2, 3, 4, 5, 6, 7), _job="j1")
+
+    txrequest.method = "GET"
+    text = root_with_egg.children[b"jobs"].render(txrequest).decode()
+
+    assert "<td>2001-02-03 04:05:06</td>" in text
+
+
 @pytest.mark.parametrize("with_egg", [True, False])
 @pytest.mark.parametrize("header", [True, False])
 def test_home(txrequest, root, with_egg, header):
@@ -195,3 +300,17 @@ def test_validate(tmp_path, txrequest, root, basename, caplog):
     report = ValidatorInterface().validate([str(path)]).registry[str(path)]
 
     assert report is None, repr(report)
+
+
+@pytest.mark.parametrize(
+    ("usage", "cpu", "memory"),
+    [
+        (None, None, None),
+        ({"cpu_user": 1.25, "cpu_system": 0.5}, "1.8s", None),
+        ({"cpu_user": 1, "cpu_system": 0, "rss": 2**20}, "1.0s", "1 MiB"),
+        ({"cpu_user": 1, "cpu_system": 0, "rss": 2**20, "max_rss": 3 * 2**20}, "1.0s", "3 MiB"),
+    ],
+)
+def test_format_usage(usage, cpu, memory):
+    assert format_cpu(usage) == cpu
+    assert format_memory(usage) == memory